@@ -1,13 +1,20 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
+import asyncio
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from prometheus_client import Counter, Gauge
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 from app.models import User
-from app.schemas import TokenData
+from app.schemas import TokenData, CurrentUser
+from app.cache import CACHE_NAMESPACE, broadcast_invalidation
+from app.local_cache import local_cache
+from app.redis_client import redis_client
 import os
 from dotenv import load_dotenv
 
@@ -16,33 +23,77 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+# Seconds an authenticated user's principal is served from cache (Redis tier;
+# the in-process tier is further capped by LOCAL_CACHE_TTL)
+PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", 60))
+# bcrypt cost; hashes made with a different cost are upgraded on next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+# Threads doing bcrypt work, and how many more requests may wait for one
+# before new ones are turned away with 503
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", 16))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=12)
+PASSWORD_HASH_PENDING = Gauge("todo_password_hash_pending", "bcrypt jobs running or queued")
+PASSWORD_HASH_REJECTED = Counter("todo_password_hash_rejected_total", "bcrypt jobs refused because the pool was full")
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+# bcrypt releases the GIL while hashing, so a small thread pool keeps the
+# event loop free without the cost of shipping work to other processes
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+password_jobs = 0
+
+async def run_password_job(func, *args):
+    """Run a bcrypt call in the password pool, or 503 if it is saturated"""
+    global password_jobs
+    if password_jobs >= PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE:
+        PASSWORD_HASH_REJECTED.inc()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    password_jobs += 1
+    PASSWORD_HASH_PENDING.inc()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(password_executor, func, *args)
+    finally:
+        password_jobs -= 1
+        PASSWORD_HASH_PENDING.dec()
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a plain password against its hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    return await run_password_job(pwd_context.verify, plain_password, hashed_password)
 
-def get_password_hash(password: str) -> str:
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password; also returns a new hash if the stored one uses an outdated cost"""
+    return await run_password_job(pwd_context.verify_and_update, plain_password, hashed_password)
+
+async def get_password_hash(password: str) -> str:
     """Hash a password"""
-    return pwd_context.hash(password)
+    return await run_password_job(pwd_context.hash, password)
 
-def get_user_by_username(db: Session, username: str) -> Optional[User]:
+async def get_user_by_username(db: AsyncSession, username: str) -> Optional[User]:
     """Get user by username"""
-    return db.query(User).filter(User.username == username).first()
+    return await db.scalar(select(User).where(User.username == username))
 
-def get_user_by_email(db: Session, email: str) -> Optional[User]:
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
     """Get user by email"""
-    return db.query(User).filter(User.email == email).first()
+    return await db.scalar(select(User).where(User.email == email))
 
-def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> Optional[User]:
     """Authenticate user with email and password only"""
-    user = get_user_by_email(db, email)
+    user = await get_user_by_email(db, email)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    valid, new_hash = await verify_and_update_password(password, user.hashed_password)
+    if not valid:
         return None
+    if new_hash:
+        # Transparently move the stored hash to the configured cost
+        user.hashed_password = new_hash
+        await db.commit()
     return user
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -56,7 +107,41 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def principal_namespace(username: str) -> str:
+    return f"principal:{username}"
+
+def principal_cache_key(username: str) -> str:
+    return f"{CACHE_NAMESPACE}:{principal_namespace(username)}"
+
+def principal_local_key(username: str) -> str:
+    """In-process key; take it before reading so concurrent invalidations win"""
+    namespace = principal_namespace(username)
+    return f"{namespace}:g{local_cache.generation(namespace)}"
+
+async def get_cached_principal(username: str, local_key: str) -> Optional[CurrentUser]:
+    """Look up a cached principal: in-process tier first, then Redis"""
+    data = local_cache.get(local_key)
+    if data is None and redis_client.is_connected():
+        data = await redis_client.get_cache(principal_cache_key(username))
+        if data is not None:
+            local_cache.set(local_key, data, PRINCIPAL_CACHE_TTL)
+    return CurrentUser(**data) if data is not None else None
+
+async def cache_principal(user: User, local_key: str) -> CurrentUser:
+    """Snapshot a user row as a principal and cache it in both tiers"""
+    principal = CurrentUser.from_user(user)
+    data = principal.model_dump(mode="json")
+    local_cache.set(local_key, data, PRINCIPAL_CACHE_TTL)
+    await redis_client.set_cache(principal_cache_key(user.username), data, PRINCIPAL_CACHE_TTL)
+    return principal
+
+async def invalidate_principal(*usernames: str):
+    """Drop cached principals after the user row changed (call after commit)"""
+    for username in set(usernames):
+        await redis_client.delete_cache(principal_cache_key(username))
+        await broadcast_invalidation(principal_namespace(username))
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> CurrentUser:
     """Get current authenticated user"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -72,12 +157,17 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     except JWTError:
         raise credentials_exception
     
-    user = get_user_by_username(db, username=token_data.username)
+    local_key = principal_local_key(token_data.username)
+    principal = await get_cached_principal(token_data.username, local_key)
+    if principal is not None:
+        return principal
+
+    user = await get_user_by_username(db, username=token_data.username)
     if user is None:
         raise credentials_exception
-    return user
+    return await cache_principal(user, local_key)
 
-async def get_current_active_user(current_user: User = Depends(get_current_user)):
+async def get_current_active_user(current_user: CurrentUser = Depends(get_current_user)) -> CurrentUser:
     """Get current active user"""
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
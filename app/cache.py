@@ -1,80 +1,244 @@
 from functools import wraps
-from typing import Optional, Any
+from typing import Optional, Any, Iterable, Tuple
+from enum import Enum
 import hashlib
 import json
+import time
+import uuid
+import asyncio
+from pydantic import BaseModel
+from prometheus_client import Counter
 from app.redis_client import redis_client
+from app.local_cache import local_cache
+
+# Bump the version to orphan every entry written with an older key layout
+CACHE_NAMESPACE = "cache:v2"
+
+# Workers tell each other to drop local entries over this Redis channel
+INVALIDATION_CHANNEL = f"{CACHE_NAMESPACE}:invalidate"
+WORKER_ID = uuid.uuid4().hex
+
+# Exposed on /metrics by the app's Prometheus Instrumentator (default registry).
+# tier is "local" (in-process LRU) or "redis".
+CACHE_HITS = Counter("todo_cache_hits_total", "Response cache hits", ["cache", "tier"])
+CACHE_MISSES = Counter("todo_cache_misses_total", "Response cache misses", ["cache", "tier"])
+CACHE_EVICTIONS = Counter("todo_cache_evictions_total", "Cache generations retired by invalidation", ["cache"])
+
+# (user_id, key_prefix) changes whose Redis generation bump failed; retried
+# once Redis is back so nothing read before the change is served as current
+pending_bumps = set()
+
+def user_namespace(user_id: int) -> str:
+    """Key prefix holding every cached entry that belongs to one user"""
+    return f"{CACHE_NAMESPACE}:user:{user_id}"
+
+def generation_key(user_id: int, key_prefix: str) -> str:
+    """Counter embedded in every key of one user's key_prefix entries"""
+    return f"{user_namespace(user_id)}:{key_prefix}:gen"
+
+def initial_generation() -> int:
+    # Seeding from the clock keeps a counter that Redis evicted from restarting
+    # at a value whose (still unexpired) entries could be served again
+    return time.time_ns() // 1000
+
+async def get_generation(user_id: int, key_prefix: str) -> int:
+    """Current cache generation for a user's key_prefix entries"""
+    key = generation_key(user_id, key_prefix)
+
+    async def seed_and_get(r):
+        async with r.pipeline() as pipe:
+            pipe.set(key, initial_generation(), nx=True)
+            pipe.get(key)
+            return (await pipe.execute())[1]
+
+    return int(await redis_client.run(seed_and_get))
+
+async def bump_generation(user_id: int, key_prefix: str) -> int:
+    """Move a user's key_prefix entries to a new generation (O(1))"""
+    key = generation_key(user_id, key_prefix)
+
+    async def seed_and_incr(r):
+        async with r.pipeline() as pipe:
+            pipe.set(key, initial_generation(), nx=True)
+            pipe.incr(key)
+            return (await pipe.execute())[1]
+
+    return await redis_client.run(seed_and_incr)
+
+def canonical_params(kwargs: dict, key_params: Iterable[str]) -> dict:
+    """Pick the declared parameters and normalize their values"""
+    params = {}
+    for name in key_params:
+        value = kwargs.get(name)
+        if isinstance(value, Enum):
+            value = value.value
+        elif isinstance(value, str):
+            value = value.strip()
+        params[name] = value
+    return params
+
+def local_namespace(user_id: int, key_prefix: str) -> str:
+    """Namespace of a user's key_prefix entries in the in-process tier"""
+    return f"{user_id}:{key_prefix}"
+
+def cache_key(user_id: int, key_prefix: str, generation: int, func_name: str, params: dict) -> str:
+    """Generate cache key from the user, their generation and canonical parameters"""
+    key_string = json.dumps(params, sort_keys=True, default=str)
+    digest = hashlib.md5(key_string.encode()).hexdigest()
+    return f"{user_namespace(user_id)}:{key_prefix}:g{generation}:{func_name}:{digest}"
+
+def cache_result(ttl: int = 300, key_prefix: str = "cache", key_params: Iterable[str] = ()):
+    """Decorator to cache a user's endpoint results in two tiers.
+
+    Only the parameters named in key_params (plus the current user's id and
+    cache generation) make up the key, so injected objects such as the DB
+    session never leak into it. Lookups try this worker's in-process LRU
+    first, then Redis; entries of older generations are never read again and
+    simply expire. Without Redis only the local tier is used.
+
+    The decorated function's with_generation(...) also returns the Redis
+    generation the result was read or computed under (None without Redis),
+    which a local hit may lag behind by up to the local TTL.
+    """
+    key_params = tuple(key_params)
 
-def cache_key(*args, **kwargs) -> str:
-    """Generate cache key from function arguments"""
-    key_data = {
-        'args': args,
-        'kwargs': kwargs
-    }
-    key_string = json.dumps(key_data, sort_keys=True, default=str)
-    return hashlib.md5(key_string.encode()).hexdigest()
-
-def cache_result(ttl: int = 300, key_prefix: str = "cache"):
-    """Decorator to cache function results"""
     def decorator(func):
-        @wraps(func)
-        async def wrapper(*args, **kwargs):
-            if not redis_client.is_connected():
-                # Redis not available, execute function normally
-                return await func(*args, **kwargs)
-            
-            # Generate cache key
-            cache_k = f"{key_prefix}:{func.__name__}:{cache_key(*args, **kwargs)}"
-            
+        async def with_generation(*args, **kwargs) -> Tuple[Any, Optional[int]]:
+            current_user = kwargs.get('current_user')
+            if current_user is None:
+                # No user to scope by, execute function normally
+                return await func(*args, **kwargs), None
+
+            params = canonical_params(kwargs, key_params)
+            # Read the local generation before any I/O so a concurrent
+            # invalidation orphans whatever this request stores
+            namespace = local_namespace(current_user.id, key_prefix)
+            local_k = cache_key(current_user.id, key_prefix, local_cache.generation(namespace), func.__name__, params)
+
+            # Local entries are (Redis generation, result)
+            cached_entry = local_cache.get(local_k)
+            if cached_entry is not None:
+                CACHE_HITS.labels(key_prefix, "local").inc()
+                return cached_entry[1], cached_entry[0]
+            CACHE_MISSES.labels(key_prefix, "local").inc()
+
+            generation = cache_k = None
+            if redis_client.is_connected():
+                try:
+                    generation = await get_generation(current_user.id, key_prefix)
+                    cache_k = cache_key(current_user.id, key_prefix, generation, func.__name__, params)
+                except Exception as e:
+                    generation = None
+                    print(f"Cache generation error: {e}")
+
             # Try to get from cache
-            cached_result = redis_client.get_cache(cache_k)
-            if cached_result is not None:
-                return cached_result
-            
+            if cache_k is not None:
+                cached_result = await redis_client.get_cache(cache_k)
+                if cached_result is not None:
+                    CACHE_HITS.labels(key_prefix, "redis").inc()
+                    local_cache.set(local_k, (generation, cached_result), ttl)
+                    return cached_result, generation
+                CACHE_MISSES.labels(key_prefix, "redis").inc()
+
             # Execute function and cache result
             result = await func(*args, **kwargs)
-            redis_client.set_cache(cache_k, result, ttl)
-            
-            return result
+            if isinstance(result, BaseModel):
+                result = result.model_dump(mode="json")
+            local_cache.set(local_k, (generation, result), ttl)
+            if cache_k is not None:
+                await redis_client.set_cache(cache_k, result, ttl)
+
+            return result, generation
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            return (await with_generation(*args, **kwargs))[0]
+
+        wrapper.with_generation = with_generation
         return wrapper
     return decorator
 
-def invalidate_cache_pattern(pattern: str):
-    """Invalidate cache entries matching pattern"""
+async def broadcast_invalidation(namespace: str):
+    """Invalidate a local-tier namespace in this worker and all the others"""
+    local_cache.bump_generation(namespace)
     if not redis_client.is_connected():
         return
-    
+
     try:
-        keys = redis_client.client.keys(pattern)
-        if keys:
-            redis_client.client.delete(*keys)
+        # Other workers drop their local copies when they receive this
+        await redis_client.run(lambda r: r.publish(INVALIDATION_CHANNEL, f"{WORKER_ID}:{namespace}"))
     except Exception as e:
-        print(f"Cache invalidation error: {e}")
+        print(f"Cache invalidation broadcast error: {e}")
 
-def rate_limit(max_requests: int = 100, window: int = 3600):
-    """Rate limiting decorator"""
-    def decorator(func):
-        @wraps(func)
-        async def wrapper(*args, **kwargs):
-            if not redis_client.is_connected():
-                # Redis not available, skip rate limiting
-                return await func(*args, **kwargs)
-            
-            # Extract user info from kwargs (assumes current_user is passed)
-            current_user = kwargs.get('current_user')
-            if not current_user:
-                return await func(*args, **kwargs)
-            
-            # Rate limit key
-            rate_key = f"rate_limit:{current_user.id}:{func.__name__}"
-            current_requests = redis_client.increment_counter(rate_key, window)
-            
-            if current_requests > max_requests:
-                from fastapi import HTTPException, status
-                raise HTTPException(
-                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                    detail=f"Rate limit exceeded. Max {max_requests} requests per hour."
-                )
-            
-            return await func(*args, **kwargs)
-        return wrapper
-    return decorator
\ No newline at end of file
+async def invalidate_user_cache(user_id: int, key_prefix: str):
+    """Invalidate one user's cached entries for key_prefix (never other users')"""
+    CACHE_EVICTIONS.labels(key_prefix).inc()
+    pending_bumps.add((user_id, key_prefix))
+    await flush_pending_bumps()
+    await broadcast_invalidation(local_namespace(user_id, key_prefix))
+
+async def flush_pending_bumps():
+    """Bump the Redis generations of changes made while Redis was unreachable"""
+    if not redis_client.is_connected():
+        return
+    for user_id, key_prefix in list(pending_bumps):
+        try:
+            await bump_generation(user_id, key_prefix)
+        except Exception as e:
+            print(f"Cache invalidation error: {e}")
+            return
+        pending_bumps.discard((user_id, key_prefix))
+
+async def generation_token(user_id: int, key_prefix: str) -> Optional[str]:
+    """Value that changes whenever invalidate_user_cache(user_id, key_prefix)
+    runs in any worker, or None while that can't be known (Redis unavailable
+    or changes made during an outage not yet reflected)"""
+    if pending_bumps or not redis_client.is_connected():
+        return None
+    try:
+        return str(await get_generation(user_id, key_prefix))
+    except Exception as e:
+        print(f"Cache generation error: {e}")
+        return None
+
+def trusted_generation_token(generation: Optional[int]) -> Optional[str]:
+    """generation_token for data read under an earlier Redis generation"""
+    if generation is None or pending_bumps:
+        return None
+    return str(generation)
+
+def handle_invalidation_message(message: dict):
+    """Apply an invalidation broadcast by another worker to the local tier"""
+    try:
+        worker_id, namespace = message["data"].split(":", 1)
+    except (AttributeError, ValueError):
+        return
+    if worker_id != WORKER_ID:
+        local_cache.bump_generation(namespace)
+
+async def listen_for_invalidations(retry_delay: float = 5.0):
+    """Apply other workers' invalidation broadcasts until cancelled.
+
+    Resubscribes after connection errors; entries cached while the
+    subscription was down are dropped since their broadcasts were missed.
+    """
+    while True:
+        if not redis_client.is_connected():
+            await asyncio.sleep(retry_delay)
+            continue
+        pubsub = redis_client.client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            local_cache.clear()
+            await flush_pending_bumps()
+            while True:
+                message = await pubsub.get_message(timeout=1.0)
+                if message is not None:
+                    handle_invalidation_message(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Cache invalidation listener error: {e}")
+            await asyncio.sleep(retry_delay)
+        finally:
+            await pubsub.aclose()
@@ -0,0 +1,347 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+import httplib2
+from sqlalchemy import delete, insert, select, update
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest
+from google.auth.exceptions import RefreshError
+from app.database import db_session
+from app.jobs import Job, JobError, job_handler
+from app.models import CalendarEvent, Todo, User
+
+# Calendar API root; point it at a local fake server to exercise sync
+# without Google (the batch endpoint is resolved against it too)
+GOOGLE_CALENDAR_API_URL = os.getenv("GOOGLE_CALENDAR_API_URL", "")
+# Calls per batch HTTP request (Google accepts at most 50)
+CALENDAR_BATCH_SIZE = min(int(os.getenv("CALENDAR_BATCH_SIZE", 50)), 50)
+# Rounds a rate-limited/failed call is retried, and the backoff between them
+CALENDAR_MAX_RETRIES = int(os.getenv("CALENDAR_MAX_RETRIES", 5))
+CALENDAR_BACKOFF_BASE = float(os.getenv("CALENDAR_BACKOFF_BASE", 1.0))
+CALENDAR_BACKOFF_MAX = float(os.getenv("CALENDAR_BACKOFF_MAX", 32.0))
+# Syncs running at once; each holds one thread while it talks to Google
+CALENDAR_SYNC_WORKERS = int(os.getenv("CALENDAR_SYNC_WORKERS", 4))
+CALENDAR_TIMEZONE = os.getenv("CALENDAR_TIMEZONE", "Africa/Cairo")
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# The event no longer exists (deleted by hand in Calendar)
+GONE_STATUSES = {404, 410}
+# Calendar reports quota exhaustion as 403 with one of these reasons
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+PRIORITY_COLORS = {"high": "11", "medium": "5"}  # red, yellow; anything else green
+# Todo fields an event is built from (completed is not shown in Calendar)
+EVENT_FIELDS = ("title", "description", "date", "priority", "status")
+
+# The API client calls are blocking; they run here so a long sync never
+# occupies the event loop or the threadpool shared with DB_MODE=sync
+calendar_executor = ThreadPoolExecutor(max_workers=CALENDAR_SYNC_WORKERS, thread_name_prefix="calendar")
+calendar_document: Optional[Dict[str, Any]] = None
+
+# (response, error) per request key
+BatchResults = Dict[str, Tuple[Optional[dict], Optional[Exception]]]
+
+def get_calendar_document() -> Dict[str, Any]:
+    """The Calendar v3 discovery document, parsed once per process.
+
+    Uses the copy bundled with google-api-python-client, so building a
+    service never fetches discovery over the network.
+    """
+    global calendar_document
+    if calendar_document is None:
+        document = json.loads(get_static_doc("calendar", "v3"))
+        if GOOGLE_CALENDAR_API_URL:
+            document["rootUrl"] = GOOGLE_CALENDAR_API_URL.rstrip("/") + "/"
+            document.pop("mtlsRootUrl", None)
+        calendar_document = document
+    return calendar_document
+
+def load_credentials(token_info: dict) -> Credentials:
+    return Credentials(
+        token=token_info.get('token'),
+        refresh_token=token_info.get('refresh_token'),
+        token_uri=token_info.get('token_uri'),
+        client_id=token_info.get('client_id'),
+        client_secret=token_info.get('client_secret'),
+        scopes=token_info.get('scopes')
+    )
+
+def dump_credentials(credentials: Credentials) -> str:
+    return json.dumps({
+        'token': credentials.token,
+        'refresh_token': credentials.refresh_token,
+        'token_uri': credentials.token_uri,
+        'client_id': credentials.client_id,
+        'client_secret': credentials.client_secret,
+        'scopes': credentials.scopes
+    })
+
+def calendar_service(credentials: Credentials):
+    """A Calendar client for one sync (clients are not thread-safe, so never shared)"""
+    return build_from_document(get_calendar_document(), credentials=credentials)
+
+def event_body(todo) -> dict:
+    """Calendar event for a todo: a one-hour slot on its date (9 AM if unset or midnight)"""
+    if todo.date:
+        start_time = todo.date
+        if start_time.hour == 0 and start_time.minute == 0:
+            start_time = start_time.replace(hour=9, minute=0)
+    else:
+        # No date set: schedule for tomorrow at 9 AM
+        start_time = datetime.now(timezone.utc).replace(hour=9, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    end_time = start_time + timedelta(hours=1)
+
+    # Wall-clock times interpreted in CALENDAR_TIMEZONE
+    return {
+        'summary': todo.title,
+        'description': f"{todo.description or ''}\n\nPriority: {todo.priority}\nStatus: {todo.status}",
+        'start': {'dateTime': start_time.strftime('%Y-%m-%dT%H:%M:%S'), 'timeZone': CALENDAR_TIMEZONE},
+        'end': {'dateTime': end_time.strftime('%Y-%m-%dT%H:%M:%S'), 'timeZone': CALENDAR_TIMEZONE},
+        'reminders': {
+            'useDefault': False,
+            'overrides': [{'method': 'popup', 'minutes': 30}],
+        },
+        'colorId': PRIORITY_COLORS.get(todo.priority, '2'),
+    }
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, HttpError):
+        if error.resp.status in RETRY_STATUSES:
+            return True
+        if error.resp.status == 403 and isinstance(error.error_details, list):
+            return any(
+                isinstance(detail, dict) and detail.get("reason") in RATE_LIMIT_REASONS
+                for detail in error.error_details
+            )
+        return False
+    # Connection resets, timeouts
+    return isinstance(error, (httplib2.HttpLib2Error, OSError))
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(CALENDAR_BACKOFF_MAX, CALENDAR_BACKOFF_BASE * 2 ** attempt))
+
+def execute_batched(service, requests: Dict[str, Callable[[Any], HttpRequest]]) -> BatchResults:
+    """Run Calendar calls through the batch endpoint, CALENDAR_BATCH_SIZE per HTTP request.
+
+    requests maps a key to a function building the call from the service.
+    Calls that fail with 429/5xx (or a rate-limit 403) are retried in later
+    rounds with exponential backoff; other failures are reported as-is.
+    Blocking: run it in calendar_executor.
+    """
+    results: BatchResults = {}
+    pending = list(requests)
+    attempt = 0
+    while pending:
+        retry = []
+
+        def collect(key, response, error):
+            if error is None:
+                results[key] = (response, None)
+            elif is_retryable(error) and attempt < CALENDAR_MAX_RETRIES:
+                retry.append(key)
+            else:
+                results[key] = (None, error)
+
+        for offset in range(0, len(pending), CALENDAR_BATCH_SIZE):
+            keys = pending[offset:offset + CALENDAR_BATCH_SIZE]
+            batch = service.new_batch_http_request(callback=collect)
+            for key in keys:
+                batch.add(requests[key](service), request_id=key)
+            try:
+                batch.execute()
+            except Exception as e:
+                # The batch request as a whole failed; nothing in it was applied
+                for key in keys:
+                    if key not in results and key not in retry:
+                        collect(key, None, e)
+
+        if retry:
+            time.sleep(backoff_delay(attempt))
+            attempt += 1
+        pending = retry
+    return results
+
+def is_gone(error: Optional[Exception]) -> bool:
+    return isinstance(error, HttpError) and error.resp.status in GONE_STATUSES
+
+def apply_changes(
+    credentials: Credentials,
+    inserts: Dict[str, dict],
+    patches: Dict[str, Tuple[str, dict]],
+    deletes: Dict[str, str],
+) -> BatchResults:
+    """Create, patch (event id, body) and delete (event id) events in the
+    user's primary calendar, all through the same batches (blocking).
+
+    A patched event that no longer exists is created again; deleting one
+    counts as done.
+    """
+    service = calendar_service(credentials)
+    calls = {}
+    for key, body in inserts.items():
+        calls[key] = lambda service, body=body: service.events().insert(calendarId='primary', body=body)
+    for key, (event_id, body) in patches.items():
+        calls[key] = lambda service, event_id=event_id, body=body: service.events().patch(
+            calendarId='primary', eventId=event_id, body=body
+        )
+    for key, event_id in deletes.items():
+        calls[key] = lambda service, event_id=event_id: service.events().delete(calendarId='primary', eventId=event_id)
+    results = execute_batched(service, calls)
+
+    recreate = {}
+    for key, (_, error) in list(results.items()):
+        if is_gone(error):
+            if key in deletes:
+                results[key] = ({}, None)
+            elif key in patches:
+                body = patches[key][1]
+                recreate[key] = lambda service, body=body: service.events().insert(calendarId='primary', body=body)
+    if recreate:
+        results.update(execute_batched(service, recreate))
+    return results
+
+async def run_calendar_job(func, *args):
+    """Run a blocking Calendar call in the calendar pool"""
+    return await asyncio.get_running_loop().run_in_executor(calendar_executor, func, *args)
+
+def event_fingerprint(todo: Todo) -> str:
+    """Hash of the fields the todo's event is built from: its event needs a
+    patch exactly when this differs from the one stored at the last sync"""
+    values = [getattr(todo, name) for name in EVENT_FIELDS]
+    return hashlib.sha256(json.dumps(values, default=str).encode()).hexdigest()
+
+async def sync_calendar(user_id: int) -> dict:
+    """Bring the user's calendar in line with their todos, touching only what changed.
+
+    Todos without an event get one, todos whose event fields changed since
+    their last sync get their event patched, and events of deleted todos are removed; the
+    calendar_events rows are updated to match. Returns counts per outcome
+    and the calls that failed.
+
+    No database session is held while Calendar is called: todos and
+    mappings are read in one short transaction, the results written in
+    another.
+    """
+    async with db_session() as db:
+        user = await db.get(User, user_id)
+        if user is None or not user.google_calendar_token:
+            raise JobError("Google Calendar not connected. Please authenticate first.")
+        token_info = json.loads(user.google_calendar_token)
+        todos = {
+            str(todo.id): todo
+            for todo in (await db.scalars(select(Todo).where(Todo.owner_id == user_id, Todo.deleted_at.is_(None)))).all()
+        }
+        mappings = {
+            str(mapping.todo_id): mapping
+            for mapping in (await db.scalars(select(CalendarEvent).where(CalendarEvent.owner_id == user_id))).all()
+        }
+
+        inserts, patches, deletes = {}, {}, {}
+        fingerprints = {}
+        unchanged = 0
+        for key, todo in todos.items():
+            fingerprints[key] = event_fingerprint(todo)
+            mapping = mappings.get(key)
+            if mapping is None:
+                inserts[key] = event_body(todo)
+            elif mapping.synced_hash != fingerprints[key]:
+                patches[key] = (mapping.event_id, event_body(todo))
+            else:
+                unchanged += 1
+        for key, mapping in mappings.items():
+            if key not in todos:
+                deletes[key] = mapping.event_id
+        titles = {key: todo.title for key, todo in todos.items()}
+        mapping_ids = {key: mapping.id for key, mapping in mappings.items()}
+
+    credentials = load_credentials(token_info)
+    results = {}
+    if inserts or patches or deletes:
+        results = await run_calendar_job(apply_changes, credentials, inserts, patches, deletes)
+
+    summary = {"created": 0, "updated": 0, "deleted": 0, "unchanged": unchanged, "failed": 0}
+    errors = []
+    created = []
+    updated = []
+    deleted_ids = []
+    for key, (event, error) in results.items():
+        if error is not None:
+            summary["failed"] += 1
+            errors.append({
+                'todo_id': int(key),
+                'todo_title': titles.get(key),
+                'error': str(error)
+            })
+        elif key in inserts:
+            summary["created"] += 1
+            created.append({
+                "todo_id": int(key),
+                "owner_id": user_id,
+                "event_id": event["id"],
+                "etag": event.get("etag"),
+                "synced_hash": fingerprints[key],
+            })
+        elif key in patches:
+            summary["updated"] += 1
+            updated.append({
+                "id": mapping_ids[key],
+                "event_id": event["id"],
+                "etag": event.get("etag"),
+                "synced_hash": fingerprints[key],
+            })
+        else:
+            summary["deleted"] += 1
+            deleted_ids.append(mapping_ids[key])
+
+    refreshed = credentials.token != token_info.get('token')
+    if created or updated or deleted_ids or refreshed:
+        async with db_session() as db:
+            # Disconnecting meanwhile dropped the mappings; don't bring them back
+            if await db.scalar(select(User.google_calendar_token).where(User.id == user_id)):
+                if created:
+                    await db.execute(insert(CalendarEvent), created)
+                if updated:
+                    await db.execute(update(CalendarEvent), updated)
+                if deleted_ids:
+                    await db.execute(delete(CalendarEvent).where(CalendarEvent.id.in_(deleted_ids)))
+                # Keep the token if it was refreshed along the way
+                if refreshed:
+                    await db.execute(
+                        update(User).where(User.id == user_id).values(google_calendar_token=dump_credentials(credentials))
+                    )
+                await db.commit()
+
+    summary["errors"] = errors
+    summary["total_tasks"] = len(todos)
+    return summary
+
+def sync_message(summary: dict) -> str:
+    message = (
+        f"Google Calendar is up to date: {summary['created']} created, {summary['updated']} updated, "
+        f"{summary['deleted']} removed, {summary['unchanged']} unchanged"
+    )
+    if summary["failed"]:
+        message += f", {summary['failed']} failed"
+    return message
+
+@job_handler("calendar_sync")
+async def calendar_sync_job(job: Job) -> dict:
+    try:
+        summary = await sync_calendar(job.user_id)
+    except RefreshError as e:
+        # Revoked or expired grant: only reconnecting helps
+        raise JobError(f"Google authorization failed: {e}")
+    return {
+        "message": sync_message(summary),
+        **summary,
+        "successful": summary["created"] + summary["updated"] + summary["deleted"],
+    }
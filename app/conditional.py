@@ -0,0 +1,57 @@
+import hashlib
+from typing import Optional
+from fastapi import Request, Response, status
+from app.cache import generation_token, trusted_generation_token
+
+# Conditional GET for per-user JSON: the ETag is derived from the user's
+# cache generation (bumped on every change to their todos), so answering
+# If-None-Match needs one Redis read and neither the database nor the
+# serializer. A body served from the cache is tagged with the generation
+# it was cached under, which may be older than the current one.
+
+# Browsers may keep the body but must revalidate before every reuse
+REVALIDATE_PRIVATE = "private, no-cache"
+
+def weak_etag(*parts) -> str:
+    digest = hashlib.md5(":".join(str(part) for part in parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+def etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match comparison (weak, as RFC 9110 requires for it)"""
+    if header.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    tags = [tag.strip() for tag in header.split(",")]
+    return opaque in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+def is_not_modified(request: Request, etag: Optional[str]) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    return etag is not None and if_none_match is not None and etag_matches(if_none_match, etag)
+
+def validator_headers(etag: Optional[str]) -> dict:
+    if etag is None:
+        return {}
+    return {"ETag": etag, "Cache-Control": REVALIDATE_PRIVATE}
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validator_headers(etag))
+
+async def generation_etag(user_id: int, key_prefix: str, request: Request) -> Optional[str]:
+    """ETag for this request's view of a user's key_prefix data, or None
+    when the generation can't be trusted (then no validator is sent).
+
+    Read it before loading the data: a change landing in between then
+    yields an ETag that is already outdated, never a current one for old data.
+    """
+    generation = await generation_token(user_id, key_prefix)
+    if generation is None:
+        return None
+    return weak_etag(user_id, key_prefix, generation, request.url.path, request.url.query)
+
+def cached_etag(user_id: int, key_prefix: str, generation: Optional[int], request: Request) -> Optional[str]:
+    """ETag for a body returned by a cache_result function's
+    with_generation(), whose generation may lag the current one"""
+    token = trusted_generation_token(generation)
+    if token is None:
+        return None
+    return weak_etag(user_id, key_prefix, token, request.url.path, request.url.query)
@@ -1,6 +1,10 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
+from typing import Optional
 import os
 from dotenv import load_dotenv
 
@@ -11,23 +15,140 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable is required")
 
+# "sync" runs the blocking driver in a threadpool, "async" uses an asyncio
+# driver (asyncpg / aiosqlite) end to end. Chosen once at startup.
+DB_MODE = os.getenv("DB_MODE", "sync").lower()
+
+if DB_MODE not in ("sync", "async"):
+    raise ValueError("DB_MODE must be either 'sync' or 'async'")
+
+# Map the configured (sync) driver to its asyncio counterpart
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+def _engine_options(url: str) -> dict:
+    """Pool settings shared by the sync and async engines"""
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "pool_size": 20,
+        "max_overflow": 0,
+        "pool_pre_ping": True,
+        "pool_recycle": 300,
+    }
+
+def get_async_database_url() -> str:
+    """Async driver URL, from ASYNC_DATABASE_URL or derived from DATABASE_URL"""
+    override = os.getenv("ASYNC_DATABASE_URL")
+    if override:
+        return override
+    url = make_url(DATABASE_URL)
+    drivername = ASYNC_DRIVERS.get(url.drivername, url.drivername)
+    return url.set(drivername=drivername).render_as_string(hide_password=False)
+
 # PostgreSQL configuration
-engine = create_engine(
-    DATABASE_URL,
-    pool_size=20,
-    max_overflow=0,
-    pool_pre_ping=True,
-    pool_recycle=300,
-)
+engine = create_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = None
+AsyncSessionLocal = None
+
+if DB_MODE == "async":
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    ASYNC_DATABASE_URL = get_async_database_url()
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **_engine_options(ASYNC_DATABASE_URL))
+    # Objects stay usable after commit; lazy refreshes are not allowed under asyncio
+    AsyncSessionLocal = async_sessionmaker(
+        bind=async_engine, autoflush=False, expire_on_commit=False
+    )
+
 Base = declarative_base()
 
-def get_db():
+class SyncSessionAdapter:
+    """Expose the AsyncSession API on top of a blocking Session.
+
+    Every round trip runs in the threadpool, so handlers can be written once
+    against the async API and still work in DB_MODE=sync without stalling
+    the event loop.
+    """
+
+    def __init__(self, session):
+        self.sync_session = session
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    async def execute(self, statement, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.execute, statement, *args, **kwargs)
+
+    async def scalar(self, statement, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalar, statement, *args, **kwargs)
+
+    async def scalars(self, statement, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalars, statement, *args, **kwargs)
+
+    async def stream(self, statement, *args, **kwargs):
+        """Execute on a server-side cursor; read it with `async for ... in result.partitions()`"""
+        statement = statement.execution_options(stream_results=True)
+        result = await run_in_threadpool(self.sync_session.execute, statement, *args, **kwargs)
+        return SyncStreamedResult(result)
+
+    async def get(self, entity, ident, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, entity, ident, **kwargs)
+
+    async def delete(self, instance):
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def flush(self, objects=None):
+        await run_in_threadpool(self.sync_session.flush, objects)
+
+    async def refresh(self, instance, attribute_names=None):
+        await run_in_threadpool(self.sync_session.refresh, instance, attribute_names)
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def close(self):
+        await run_in_threadpool(self.sync_session.close)
+
+class SyncStreamedResult:
+    """Async partitions() over a blocking Result, like AsyncResult's"""
+
+    def __init__(self, result):
+        self.result = result
+
+    async def partitions(self, size: Optional[int] = None):
+        partitions = self.result.partitions(size)
+        while True:
+            rows = await run_in_threadpool(next, partitions, None)
+            if rows is None:
+                return
+            yield rows
+
+async def get_db():
     """Dependency to get database session"""
-    db = SessionLocal()
+    if DB_MODE == "async":
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+
+    db = SyncSessionAdapter(SessionLocal())
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        await db.close()
+
+# Session for work outside a request (background tasks)
+db_session = asynccontextmanager(get_db)
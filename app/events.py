@@ -0,0 +1,245 @@
+import asyncio
+import itertools
+import json
+import os
+import time
+from collections import deque
+from typing import Dict, List, Optional, Set, Tuple
+from prometheus_client import Counter, Gauge
+from app.redis_client import redis_client
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Change feed behind /todos/events: handlers publish an event per changed
+# todo; every worker holds one Redis subscription and hands events to its
+# own SSE/WebSocket subscribers, so an idle subscriber costs a queue, not a
+# connection. Each user's recent events are also kept in a Redis stream so
+# reconnecting clients can resume after their last event id. Without Redis
+# events only reach subscribers of the worker that published them.
+
+# Events kept per user for resuming (approximate; Redis trims in whole nodes)
+EVENTS_BACKLOG = int(os.getenv("EVENTS_BACKLOG", 1000))
+# Seconds a user's backlog outlives their last event
+EVENTS_TTL = int(os.getenv("EVENTS_TTL", 86400))
+# Seconds between keep-alive comments on idle SSE streams
+EVENTS_HEARTBEAT = float(os.getenv("EVENTS_HEARTBEAT", 15))
+# Events a subscriber may fall behind by before it is disconnected (it
+# resumes from its last event id on reconnect)
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", 256))
+
+EVENTS_NAMESPACE = "events"
+EVENTS_CHANNEL = f"{EVENTS_NAMESPACE}:todos"
+
+EVENTS_PUBLISHED = Counter("todo_events_published_total", "Change events published", ["backend"])
+EVENTS_SUBSCRIBERS = Gauge("todo_events_subscribers", "Open /todos/events connections in this worker")
+
+# KEYS[1]: the user's stream. ARGV: backlog, ttl, channel, user id, event JSON.
+# Appends the event and announces "<user id> <event id> <event JSON>".
+PUBLISH_SCRIPT = """
+local id = redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[1], '*', 'data', ARGV[5])
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+redis.call('PUBLISH', ARGV[3], ARGV[4] .. ' ' .. id .. ' ' .. ARGV[5])
+return id
+"""
+
+# Sent (with no id) when a subscriber may have missed events and should refetch
+RESYNC = (None, '{"type": "resync"}')
+
+def stream_key(user_id: int) -> str:
+    return f"{EVENTS_NAMESPACE}:user:{user_id}"
+
+def parse_event_id(event_id: Optional[str]) -> Optional[Tuple[int, int]]:
+    """"<ms>-<seq>" -> (ms, seq); None for missing or malformed ids"""
+    try:
+        ms, _, seq = event_id.partition("-")
+        return int(ms), int(seq or 0)
+    except (AttributeError, ValueError):
+        return None
+
+class Subscription:
+    """One open event stream: a bounded queue of (event id, event JSON)"""
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.queue = asyncio.Queue(maxsize=EVENTS_QUEUE_SIZE)
+        self.overflowed = False
+
+    def put(self, event: Tuple[Optional[str], str]):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too slow: end the stream, the client resumes from its last id
+            self.overflowed = True
+
+class EventBroker:
+    """Subscriptions of this worker plus the in-memory fallback backlog"""
+
+    def __init__(self, backlog: int = EVENTS_BACKLOG):
+        self.backlog = backlog
+        self.subscribers: Dict[int, Set[Subscription]] = {}
+        # Used while Redis is unavailable
+        self.local_events: Dict[int, deque] = {}
+        self._sequence = itertools.count()
+
+    def subscribe(self, user_id: int) -> Subscription:
+        subscription = Subscription(user_id)
+        self.subscribers.setdefault(user_id, set()).add(subscription)
+        EVENTS_SUBSCRIBERS.inc()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self.subscribers.get(subscription.user_id)
+        if subscribers is not None and subscription in subscribers:
+            subscribers.discard(subscription)
+            EVENTS_SUBSCRIBERS.dec()
+            if not subscribers:
+                del self.subscribers[subscription.user_id]
+
+    def dispatch(self, user_id: int, event: Tuple[Optional[str], str]):
+        for subscription in self.subscribers.get(user_id, ()):
+            subscription.put(event)
+
+    def resync_all(self):
+        """Tell every local subscriber it may have missed events"""
+        for subscribers in self.subscribers.values():
+            for subscription in subscribers:
+                subscription.put(RESYNC)
+
+    def publish_local(self, user_id: int, data: str):
+        event = (f"{int(time.time() * 1000)}-{next(self._sequence)}", data)
+        events = self.local_events.get(user_id)
+        if events is None:
+            events = self.local_events[user_id] = deque(maxlen=self.backlog)
+        events.append(event)
+        self.dispatch(user_id, event)
+
+    def local_backlog(self, user_id: int, after: Tuple[int, int]) -> Tuple[List[Tuple[str, str]], bool]:
+        events = list(self.local_events.get(user_id, ()))
+        complete = bool(events) and parse_event_id(events[0][0]) <= after
+        return [event for event in events if parse_event_id(event[0]) > after], complete
+
+broker = EventBroker()
+publish_script = None
+
+async def publish_events(user_id: int, events: List[dict]):
+    """Publish a user's change events (e.g. {"type": "updated", "todo": {...}})"""
+    global publish_script
+    if not events:
+        return
+    payloads = [json.dumps(event, default=str) for event in events]
+    if redis_client.is_connected():
+        if publish_script is None:
+            publish_script = redis_client.client.register_script(PUBLISH_SCRIPT)
+
+        async def publish(r):
+            # One round trip however many events
+            async with r.pipeline(transaction=False) as pipe:
+                for data in payloads:
+                    await publish_script(
+                        keys=[stream_key(user_id)],
+                        args=[EVENTS_BACKLOG, EVENTS_TTL, EVENTS_CHANNEL, user_id, data],
+                        client=pipe,
+                    )
+                return await pipe.execute()
+
+        try:
+            await redis_client.run(publish)
+            EVENTS_PUBLISHED.labels("redis").inc(len(payloads))
+            return
+        except Exception as e:
+            print(f"Event publish error, delivering in-process only: {e}")
+    for data in payloads:
+        broker.publish_local(user_id, data)
+    EVENTS_PUBLISHED.labels("local").inc(len(payloads))
+
+async def events_after(user_id: int, last_event_id: str) -> Tuple[List[Tuple[str, str]], bool]:
+    """Backlog events after last_event_id, and whether nothing in between was
+    trimmed away (if not, the client should refetch)"""
+    after = parse_event_id(last_event_id)
+    if after is None:
+        return [], False
+    if redis_client.is_connected():
+        try:
+            key = stream_key(user_id)
+
+            async def read_backlog(r):
+                async with r.pipeline(transaction=False) as pipe:
+                    pipe.xrange(key, "-", "+", count=1)
+                    pipe.xrange(key, f"({after[0]}-{after[1]}", "+", count=EVENTS_BACKLOG)
+                    return await pipe.execute()
+
+            oldest, entries = await redis_client.run(read_backlog)
+            complete = bool(oldest) and parse_event_id(oldest[0][0]) <= after
+            return [(event_id, fields["data"]) for event_id, fields in entries], complete
+        except Exception as e:
+            print(f"Event backlog error: {e}")
+    return broker.local_backlog(user_id, after)
+
+def handle_event_message(message: dict):
+    """Hand an announced event to this worker's subscribers of its user"""
+    try:
+        user_id, event_id, data = message["data"].split(" ", 2)
+        user_id = int(user_id)
+    except (AttributeError, ValueError):
+        return
+    broker.dispatch(user_id, (event_id, data))
+
+async def listen_for_events(retry_delay: float = 5.0):
+    """Fan events from every worker out to this worker's subscribers until
+    cancelled. Subscribers are told to resync whenever the subscription
+    (re)starts, since events published in the meantime never reached them.
+    """
+    while True:
+        if not redis_client.is_connected():
+            await asyncio.sleep(retry_delay)
+            continue
+        pubsub = redis_client.client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(EVENTS_CHANNEL)
+            broker.resync_all()
+            while True:
+                message = await pubsub.get_message(timeout=1.0)
+                if message is not None:
+                    handle_event_message(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Event listener error: {e}")
+            await asyncio.sleep(retry_delay)
+        finally:
+            await pubsub.aclose()
+
+async def stream_events(subscription: Subscription, last_event_id: Optional[str] = None):
+    """Yield (event id, event JSON) for a subscription: the backlog after
+    last_event_id first (or a resync if it is gone), then live events;
+    (None, None) after EVENTS_HEARTBEAT idle seconds. Ends if the
+    subscriber falls too far behind.
+
+    Subscribe before calling, so nothing published during the backlog read
+    is lost; events seen twice are skipped by id.
+    """
+    delivered = None
+    if last_event_id:
+        backlog, complete = await events_after(subscription.user_id, last_event_id)
+        if not complete:
+            yield RESYNC
+        for event in backlog:
+            delivered = parse_event_id(event[0])
+            yield event
+        if delivered is None:
+            delivered = parse_event_id(last_event_id)
+    while not subscription.overflowed:
+        try:
+            event = await asyncio.wait_for(subscription.queue.get(), EVENTS_HEARTBEAT)
+        except asyncio.TimeoutError:
+            yield None, None
+            continue
+        event_id = parse_event_id(event[0])
+        if event_id is not None and delivered is not None and event_id <= delivered:
+            continue
+        if event_id is not None:
+            delivered = event_id
+        yield event
@@ -0,0 +1,66 @@
+import asyncio
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+from PIL import Image, ImageOps
+
+# Resized WebP copies of todo images, stored next to the original as
+# "<original name>.<variant>.webp". Decoding and encoding run in worker
+# processes so large images never hold up the event loop (or the GIL).
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", 2))
+# variant -> longest side in pixels
+IMAGE_VARIANTS = {"thumb": 320, "large": 1600}
+WEBP_QUALITY = int(os.getenv("WEBP_QUALITY", 80))
+
+# Refuse to decode images big enough to exhaust a worker's memory
+Image.MAX_IMAGE_PIXELS = 50_000_000
+
+image_pool: Optional[ProcessPoolExecutor] = None
+
+def derivative_name(name: str, variant: str) -> str:
+    return f"{name}.{variant}.webp"
+
+def parse_derivative(name: str) -> Optional[Tuple[str, str]]:
+    """(original name, variant) if name is a derivative's name. Derivatives
+    are only made from originals, so "<derivative>.<variant>.webp" is none."""
+    parts = name.rsplit(".", 2)
+    if len(parts) == 3 and parts[2] == "webp" and parts[1] in IMAGE_VARIANTS and parts[0]:
+        if parse_derivative(parts[0]) is None:
+            return parts[0], parts[1]
+    return None
+
+def render_webp(data: bytes, max_side: int) -> bytes:
+    """Scale an image to fit max_side and encode it as WebP (in a worker process)"""
+    with Image.open(io.BytesIO(data)) as image:
+        # Apply camera rotation, then keep only the first frame
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_side, max_side))
+        if image.mode not in ("RGB", "RGBA"):
+            has_alpha = image.mode in ("LA", "P", "PA") or "transparency" in image.info
+            image = image.convert("RGBA" if has_alpha else "RGB")
+        output = io.BytesIO()
+        image.save(output, "WEBP", quality=WEBP_QUALITY, method=4)
+        return output.getvalue()
+
+def get_image_pool() -> ProcessPoolExecutor:
+    global image_pool
+    if image_pool is None:
+        # spawn: forking a process that runs threads (uvicorn, threadpool)
+        # can copy held locks into the child
+        image_pool = ProcessPoolExecutor(
+            max_workers=IMAGE_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return image_pool
+
+async def render_variant(data: bytes, variant: str) -> bytes:
+    """Render one derivative of an image in the process pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_image_pool(), render_webp, data, IMAGE_VARIANTS[variant])
+
+def shutdown_image_pool():
+    global image_pool
+    if image_pool is not None:
+        image_pool.shutdown(wait=False, cancel_futures=True)
+        image_pool = None
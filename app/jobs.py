@@ -0,0 +1,358 @@
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from prometheus_client import Counter
+from app.redis_client import redis_client
+
+# Background jobs: slow work (calendar sync, exports, imports, image
+# derivatives) runs outside the request that asked for it. Jobs live in
+# Redis so any process's workers can run them and any process can report
+# on them; while Redis is unavailable they fall back to an in-memory queue
+# run by the accepting process only.
+
+# Worker tasks per API process (they also run the in-memory fallback queue,
+# so keep at least one); `python -m app.worker` runs more in its own process
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+# Seconds before retry n is base * 2**(n-1) (with jitter), capped
+JOB_RETRY_BASE = float(os.getenv("JOB_RETRY_BASE", 5))
+JOB_RETRY_MAX = float(os.getenv("JOB_RETRY_MAX", 300))
+# Jobs one user may have running at once; more wait their turn
+JOB_USER_CONCURRENCY = int(os.getenv("JOB_USER_CONCURRENCY", 1))
+# Seconds a job (and its result) can be looked up after its last change
+JOB_TTL = int(os.getenv("JOB_TTL", 86400))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", 1.0))
+# Longest a job is expected to run (progress updates extend it): a crashed
+# worker's per-user slot frees up, and its job is queued again, after it
+JOB_LEASE = int(os.getenv("JOB_LEASE", 900))
+
+JOB_NAMESPACE = "jobs"
+QUEUE_KEY = f"{JOB_NAMESPACE}:queue"
+# Retries and deferred jobs, scored by when they may run
+DELAYED_KEY = f"{JOB_NAMESPACE}:delayed"
+# Jobs taken off the queue whose outcome is not saved yet, and when each
+# one's lease runs out; a job whose worker died goes back on the queue then
+PROCESSING_KEY = f"{JOB_NAMESPACE}:processing"
+LEASES_KEY = f"{JOB_NAMESPACE}:leases"
+FINISHED = ("succeeded", "failed")
+
+JOBS_FINISHED = Counter("todo_jobs_finished_total", "Background job attempts by outcome", ["kind", "status"])
+
+class JobError(Exception):
+    """Fails a job without retrying it"""
+
+class Job:
+    """What a handler gets to know about (and report on) its job"""
+
+    def __init__(self, record: dict):
+        self.record = record
+
+    @property
+    def id(self) -> str:
+        return self.record["id"]
+
+    @property
+    def user_id(self) -> Optional[int]:
+        return self.record["user_id"]
+
+    async def progress(self, **fields):
+        """Publish progress (e.g. done=, total=) for GET /jobs/{id}"""
+        self.record["progress"] = fields
+        await save_job(self.record)
+        if self.record["backend"] != "local":
+            await redis_client.run(lambda r: r.zadd(LEASES_KEY, {self.id: time.time() + JOB_LEASE}, xx=True))
+
+# kind -> async handler(job, **payload) returning a JSON-serializable result
+handlers: Dict[str, Callable[..., Awaitable[Any]]] = {}
+
+# In-memory fallback (this process only)
+local_jobs: Dict[str, dict] = {}
+local_queue: Optional[asyncio.Queue] = None
+local_running: Dict[int, int] = {}
+
+def job_handler(kind: str):
+    """Register the decorated coroutine as the handler for a job kind"""
+    def decorator(func):
+        handlers[kind] = func
+        return func
+    return decorator
+
+def job_key(job_id: str) -> str:
+    return f"{JOB_NAMESPACE}:{job_id}"
+
+def running_key(user_id: int) -> str:
+    return f"{JOB_NAMESPACE}:running:{user_id}"
+
+def now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+def get_local_queue() -> asyncio.Queue:
+    global local_queue
+    if local_queue is None:
+        local_queue = asyncio.Queue()
+    return local_queue
+
+def prune_local_jobs():
+    """Forget finished in-memory jobs older than JOB_TTL"""
+    cutoff = time.time() - JOB_TTL
+    for job_id, record in list(local_jobs.items()):
+        if record["status"] in FINISHED and record["finished"] < cutoff:
+            del local_jobs[job_id]
+
+async def save_job(record: dict):
+    record["updated_at"] = now_iso()
+    if record["backend"] == "local":
+        local_jobs[record["id"]] = record
+        return
+    data = json.dumps(record, default=str)
+    await redis_client.run(lambda r: r.set(job_key(record["id"]), data, ex=JOB_TTL))
+
+async def get_job(job_id: str) -> Optional[dict]:
+    record = local_jobs.get(job_id)
+    if record is not None or not redis_client.is_connected():
+        return record
+    try:
+        data = await redis_client.run(lambda r: r.get(job_key(job_id)))
+    except Exception as e:
+        print(f"Job lookup error: {e}")
+        return None
+    return json.loads(data) if data else None
+
+async def push_job(record: dict, delay: float = 0):
+    """Put a job (back) on its queue, runnable after delay seconds"""
+    if record["backend"] == "local":
+        if delay:
+            asyncio.get_running_loop().call_later(delay, get_local_queue().put_nowait, record["id"])
+        else:
+            get_local_queue().put_nowait(record["id"])
+    elif delay:
+        await redis_client.run(lambda r: r.zadd(DELAYED_KEY, {record["id"]: time.time() + delay}))
+    else:
+        await redis_client.run(lambda r: r.lpush(QUEUE_KEY, record["id"]))
+
+async def enqueue_job(
+    kind: str,
+    payload: Optional[dict] = None,
+    user_id: Optional[int] = None,
+    max_attempts: int = JOB_MAX_ATTEMPTS,
+    job_id: Optional[str] = None,
+) -> dict:
+    """Queue a job for handlers[kind]; returns its record"""
+    record = {
+        "id": job_id or uuid.uuid4().hex,
+        "kind": kind,
+        "user_id": user_id,
+        "payload": payload or {},
+        "status": "queued",
+        "attempts": 0,
+        "max_attempts": max_attempts,
+        "progress": None,
+        "result": None,
+        "error": None,
+        "created_at": now_iso(),
+        "backend": "redis",
+    }
+    if redis_client.is_connected():
+        try:
+            await save_job(record)
+            await push_job(record)
+            return record
+        except Exception as e:
+            print(f"Job queue error, running {kind} job in-process: {e}")
+    prune_local_jobs()
+    record["backend"] = "local"
+    await save_job(record)
+    await push_job(record)
+    return record
+
+async def promote_delayed(r):
+    """Move delayed jobs whose time has come onto the queue"""
+    for job_id in await r.zrangebyscore(DELAYED_KEY, 0, time.time(), start=0, num=100):
+        # Whichever worker removes it gets to queue it
+        if await r.zrem(DELAYED_KEY, job_id):
+            await r.lpush(QUEUE_KEY, job_id)
+
+async def requeue_expired(r):
+    """Put jobs whose lease ran out (their worker died) back on the queue"""
+    now = time.time()
+    for job_id in await r.zrangebyscore(LEASES_KEY, 0, now, start=0, num=100):
+        # Whichever worker removes it gets to queue it
+        if await r.lrem(PROCESSING_KEY, 1, job_id):
+            await r.lpush(QUEUE_KEY, job_id)
+        await r.zrem(LEASES_KEY, job_id)
+    # Workers record the lease right after taking a job; start it for one
+    # that died in between so its job isn't stuck in processing for good
+    processing = await r.lrange(PROCESSING_KEY, 0, -1)
+    if processing:
+        async with r.pipeline() as pipe:
+            for job_id in processing:
+                pipe.zadd(LEASES_KEY, {job_id: now + JOB_LEASE}, nx=True)
+            await pipe.execute()
+
+async def take_job(r) -> Optional[str]:
+    """Move the oldest queued job to the processing list and start its lease"""
+    job_id = await r.lmove(QUEUE_KEY, PROCESSING_KEY, "RIGHT", "LEFT")
+    if job_id:
+        await r.zadd(LEASES_KEY, {job_id: time.time() + JOB_LEASE})
+    return job_id
+
+async def ack_job(record: dict):
+    """Take a job off the processing list once its outcome is saved"""
+    if record["backend"] == "local":
+        return
+
+    async def remove(r):
+        async with r.pipeline() as pipe:
+            pipe.lrem(PROCESSING_KEY, 1, record["id"])
+            pipe.zrem(LEASES_KEY, record["id"])
+            await pipe.execute()
+
+    await redis_client.run(remove)
+
+async def next_job() -> Optional[dict]:
+    """The next runnable job, or None after JOB_POLL_INTERVAL without one"""
+    queue = get_local_queue()
+    if not queue.empty():
+        return local_jobs.get(queue.get_nowait())
+    if redis_client.is_connected():
+        try:
+            await redis_client.run(promote_delayed)
+            await redis_client.run(requeue_expired)
+            job_id = await redis_client.run(take_job)
+            if job_id:
+                record = await get_job(job_id)
+                if record is None:
+                    # Its record expired: nothing left to run
+                    await ack_job({"id": job_id, "backend": "redis"})
+                return record
+        except Exception as e:
+            print(f"Job queue error: {e}")
+    try:
+        return local_jobs.get(await asyncio.wait_for(queue.get(), JOB_POLL_INTERVAL))
+    except asyncio.TimeoutError:
+        return None
+
+async def acquire_slot(record: dict) -> bool:
+    """Claim one of the user's JOB_USER_CONCURRENCY running slots"""
+    user_id = record["user_id"]
+    if user_id is None:
+        return True
+    if record["backend"] == "local":
+        if local_running.get(user_id, 0) >= JOB_USER_CONCURRENCY:
+            return False
+        local_running[user_id] = local_running.get(user_id, 0) + 1
+        return True
+
+    key = running_key(user_id)
+
+    async def incr_with_lease(r):
+        async with r.pipeline() as pipe:
+            pipe.incr(key)
+            pipe.expire(key, JOB_LEASE)
+            return (await pipe.execute())[0]
+
+    if await redis_client.run(incr_with_lease) <= JOB_USER_CONCURRENCY:
+        return True
+    await redis_client.run(lambda r: r.decr(key))
+    return False
+
+async def release_slot(record: dict):
+    user_id = record["user_id"]
+    if user_id is None:
+        return
+    if record["backend"] == "local":
+        local_running[user_id] -= 1
+        if not local_running[user_id]:
+            del local_running[user_id]
+        return
+    await redis_client.run(lambda r: r.decr(running_key(user_id)))
+
+def retry_delay(attempt: int) -> float:
+    delay = min(JOB_RETRY_MAX, JOB_RETRY_BASE * 2 ** (attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+async def finish_job(record: dict, delay: Optional[float] = None):
+    """Save the outcome of a job's attempt, queue the retry if there is one,
+    then take the job off the processing list"""
+    if record["status"] in FINISHED:
+        record["finished"] = time.time()
+    JOBS_FINISHED.labels(record["kind"], record["status"]).inc()
+    await save_job(record)
+    if delay is not None:
+        await push_job(record, delay)
+    await ack_job(record)
+
+async def run_job(record: dict):
+    """Run one attempt of a job, then record its outcome or schedule a retry"""
+    if record["status"] == "running":
+        # Its last worker died mid-attempt (see requeue_expired)
+        record["error"] = "Worker lost while running the job"
+        if record["attempts"] >= record["max_attempts"]:
+            record["status"] = "failed"
+            await finish_job(record)
+            return
+    handler = handlers.get(record["kind"])
+    if not await acquire_slot(record):
+        # The user's other jobs come first
+        await push_job(record, JOB_POLL_INTERVAL)
+        await ack_job(record)
+        return
+    record["status"] = "running"
+    record["attempts"] += 1
+    delay = None
+    try:
+        await save_job(record)
+        if handler is None:
+            raise JobError(f"No handler for job kind {record['kind']!r}")
+        result = await handler(Job(record), **record["payload"])
+    except asyncio.CancelledError:
+        # Shutting down: leave it for another worker
+        record["status"] = "queued"
+        try:
+            if record["backend"] != "local":
+                await save_job(record)
+                await push_job(record)
+                await ack_job(record)
+            await release_slot(record)
+        except Exception:
+            pass
+        raise
+    except Exception as e:
+        record["error"] = str(e) or type(e).__name__
+        if isinstance(e, JobError) or record["attempts"] >= record["max_attempts"]:
+            record["status"] = "failed"
+        else:
+            record["status"] = "retrying"
+            delay = retry_delay(record["attempts"])
+    else:
+        record["result"] = result
+        record["status"] = "succeeded"
+        record["error"] = None
+
+    # The outcome is saved even if the slot can't be released; until it is,
+    # the job stays on the processing list and runs again after its lease
+    try:
+        await release_slot(record)
+    finally:
+        await finish_job(record, delay)
+
+async def run_job_worker():
+    """Take jobs off the queues and run them until cancelled"""
+    while True:
+        try:
+            record = await next_job()
+            if record is not None:
+                await run_job(record)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Job worker error: {e}")
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+
+def start_job_workers(count: int = JOB_WORKERS) -> List[asyncio.Task]:
+    return [asyncio.create_task(run_job_worker()) for _ in range(count)]
@@ -0,0 +1,124 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Any
+from prometheus_client import Counter, Gauge
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LOCAL_CACHE_MAX_ENTRIES = int(os.getenv("LOCAL_CACHE_MAX_ENTRIES", 1000))
+# Upper bound on how long a worker may serve an entry without asking Redis;
+# also bounds staleness if an invalidation broadcast is missed
+LOCAL_CACHE_TTL = int(os.getenv("LOCAL_CACHE_TTL", 10))
+# Namespaces whose generation is remembered; beyond this the least recently
+# bumped half is forgotten (see bump_generation)
+LOCAL_CACHE_MAX_GENERATIONS = int(os.getenv("LOCAL_CACHE_MAX_GENERATIONS", 10000))
+
+LOCAL_CACHE_EVICTIONS = Counter(
+    "todo_local_cache_evictions_total", "In-process cache entries dropped", ["reason"]
+)
+
+class LocalCache:
+    """Size-bounded LRU cache with per-entry TTL, private to one worker process.
+
+    Namespaces (e.g. one user's todo lists) have a local generation number
+    that callers embed in their keys; bumping it invalidates the namespace
+    in O(1) and the orphaned entries fall out through LRU/TTL. Generations
+    come from one counter, so a generation once replaced is never current
+    again, even after its namespace has been forgotten.
+    """
+
+    def __init__(self, max_entries: int = LOCAL_CACHE_MAX_ENTRIES, ttl: int = LOCAL_CACHE_TTL,
+                 max_generations: int = LOCAL_CACHE_MAX_GENERATIONS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_generations = max_generations
+        self._entries = OrderedDict()
+        # Bumped namespaces, least recently bumped first
+        self._generations = OrderedDict()
+        # Last generation handed out, and the one of namespaces not in _generations
+        self._clock = 0
+        self._base = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get cached value, refreshing its LRU position"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                LOCAL_CACHE_EVICTIONS.labels("expired").inc()
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        """Set cache entry; ttl is capped at the local TTL"""
+        ttl = min(ttl or self.ttl, self.ttl)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+                LOCAL_CACHE_EVICTIONS.labels("capacity").inc()
+
+    def generation(self, namespace: str) -> int:
+        """Current local generation of a namespace"""
+        return self._generations.get(namespace, self._base)
+
+    def bump_generation(self, namespace: str) -> int:
+        """Invalidate every local entry keyed with the current generation"""
+        with self._lock:
+            self._clock += 1
+            generation = self._clock
+            self._generations[namespace] = generation
+            self._generations.move_to_end(namespace)
+            if len(self._generations) > self.max_generations:
+                # Forget the least recently bumped half in one go. They fall
+                # back to a fresh base generation, which also retires entries
+                # of namespaces never bumped, so no old key becomes live again
+                for _ in range(len(self._generations) - self.max_generations // 2):
+                    self._generations.popitem(last=False)
+                self._clock += 1
+                self._base = self._clock
+            return generation
+
+    def clear(self):
+        """Drop all entries (generations keep counting so old keys stay dead)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "generations": len(self._generations),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+# Per-process cache instance
+local_cache = LocalCache()
+
+Gauge("todo_local_cache_entries", "Entries in this worker's in-process cache").set_function(
+    lambda: len(local_cache)
+)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import BigInteger, Column, Integer, String, Boolean, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -18,11 +18,25 @@ class User(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     # Google Calendar OAuth tokens (stored as JSON string)
     google_calendar_token = Column(String, nullable=True)
+    # Last version handed to one of the user's todos (see app/todo_sync.py)
+    todo_version = Column(BigInteger, nullable=False, default=0, server_default="0")
+    # Highest version among the user's purged tombstones: sync tokens below
+    # it may have missed deletions
+    todo_purged_version = Column(BigInteger, nullable=False, default=0, server_default="0")
     # Relationship with todos
     todos = relationship("Todo", back_populates="owner", cascade="all, delete-orphan")
 
 class Todo(Base):
     __tablename__ = "todos"
+    # Every todo query is scoped to one owner; these serve list ordering/keyset
+    # paging and the completed/priority filters. The full-text search index
+    # (tsvector on PostgreSQL, FTS5 on SQLite) lives in the migrations.
+    __table_args__ = (
+        Index("ix_todos_owner_created_id", "owner_id", "created_at", "id"),
+        Index("ix_todos_owner_completed", "owner_id", "completed"),
+        Index("ix_todos_owner_priority", "owner_id", "priority"),
+        Index("ix_todos_owner_version_id", "owner_id", "version", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
@@ -36,9 +50,29 @@ class Todo(Base):
     image = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # The owner's todo_version when the todo last changed; GET /todos/changes
+    # returns the todos above a client's sync token
+    version = Column(BigInteger, nullable=False, default=0, server_default="0")
+    # Deleted todos are kept as tombstones (until TODO_TOMBSTONE_TTL) so
+    # syncing clients learn about deletions; every other query skips them
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
     
     # Foreign key to users table
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     
     # Relationship with user
-    owner = relationship("User", back_populates="todos")
\ No newline at end of file
+    owner = relationship("User", back_populates="todos")
+
+class CalendarEvent(Base):
+    """The Google Calendar event calendar sync created for a todo"""
+    __tablename__ = "calendar_events"
+
+    id = Column(Integer, primary_key=True)
+    # Not a foreign key: the row outlives a deleted todo until sync removes its event
+    todo_id = Column(Integer, unique=True, nullable=False)
+    owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), index=True, nullable=False)
+    event_id = Column(String, nullable=False)
+    etag = Column(String, nullable=True)
+    # event_fingerprint() of the todo the event was last synced from
+    synced_hash = Column(String, nullable=True)
+    synced_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,359 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from jose import JWTError, jwt
+from prometheus_client import Counter
+from starlette.routing import Match
+from app.auth import SECRET_KEY, ALGORITHM
+from app.redis_client import redis_client
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Rate limiting: every request is counted against the default policy (or
+# its path's own budget, see RATE_LIMIT_PATHS) and, if its endpoint declares one with @rate_limit, against that policy too.
+# Counters are sliding windows (this window's count plus the previous
+# window's, weighted by how much of it still overlaps) kept in Redis and
+# updated for all of a request's policies by one Lua script call. While
+# Redis is unavailable each worker enforces the limits on its own.
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+# "<requests>/<seconds>" per user (per IP for anonymous requests) across all routes
+RATE_LIMIT_DEFAULT = os.getenv("RATE_LIMIT_DEFAULT", "600/60")
+# Per-endpoint overrides, e.g. "create_todo=100/3600,login_user=20/60"
+RATE_LIMIT_OVERRIDES = os.getenv("RATE_LIMIT_OVERRIDES", "")
+# Paths that are never limited (prefix match)
+RATE_LIMIT_EXEMPT = tuple(p for p in os.getenv("RATE_LIMIT_EXEMPT", "/metrics").split(",") if p)
+# Paths counted against their own budget instead of the default policy
+# (prefix match), e.g. the images one page fetches by the dozen
+RATE_LIMIT_PATHS = os.getenv("RATE_LIMIT_PATHS", "/uploads/=3000/60")
+# Take the client IP from X-Forwarded-For (only behind proxies that append
+# to it, and only if clients can't reach the app around them), and how many
+# of those proxies there are: the entries they appended are the last ones,
+# anything before them is whatever the client sent
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() == "true"
+RATE_LIMIT_TRUSTED_PROXIES = int(os.getenv("RATE_LIMIT_TRUSTED_PROXIES", 1))
+# Counters the in-process fallback keeps before dropping the least recently used
+RATE_LIMIT_LOCAL_MAX_KEYS = int(os.getenv("RATE_LIMIT_LOCAL_MAX_KEYS", 10000))
+
+RATE_LIMIT_NAMESPACE = "ratelimit"
+
+RATE_LIMIT_DECISIONS = Counter(
+    "todo_rate_limit_decisions_total", "Rate limit checks by outcome", ["policy", "outcome", "backend"]
+)
+
+# KEYS: current and previous window counter of each policy, in pairs.
+# ARGV: limit, window and previous-window weight of each policy, in triples.
+# Returns {allowed, previous_1, current_1, previous_2, current_2, ...};
+# counters are only incremented when every policy allows the request.
+SLIDING_WINDOW_SCRIPT = """
+local allowed = 1
+local counts = {}
+for i = 1, #KEYS / 2 do
+    local current = tonumber(redis.call('GET', KEYS[2 * i - 1]) or '0')
+    local previous = tonumber(redis.call('GET', KEYS[2 * i]) or '0')
+    local limit = tonumber(ARGV[3 * i - 2])
+    local weight = tonumber(ARGV[3 * i])
+    if previous * weight + current + 1 > limit then
+        allowed = 0
+    end
+    counts[2 * i - 1] = previous
+    counts[2 * i] = current
+end
+if allowed == 1 then
+    for i = 1, #KEYS / 2 do
+        counts[2 * i] = redis.call('INCR', KEYS[2 * i - 1])
+        if counts[2 * i] == 1 then
+            redis.call('EXPIRE', KEYS[2 * i - 1], 2 * tonumber(ARGV[3 * i - 1]))
+        end
+    end
+end
+table.insert(counts, 1, allowed)
+return counts
+"""
+
+class RateLimitPolicy:
+    """At most `limit` requests per `window` seconds per user or per IP"""
+
+    def __init__(self, name: str, limit: int, window: int, key: str = "user"):
+        if key not in ("user", "ip"):
+            raise ValueError(f"Rate limit key must be 'user' or 'ip', not {key!r}")
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.key = key
+
+    def __repr__(self) -> str:
+        return f"RateLimitPolicy({self.name!r}, {self.limit}/{self.window}s by {self.key})"
+
+def parse_rate(value: str) -> Tuple[int, int]:
+    """'<requests>/<seconds>' -> (requests, seconds)"""
+    requests, _, seconds = value.partition("/")
+    return int(requests), int(seconds or 60)
+
+def parse_overrides(value: str) -> Dict[str, Tuple[int, int]]:
+    overrides = {}
+    for item in value.split(","):
+        name, _, rate = item.strip().partition("=")
+        if name and rate:
+            overrides[name] = parse_rate(rate)
+    return overrides
+
+overrides = parse_overrides(RATE_LIMIT_OVERRIDES)
+default_policy = RateLimitPolicy("default", *parse_rate(RATE_LIMIT_DEFAULT))
+path_policies = [
+    (prefix, RateLimitPolicy(prefix.strip("/") or "root", *rate))
+    for prefix, rate in parse_overrides(RATE_LIMIT_PATHS).items()
+]
+
+def base_policy(path: str) -> RateLimitPolicy:
+    """The policy every request to path counts against"""
+    for prefix, policy in path_policies:
+        if path.startswith(prefix):
+            return policy
+    return default_policy
+
+def rate_limit(max_requests: int = 100, window: int = 3600, key: str = "user"):
+    """Declare a rate limit for an endpoint, enforced by RateLimitMiddleware.
+
+    key="user" counts per authenticated user (per IP when the request has
+    no valid token); key="ip" always counts per client IP. The endpoint's
+    name can be given a different rate with RATE_LIMIT_OVERRIDES.
+    """
+    def decorator(func):
+        limit, seconds = overrides.get(func.__name__, (max_requests, window))
+        func.rate_limit_policy = RateLimitPolicy(func.__name__, limit, seconds, key)
+        return func
+    return decorator
+
+class RateLimitResult:
+    """Outcome of one check against a set of policies"""
+
+    def __init__(self, allowed: bool, limit: int, window: int, remaining: int, reset: int, retry_after: int):
+        self.allowed = allowed
+        self.limit = limit
+        self.window = window
+        self.remaining = remaining
+        self.reset = reset
+        self.retry_after = retry_after
+
+    def headers(self) -> List[Tuple[bytes, bytes]]:
+        headers = [
+            (b"ratelimit-limit", str(self.limit).encode()),
+            (b"ratelimit-remaining", str(self.remaining).encode()),
+            (b"ratelimit-reset", str(self.reset).encode()),
+            (b"ratelimit-policy", f"{self.limit};w={self.window}".encode()),
+        ]
+        if not self.allowed:
+            headers.append((b"retry-after", str(self.retry_after).encode()))
+        return headers
+
+def window_position(window: int, now: float) -> Tuple[int, float]:
+    """(index of the current window, weight of the previous window's count)"""
+    index = int(now // window)
+    elapsed = now - index * window
+    return index, (window - elapsed) / window
+
+def seconds_until_allowed(limit: int, window: int, weight: float, previous: int, current: int) -> float:
+    """How long until one more request would fit under the limit"""
+    to_window_end = weight * window
+    if current < limit:
+        if not previous:
+            return 0.0
+        # The previous window's share shrinks linearly until the window ends
+        return max(0.0, to_window_end - (limit - current - 1) * window / previous)
+    # This window alone is full: wait for it to become the previous one and decay
+    return to_window_end + max(0.0, window - (limit - 1) * window / current)
+
+def summarize(
+    policies: List[RateLimitPolicy], weights: List[float], counts: List[Tuple[int, int]], allowed: bool
+) -> RateLimitResult:
+    """Build the result reported for the most constrained policy"""
+    tightest = None
+    for policy, weight, (previous, current) in zip(policies, weights, counts):
+        used = previous * weight + current
+        remaining = max(0, math.floor(policy.limit - used))
+        retry = seconds_until_allowed(policy.limit, policy.window, weight, previous, current)
+        candidate = (remaining, -retry, policy, weight, retry)
+        if tightest is None or candidate[:2] < tightest[:2]:
+            tightest = candidate
+    remaining, _, policy, weight, retry = tightest
+    retry_after = max(1, math.ceil(retry)) if not allowed else 0
+    return RateLimitResult(
+        allowed=allowed,
+        limit=policy.limit,
+        window=policy.window,
+        remaining=remaining,
+        # Seconds until the current window closes and its count starts to decay
+        reset=max(1, math.ceil(weight * policy.window)),
+        retry_after=retry_after,
+    )
+
+class LocalRateLimiter:
+    """Sliding-window counters for one worker process (used without Redis)"""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_LOCAL_MAX_KEYS):
+        self.max_keys = max_keys
+        # key -> [window index, previous count, current count]
+        self._counters = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _counter(self, key: str, index: int) -> list:
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = self._counters[key] = [index, 0, 0]
+            if len(self._counters) > self.max_keys:
+                self._counters.popitem(last=False)
+        else:
+            self._counters.move_to_end(key)
+        if counter[0] != index:
+            # Roll forward; a gap of more than one window leaves nothing behind
+            counter[1] = counter[2] if counter[0] == index - 1 else 0
+            counter[2] = 0
+            counter[0] = index
+        return counter
+
+    def hit(self, keys: List[str], policies: List[RateLimitPolicy], now: float) -> Tuple[bool, List[Tuple[int, int]], List[float]]:
+        with self._lock:
+            counters, weights, counts = [], [], []
+            allowed = True
+            for key, policy in zip(keys, policies):
+                index, weight = window_position(policy.window, now)
+                counter = self._counter(key, index)
+                if counter[1] * weight + counter[2] + 1 > policy.limit:
+                    allowed = False
+                counters.append(counter)
+                weights.append(weight)
+            for counter in counters:
+                if allowed:
+                    counter[2] += 1
+                counts.append((counter[1], counter[2]))
+            return allowed, counts, weights
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+
+local_limiter = LocalRateLimiter()
+sliding_window_script = None
+
+def counter_key(policy: RateLimitPolicy, identity: str) -> str:
+    return f"{RATE_LIMIT_NAMESPACE}:{policy.name}:{identity}"
+
+async def redis_hit(keys: List[str], policies: List[RateLimitPolicy], now: float):
+    """Check and count a request in Redis in one round trip"""
+    global sliding_window_script
+    if sliding_window_script is None:
+        # EVALSHA, falling back to EVAL the first time a server sees the script
+        sliding_window_script = redis_client.client.register_script(SLIDING_WINDOW_SCRIPT)
+    script_keys, args, weights = [], [], []
+    for key, policy in zip(keys, policies):
+        index, weight = window_position(policy.window, now)
+        script_keys += [f"{key}:{index}", f"{key}:{index - 1}"]
+        args += [policy.limit, policy.window, repr(weight)]
+        weights.append(weight)
+    reply = await redis_client.run(lambda r: sliding_window_script(keys=script_keys, args=args, client=r))
+    counts = [(int(reply[i]), int(reply[i + 1])) for i in range(1, len(reply), 2)]
+    return bool(int(reply[0])), counts, weights
+
+async def check_rate_limit(policies: List[RateLimitPolicy], identities: Dict[str, str], now: Optional[float] = None) -> RateLimitResult:
+    """Count a request against policies; identities maps "user"/"ip" to who made it"""
+    now = time.time() if now is None else now
+    keys = [counter_key(policy, identities[policy.key]) for policy in policies]
+    backend = "local"
+    if redis_client.is_connected():
+        try:
+            allowed, counts, weights = await redis_hit(keys, policies, now)
+            backend = "redis"
+        except Exception as e:
+            print(f"Rate limit error, limiting in-process: {e}")
+    if backend == "local":
+        allowed, counts, weights = local_limiter.hit(keys, policies, now)
+    result = summarize(policies, weights, counts, allowed)
+    RATE_LIMIT_DECISIONS.labels(policies[-1].name, "allowed" if allowed else "limited", backend).inc()
+    return result
+
+@lru_cache(maxsize=4096)
+def token_subject(token: str) -> Optional[str]:
+    """Username in a bearer token (only used to pick the rate limit bucket;
+    expired tokens still map to their user, authentication rejects them)"""
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={"verify_exp": False}).get("sub")
+    except JWTError:
+        return None
+
+def client_ip(scope) -> str:
+    if RATE_LIMIT_TRUST_FORWARDED:
+        hops = []
+        for name, value in scope["headers"]:
+            if name == b"x-forwarded-for":
+                hops += [hop.strip() for hop in value.decode("latin-1").split(",") if hop.strip()]
+        if hops:
+            # The address the outermost trusted proxy saw the request come from
+            return hops[-min(RATE_LIMIT_TRUSTED_PROXIES, len(hops))]
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+def request_identities(scope) -> Dict[str, str]:
+    ip = f"ip:{client_ip(scope)}"
+    user = None
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                user = token_subject(token)
+            break
+    return {"ip": ip, "user": f"user:{user}" if user else ip}
+
+def route_policy(app, scope) -> Optional[RateLimitPolicy]:
+    """The policy declared by the endpoint this request will be routed to"""
+    for route in app.router.routes:
+        match, child_scope = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(child_scope.get("endpoint"), "rate_limit_policy", None)
+    return None
+
+class RateLimitMiddleware:
+    """ASGI middleware enforcing the default and per-endpoint rate limits.
+
+    Limited requests get a 429 with Retry-After; every checked response
+    carries RateLimit-Limit/-Remaining/-Reset/-Policy headers describing the
+    policy closest to its limit.
+    """
+
+    def __init__(self, app, enabled: bool = RATE_LIMIT_ENABLED):
+        self.app = app
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http" or scope["path"].startswith(RATE_LIMIT_EXEMPT):
+            await self.app(scope, receive, send)
+            return
+
+        policies = [base_policy(scope["path"])]
+        policy = route_policy(scope["app"], scope)
+        if policy is not None:
+            policies.append(policy)
+        result = await check_rate_limit(policies, request_identities(scope))
+        headers = result.headers()
+
+        if not result.allowed:
+            body = f'{{"detail":"Rate limit exceeded, retry in {result.retry_after}s"}}'.encode()
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())] + headers,
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
@@ -1,87 +1,167 @@
 import redis
+import redis.asyncio as aioredis
+import asyncio
 import json
 import os
-from typing import Optional, Any
+import time
+from typing import Optional, Any, Awaitable, Callable
+from prometheus_client import Gauge
 from dotenv import load_dotenv
 
 load_dotenv()
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+# Seconds; also how long a request waits for a free pooled connection
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", 0.5))
+# Consecutive failures that open the circuit, and how long it stays open
+REDIS_FAILURE_THRESHOLD = int(os.getenv("REDIS_FAILURE_THRESHOLD", 5))
+REDIS_COOLDOWN = float(os.getenv("REDIS_COOLDOWN", 30))
+
+REDIS_CIRCUIT_OPEN = Gauge("todo_redis_circuit_open", "1 while Redis calls are short-circuited")
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling Redis while the circuit is open"""
+
+class CircuitBreaker:
+    """Stop calling a failing dependency for a cool-down period.
+
+    closed: calls go through; `failure_threshold` consecutive failures open it.
+    open: calls are refused until `cooldown` seconds have passed.
+    half-open: a single probe call is let through; success closes the
+    circuit, failure re-opens it for another cool-down.
+    """
+
+    def __init__(self, failure_threshold: int = REDIS_FAILURE_THRESHOLD, cooldown: float = REDIS_COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+
+    @property
+    def is_open(self) -> bool:
+        """True while calls would be refused"""
+        if self.opened_at is None:
+            return False
+        return self.probing or time.monotonic() - self.opened_at < self.cooldown
+
+    def allow(self) -> bool:
+        """Whether a call may proceed now (claims the half-open probe)"""
+        if self.is_open:
+            return False
+        if self.opened_at is not None:
+            self.probing = True
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        REDIS_CIRCUIT_OPEN.set(0)
+
+    def record_failure(self):
+        self.failures += 1
+        if self.probing or self.failures >= self.failure_threshold:
+            self.trip()
+
+    def release_probe(self):
+        """Give up the half-open probe without a verdict (e.g. it was
+        cancelled) so the next call probes again"""
+        self.probing = False
+
+    def trip(self):
+        """Open the circuit now"""
+        self.opened_at = time.monotonic()
+        self.probing = False
+        REDIS_CIRCUIT_OPEN.set(1)
 
 class RedisClient:
-    def __init__(self):
-        self.client = None
-        self._connect()
-    
-    def _connect(self):
-        """Connect to Redis with error handling"""
+    def __init__(self, url: str = REDIS_URL, client: Optional[aioredis.Redis] = None):
+        # A bounded pool: callers wait up to the socket timeout for a free
+        # connection; broken connections are replaced on the next call
+        self.client = client or aioredis.Redis(
+            connection_pool=aioredis.BlockingConnectionPool.from_url(
+                url,
+                max_connections=REDIS_MAX_CONNECTIONS,
+                timeout=REDIS_SOCKET_TIMEOUT,
+                socket_timeout=REDIS_SOCKET_TIMEOUT,
+                socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+                health_check_interval=30,
+                decode_responses=True,
+            )
+        )
+        self.breaker = CircuitBreaker()
+
+    async def connect(self):
+        """Check Redis at startup; if it is down, start with the circuit open"""
         try:
-            self.client = redis.from_url(REDIS_URL, decode_responses=True)
-            # Test connection
-            self.client.ping()
+            await self.run(lambda r: r.ping())
             print("✅ Redis connected successfully")
-        except redis.ConnectionError:
-            print("⚠️ Redis not available, caching disabled")
-            self.client = None
         except Exception as e:
-            print(f"❌ Redis connection error: {e}")
-            self.client = None
-    
+            print(f"⚠️ Redis not available, caching disabled for {self.breaker.cooldown:.0f}s: {e}")
+            self.breaker.trip()
+
+    async def close(self):
+        await self.client.aclose()
+
     def is_connected(self) -> bool:
-        """Check if Redis is available"""
-        return self.client is not None
-    
-    def set_cache(self, key: str, value: Any, ttl: int = 300) -> bool:
+        """Check if Redis is available (circuit not open)"""
+        return not self.breaker.is_open
+
+    async def run(self, command: Callable[[aioredis.Redis], Awaitable[Any]]) -> Any:
+        """Run command(client) through the circuit breaker"""
+        if not self.breaker.allow():
+            raise CircuitOpenError("Redis circuit is open")
+        try:
+            result = await command(self.client)
+        except (redis.RedisError, OSError, asyncio.TimeoutError):
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            # Cancelled, or failed for a reason that says nothing about Redis;
+            # a probe left claimed would keep the circuit open for good
+            self.breaker.release_probe()
+            raise
+        self.breaker.record_success()
+        return result
+
+    async def set_cache(self, key: str, value: Any, ttl: int = 300) -> bool:
         """Set cache with TTL (default 5 minutes)"""
         if not self.is_connected():
             return False
-        
+
         try:
             serialized_value = json.dumps(value, default=str)
-            return self.client.setex(key, ttl, serialized_value)
+            return await self.run(lambda r: r.setex(key, ttl, serialized_value))
         except Exception as e:
             print(f"Cache set error: {e}")
             return False
-    
-    def get_cache(self, key: str) -> Optional[Any]:
+
+    async def get_cache(self, key: str) -> Optional[Any]:
         """Get cached value"""
         if not self.is_connected():
             return None
-        
+
         try:
-            value = self.client.get(key)
+            value = await self.run(lambda r: r.get(key))
             if value:
                 return json.loads(value)
             return None
         except Exception as e:
             print(f"Cache get error: {e}")
             return None
-    
-    def delete_cache(self, key: str) -> bool:
+
+    async def delete_cache(self, key: str) -> bool:
         """Delete cached value"""
         if not self.is_connected():
             return False
-        
+
         try:
-            return bool(self.client.delete(key))
+            return bool(await self.run(lambda r: r.delete(key)))
         except Exception as e:
             print(f"Cache delete error: {e}")
             return False
-    
-    def increment_counter(self, key: str, ttl: int = 3600) -> int:
-        """Increment counter for rate limiting"""
-        if not self.is_connected():
-            return 0
-        
-        try:
-            pipe = self.client.pipeline()
-            pipe.incr(key)
-            pipe.expire(key, ttl)
-            result = pipe.execute()
-            return result[0]
-        except Exception as e:
-            print(f"Counter increment error: {e}")
-            return 0
 
 # Global Redis client instance
-redis_client = RedisClient()
\ No newline at end of file
+redis_client = RedisClient()
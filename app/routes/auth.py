@@ -1,10 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 from app.database import get_db
 from app.models import User
-from app.schemas import UserCreate, UserResponse, Token, MessageResponse, UserUpdate, ChangePasswordRequest
+from app.schemas import UserCreate, UserResponse, Token, MessageResponse, UserUpdate, ChangePasswordRequest, CurrentUser
 from app.auth import (
     get_password_hash, 
     authenticate_user, 
@@ -14,28 +14,32 @@ from app.auth import (
     get_current_active_user,
     ACCESS_TOKEN_EXPIRE_MINUTES,
     verify_password,
+    invalidate_principal,
 )
+from app.rate_limit import rate_limit
+from app.conditional import is_not_modified, not_modified, validator_headers, weak_etag
 
 router = APIRouter(prefix="/auth",tags=["Authentication"])
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def register_user(user: UserCreate, db: Session = Depends(get_db)):
+@rate_limit(max_requests=20, window=3600, key="ip")  # 20 sign-ups per hour per IP
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
     """Register a new user"""
     # Check if user already exists
-    if get_user_by_username(db, user.username):
+    if await get_user_by_username(db, user.username):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already registered"
         )
     
-    if get_user_by_email(db, user.email):
+    if await get_user_by_email(db, user.email):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
     # Create new user
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash(user.password)
     db_user = User(
         email=user.email,
         username=user.username,
@@ -46,16 +50,17 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
         position=user.position
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 @router.post("/login", response_model=Token)
-async def login_user(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+@rate_limit(max_requests=10, window=60, key="ip")  # 10 attempts per minute per IP
+async def login_user(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
     """Login user and return access token"""
     # Allow login by email or username
     email = form_data.username
-    user = authenticate_user(db, email, form_data.password)
+    user = await authenticate_user(db, email, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -69,16 +74,24 @@ async def login_user(form_data: OAuth2PasswordRequestForm = Depends(), db: Sessi
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/me", response_model=UserResponse)
-async def read_users_me(current_user: User = Depends(get_current_active_user)):
-    """Get current user information"""
+async def read_users_me(
+    request: Request,
+    response: Response,
+    current_user: CurrentUser = Depends(get_current_active_user),
+):
+    """Get current user information (ETag/If-None-Match against the cached principal)"""
+    etag = weak_etag("me", current_user.model_dump_json())
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    response.headers.update(validator_headers(etag))
     return current_user
 
 
 @router.put("/me", response_model=UserResponse)
 async def put_current_user(
     user_update: UserUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user),
 ):
     """Update (PUT) current user's allowed fields"""
     data = user_update.dict(exclude_unset=True)
@@ -87,33 +100,38 @@ async def put_current_user(
 
     # Check uniqueness for email/username
     if "email" in data and data.get("email"):
-        existing = get_user_by_email(db, data.get("email"))
+        existing = await get_user_by_email(db, data.get("email"))
         if existing and existing.id != current_user.id:
             raise HTTPException(status_code=400, detail="Email already registered")
 
     if "username" in data and data.get("username"):
-        existing = get_user_by_username(db, data.get("username"))
+        existing = await get_user_by_username(db, data.get("username"))
         if existing and existing.id != current_user.id:
             raise HTTPException(status_code=400, detail="Username already registered")
 
+    # current_user is a cached snapshot; update the row itself
+    user = await db.get(User, current_user.id)
     for key, value in data.items():
-        setattr(current_user, key, value)
+        setattr(user, key, value)
 
-    db.add(current_user)
-    db.commit()
-    db.refresh(current_user)
-    return current_user
+    db.add(user)
+    await db.commit()
+    await db.refresh(user)
+    await invalidate_principal(current_user.username, user.username)
+    return user
 
 
 @router.post("/change-password", response_model=MessageResponse)
 async def change_password(
     payload: ChangePasswordRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_active_user),
 ):
     """Change current user's password after validating current password"""
+    user = await db.get(User, current_user.id)
+
     # verify current password
-    if not verify_password(payload.current_password, current_user.hashed_password):
+    if not await verify_password(payload.current_password, user.hashed_password):
         raise HTTPException(status_code=400, detail="Current password is incorrect")
 
     # validate new password length
@@ -121,7 +139,9 @@ async def change_password(
         raise HTTPException(status_code=400, detail="New password must be at least 6 characters")
 
     # update password
-    current_user.hashed_password = get_password_hash(payload.new_password)
-    db.add(current_user)
-    db.commit()
+    user.hashed_password = await get_password_hash(payload.new_password)
+    db.add(user)
+    await db.commit()
+    # Not user.username: the commit expired it (a blocking reload in sync mode)
+    await invalidate_principal(current_user.username)
     return {"message": "Password changed successfully"}
\ No newline at end of file
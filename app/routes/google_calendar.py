@@ -1,15 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.responses import RedirectResponse, JSONResponse, HTMLResponse
-from sqlalchemy.orm import Session
-from google.oauth2.credentials import Credentials
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
 from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
-from datetime import datetime, timedelta
 import json
 import os
 from app.database import get_db
-from app.models import User, Todo
-from app.auth import get_current_active_user
+from app.models import User, CalendarEvent
+from app.auth import get_current_active_user, invalidate_principal
+from app.schemas import CurrentUser, JobResponse
+from app.jobs import enqueue_job
+# Defines the calendar_sync job these routes queue
+import app.calendar_sync  # noqa: F401
 
 router = APIRouter(prefix="/google-calendar", tags=["Google Calendar"])
 
@@ -77,8 +79,8 @@ def get_flow(redirect_uri: str):
 @router.get("/auth")
 async def google_calendar_auth(
     request: Request,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Initiate Google Calendar OAuth flow"""
     try:
@@ -106,7 +108,7 @@ async def google_calendar_callback(
     code: str = None,
     state: str = None,
     error: str = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Handle Google OAuth callback"""
     if error:
@@ -132,7 +134,7 @@ async def google_calendar_callback(
     try:
         # Extract user_id from state
         user_id = int(state)
-        user = db.query(User).filter(User.id == user_id).first()
+        user = await db.get(User, user_id)
         
         if not user:
             return HTMLResponse("""
@@ -161,7 +163,10 @@ async def google_calendar_callback(
         }
         
         user.google_calendar_token = json.dumps(token_data)
-        db.commit()
+        # Read before the commit expires it (a blocking reload in sync mode)
+        username = user.username
+        await db.commit()
+        await invalidate_principal(username)
         
         # Close the popup with a simple script that notifies the opener
         return HTMLResponse("""
@@ -211,158 +216,56 @@ async def google_calendar_callback(
 @router.post("/save-token")
 async def save_google_token(
     token_data: dict,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Save Google OAuth token for current user"""
     try:
-        current_user.google_calendar_token = json.dumps(token_data)
-        db.commit()
+        user = await db.get(User, current_user.id)
+        user.google_calendar_token = json.dumps(token_data)
+        await db.commit()
+        await invalidate_principal(current_user.username)
         return {"message": "Token saved successfully"}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/sync")
+@router.post("/sync", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
 async def sync_to_google_calendar(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
-    """Sync all user tasks to Google Calendar"""
-    if not current_user.google_calendar_token:
+    """Queue a sync of the user's todos to Google Calendar; poll GET /jobs/{id}.
+
+    The job creates, updates or removes calendar events for todos changed
+    since the last sync; its result holds the counts per outcome.
+    """
+    if not current_user.google_calendar_connected:
         raise HTTPException(
             status_code=400,
             detail="Google Calendar not connected. Please authenticate first."
         )
-    
-    try:
-        # Parse stored credentials
-        token_info = json.loads(current_user.google_calendar_token)
-        credentials = Credentials(
-            token=token_info.get('token'),
-            refresh_token=token_info.get('refresh_token'),
-            token_uri=token_info.get('token_uri'),
-            client_id=token_info.get('client_id'),
-            client_secret=token_info.get('client_secret'),
-            scopes=token_info.get('scopes')
-        )
-        
-        # Build Calendar service
-        service = build('calendar', 'v3', credentials=credentials)
-        
-        # Get all user's todos
-        todos = db.query(Todo).filter(Todo.owner_id == current_user.id).all()
-        
-        created_events = []
-        errors = []
-        
-        for todo in todos:
-            try:
-                # Determine event time
-                if todo.date:
-                    # Use the date as-is but set a reasonable time if it's midnight
-                    start_time = todo.date
-                    # If time is midnight, set it to 9 AM instead
-                    if start_time.hour == 0 and start_time.minute == 0:
-                        start_time = start_time.replace(hour=9, minute=0)
-                else:
-                    # If no date set, schedule for tomorrow at 9 AM
-                    from datetime import timezone
-                    start_time = datetime.now(timezone.utc).replace(hour=9, minute=0, second=0, microsecond=0) + timedelta(days=1)
-                
-                # End time is 1 hour after start
-                end_time = start_time + timedelta(hours=1)
-                
-                # Format times for Google Calendar
-                # Remove timezone info and use local time
-                start_dt = start_time.strftime('%Y-%m-%dT%H:%M:%S')
-                end_dt = end_time.strftime('%Y-%m-%dT%H:%M:%S')
-                
-                # Create event
-                event = {
-                    'summary': todo.title,
-                    'description': f"{todo.description or ''}\n\nPriority: {todo.priority}\nStatus: {todo.status}",
-                    'start': {
-                        'dateTime': start_dt,
-                        'timeZone': 'Africa/Cairo',  # Your timezone (UTC+2)
-                    },
-                    'end': {
-                        'dateTime': end_dt,
-                        'timeZone': 'Africa/Cairo',
-                    },
-                    'reminders': {
-                        'useDefault': False,
-                        'overrides': [
-                            {'method': 'popup', 'minutes': 30},
-                        ],
-                    },
-                }
-                
-                # Add color based on priority
-                if todo.priority == 'high':
-                    event['colorId'] = '11'  # Red
-                elif todo.priority == 'medium':
-                    event['colorId'] = '5'   # Yellow
-                else:
-                    event['colorId'] = '2'   # Green
-                
-                # Insert event
-                created_event = service.events().insert(calendarId='primary', body=event).execute()
-                created_events.append({
-                    'todo_id': todo.id,
-                    'todo_title': todo.title,
-                    'event_id': created_event.get('id'),
-                    'event_link': created_event.get('htmlLink')
-                })
-                
-            except Exception as e:
-                errors.append({
-                    'todo_id': todo.id,
-                    'todo_title': todo.title,
-                    'error': str(e)
-                })
-        
-        # Update stored credentials if they were refreshed
-        if credentials.token != token_info.get('token'):
-            updated_token = {
-                'token': credentials.token,
-                'refresh_token': credentials.refresh_token,
-                'token_uri': credentials.token_uri,
-                'client_id': credentials.client_id,
-                'client_secret': credentials.client_secret,
-                'scopes': credentials.scopes
-            }
-            current_user.google_calendar_token = json.dumps(updated_token)
-            db.commit()
-        
-        return {
-            "message": f"Successfully synced {len(created_events)} tasks to Google Calendar",
-            "created_events": created_events,
-            "errors": errors,
-            "total_tasks": len(todos),
-            "successful": len(created_events),
-            "failed": len(errors)
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to sync: {str(e)}")
+    return await enqueue_job("calendar_sync", user_id=current_user.id)
 
 @router.get("/status")
 async def get_calendar_status(
-    current_user: User = Depends(get_current_active_user)
+    current_user: CurrentUser = Depends(get_current_active_user)
 ):
     """Check if Google Calendar is connected"""
     return {
-        "connected": bool(current_user.google_calendar_token),
-        "has_token": bool(current_user.google_calendar_token)
+        "connected": current_user.google_calendar_connected,
+        "has_token": current_user.google_calendar_connected
     }
 
 @router.delete("/disconnect")
 async def disconnect_google_calendar(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Disconnect Google Calendar"""
-    current_user.google_calendar_token = None
-    db.commit()
+    user = await db.get(User, current_user.id)
+    user.google_calendar_token = None
+    # A later connection may be to another Google account; start from scratch
+    await db.execute(delete(CalendarEvent).where(CalendarEvent.owner_id == current_user.id))
+    await db.commit()
+    await invalidate_principal(current_user.username)
     return {"message": "Google Calendar disconnected successfully"}
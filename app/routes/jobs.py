@@ -0,0 +1,45 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from app.auth import get_current_active_user
+from app.jobs import get_job
+from app.schemas import CurrentUser, JobResponse
+from app.uploads import storage
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+async def get_own_job(job_id: str, current_user: CurrentUser) -> dict:
+    job = await get_job(job_id)
+    # Other users' jobs are indistinguishable from missing ones
+    if job is None or job["user_id"] != current_user.id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job_status(
+    job_id: str,
+    current_user: CurrentUser = Depends(get_current_active_user)
+):
+    """Status, progress and (once finished) result or error of a background job"""
+    return await get_own_job(job_id, current_user)
+
+@router.get("/{job_id}/download")
+async def download_job_file(
+    job_id: str,
+    current_user: CurrentUser = Depends(get_current_active_user)
+):
+    """The file a finished background export produced"""
+    job = await get_own_job(job_id, current_user)
+    result = job["result"] if job["status"] == "succeeded" else None
+    if not isinstance(result, dict) or "file" not in result:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Job has no file to download")
+    stat = await storage.stat(result["file"])
+    if stat is None:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="File has expired")
+    return StreamingResponse(
+        storage.read(result["file"]),
+        media_type=result["media_type"],
+        headers={
+            "Content-Disposition": f'attachment; filename="{result["filename"]}"',
+            "Content-Length": str(stat[0]),
+        }
+    )
@@ -1,20 +1,61 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, Form
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
-from typing import Optional, List
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response, UploadFile, File, Form, WebSocket
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import and_, case, insert, select, update, func, tuple_
+from starlette.concurrency import run_in_threadpool
+from typing import AsyncIterator, Optional, List, Tuple, Union
+import asyncio
+import json
+import base64
+import csv
+import io
 import os
 import uuid
+import zlib
 from datetime import datetime
-from shutil import copyfileobj
-from app.database import get_db
-from app.models import User, Todo
-from app.schemas import TodoCreate, TodoUpdate, TodoResponse, TodoList, MessageResponse, PriorityEnum
-from app.auth import get_current_active_user
-from app.cache import cache_result, invalidate_cache_pattern, rate_limit
+from app.database import DATABASE_URL, get_db, db_session
+from app.models import Todo
+from app.schemas import (
+    TodoCreate, TodoUpdate, TodoResponse, TodoList, MessageResponse, PriorityEnum, TodoSearchHit, TodoSearchResults, TodoStats, CurrentUser,
+    TodoBatchCreate, TodoBatchUpdate, TodoBatchDelete, TodoBatchItemResult, TodoBatchResult,
+    TodoImportError, TodoImportResult, JobResponse, TodoChanges,
+)
+from app.auth import get_current_active_user, get_current_user
+from app.cache import cache_result, invalidate_user_cache
+from app.conditional import cached_etag, generation_etag, is_not_modified, not_modified, validator_headers
+from app.rate_limit import rate_limit
+from app.search import match_clause, search_todos
+from app.uploads import save_upload, release_uploads, storage, new_temp_file, job_file_name, store_stream
+from app.jobs import Job, JobError, enqueue_job, job_handler
+from app.events import broker, publish_events, stream_events
+from app.todo_sync import (
+    PENDING_VERSION, SyncTokenExpired, next_todo_version, stamp_pending_todos, decode_sync_token, load_changes,
+)
+from app.todo_import import (
+    IMPORT_CHUNK_SIZE, MAX_IMPORT_ROWS, MAX_IMPORT_UPLOAD_BYTES, MAX_IMPORT_ERRORS, MAX_RECORD_BYTES, RecordTooLarge,
+    inflate, iter_lines, iter_ndjson, iter_csv, validate_record, validation_message, insert_rows,
+)
 import math
 
 router = APIRouter(prefix="/todos", tags=["Todos"])
 
+# Rows fetched per server-side cursor round trip while exporting
+EXPORT_CHUNK_SIZE = 500
+EXPORT_COLUMNS = ("id", "title", "description", "date", "completed", "priority", "status", "image", "created_at", "updated_at")
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+# SQLite keeps server-side timestamps as "YYYY-MM-DD HH:MM:SS" text but binds
+# datetimes with microseconds, so as text a cursor sorts after the rows of its
+# own second; there the keyset compares julianday() numbers instead
+CURSOR_BACKEND = make_url(DATABASE_URL).get_backend_name()
+# Milliseconds EventSource waits before reconnecting a dropped stream
+SSE_RETRY_MS = 3000
+# Columns a batch update may change but not set to null
+BATCH_NOT_NULL_FIELDS = ("title", "completed", "priority", "status")
+# Names accepted by ?fields= on GET /todos
+TODO_FIELDS = frozenset(TodoResponse.model_json_schema(mode="serialization")["properties"])
+
 @router.post("", response_model=TodoResponse, status_code=status.HTTP_201_CREATED)
 @rate_limit(max_requests=50, window=3600)  # 50 creates per hour
 async def create_todo(
@@ -24,8 +65,8 @@ async def create_todo(
     date: Optional[str] = Form(None),
     status: Optional[str] = Form("pending"),
     image: Optional[UploadFile] = File(None),
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new todo (accepts multipart/form-data with optional image)"""
 
@@ -40,19 +81,7 @@ async def create_todo(
             except Exception:
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid date format. Use YYYY-MM-DD or ISO format.")
 
-    image_filename = None
-    if image:
-        uploads_dir = os.path.join(os.getcwd(), "uploads")
-        os.makedirs(uploads_dir, exist_ok=True)
-        # generate unique filename keeping original extension
-        _, ext = os.path.splitext(image.filename or "")
-        image_filename = f"{uuid.uuid4().hex}{ext}"
-        dest_path = os.path.join(uploads_dir, image_filename)
-        try:
-            with open(dest_path, "wb") as f:
-                copyfileobj(image.file, f)
-        finally:
-            image.file.close()
+    image_filename = await save_upload(image) if image else None
 
     db_todo = Todo(
         title=title,
@@ -65,73 +94,708 @@ async def create_todo(
     )
 
     db.add(db_todo)
-    db.commit()
-    db.refresh(db_todo)
+    db_todo.version = await next_todo_version(db, current_user.id)
+    await db.commit()
+    await db.refresh(db_todo)
     
     # Invalidate user's todos cache
-    invalidate_cache_pattern(f"todos:get_todos:*{current_user.id}*")
+    await invalidate_user_cache(current_user.id, "todos")
+    await publish_events(current_user.id, [todo_event("created", db_todo)])
     
     return db_todo
 
+def todo_event(event_type: str, todo) -> dict:
+    """Change event for /todos/events carrying the todo as GET /todos/{id} returns it"""
+    if not isinstance(todo, TodoResponse):
+        todo = TodoResponse.model_validate(todo)
+    return {"type": event_type, "todo": todo.model_dump(mode="json")}
+
+def encode_cursor(todo: Todo) -> str:
+    """Encode the (created_at, id) position of a todo as an opaque cursor"""
+    raw = json.dumps([todo.created_at.isoformat(), todo.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def cursor_key(created_at):
+    """created_at (column or cursor value) as the keyset orders and compares it"""
+    return func.julianday(created_at) if CURSOR_BACKEND == "sqlite" else created_at
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor produced by encode_cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, todo_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(todo_id)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+def build_todos_query(
+    owner_id: int,
+    completed: Optional[bool] = None,
+    priority: Optional[str] = None,
+    search: Optional[str] = None,
+):
+    """Select a user's todos with the list filters applied"""
+    query = select(Todo).where(Todo.owner_id == owner_id, Todo.deleted_at.is_(None))
+    
+    # Apply filters
+    if completed is not None:
+        query = query.where(Todo.completed == completed)
+    
+    if priority:
+        query = query.where(Todo.priority == priority)
+    
+    if search:
+        clause = match_clause(search)
+        if clause is not None:
+            query = query.where(clause)
+    
+    return query
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """?fields=title,status -> TodoResponse fields to return (id is always included)"""
+    if not fields:
+        return None
+    selected = list(dict.fromkeys(["id"] + [name.strip() for name in fields.split(",") if name.strip()]))
+    unknown = [name for name in selected if name not in TODO_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}. Choose from: {', '.join(sorted(TODO_FIELDS))}"
+        )
+    return selected
+
 @router.get("", response_model=TodoList)
-@cache_result(ttl=60, key_prefix="todos")  # Cache for 1 minute
 @rate_limit(max_requests=200, window=3600)  # 200 requests per hour
 async def get_todos(
+    request: Request,
+    response: Response,
     page: int = Query(1, ge=1, description="Page number"),
     size: int = Query(10, ge=1, le=100, description="Items per page"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous next_cursor; replaces page"),
+    include_total: Optional[bool] = Query(None, description="Count matching todos (default: on for page mode, off for cursor mode)"),
     completed: Optional[bool] = Query(None, description="Filter by completion status"),
     priority: Optional[str] = Query(None, description="Filter by priority"),
     search: Optional[str] = Query(None, description="Search in title and description"),
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    fields: Optional[str] = Query(None, description="Comma-separated todo fields to return, e.g. id,title,status (default: all)"),
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get user's todos with page/size or keyset (cursor) pagination and filters.
+
+    Sends a weak ETag; If-None-Match with the current one gets a 304.
+    """
+    selected = parse_fields(fields)
+    etag = await generation_etag(current_user.id, "todos", request)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    # The page may come from a local cache entry older than that generation:
+    # tag it with the generation it was cached under instead
+    result, generation = await get_todos_page.with_generation(
+        page=page, size=size, cursor=cursor, include_total=include_total,
+        completed=completed, priority=priority, search=search,
+        current_user=current_user, db=db,
+    )
+    etag = cached_etag(current_user.id, "todos", generation, request)
+    if selected is None:
+        response.headers.update(validator_headers(etag))
+        return result
+
+    # Every field selection shares the cached full page; partial todos don't
+    # fit TodoResponse, so the projection is serialized directly
+    if isinstance(result, BaseModel):
+        result = result.model_dump(mode="json")
+    return ORJSONResponse({
+        **result,
+        "todos": [{name: todo[name] for name in selected} for todo in result["todos"]],
+    }, headers=validator_headers(etag))
+
+@cache_result(
+    ttl=60,  # Cache for 1 minute
+    key_prefix="todos",
+    key_params=("page", "size", "cursor", "include_total", "completed", "priority", "search"),
+)
+async def get_todos_page(
+    page: int,
+    size: int,
+    cursor: Optional[str],
+    include_total: Optional[bool],
+    completed: Optional[bool],
+    priority: Optional[str],
+    search: Optional[str],
+    current_user: CurrentUser,
+    db: AsyncSession,
 ):
-    """Get user's todos with pagination and filters"""
-    query = db.query(Todo).filter(Todo.owner_id == current_user.id)
+    """One page of the user's todos (cached as a whole, whatever fields are asked for)"""
+    query = build_todos_query(current_user.id, completed, priority, search)
     
-    # Apply filters
-    if completed is not None:
-        query = query.filter(Todo.completed == completed)
+    if include_total is None:
+        include_total = cursor is None
     
-    if priority:
-        query = query.filter(Todo.priority == priority)
+    # Count total items
+    total = None
+    if include_total:
+        total = await db.scalar(select(func.count()).select_from(query.subquery()))
     
-    if search:
-        search_pattern = f"%{search}%"
-        query = query.filter(
-            or_(
-                Todo.title.ilike(search_pattern),
-                Todo.description.ilike(search_pattern)
-            )
-        )
+    # Stable ordering so both modes page through the same sequence
+    query = query.order_by(cursor_key(Todo.created_at), Todo.id)
     
-    # Count total items
-    total = query.count()
+    # Apply pagination: seek past the cursor, or skip whole pages
+    if cursor:
+        created_at, todo_id = decode_cursor(cursor)
+        query = query.where(tuple_(cursor_key(Todo.created_at), Todo.id) > tuple_(cursor_key(created_at), todo_id))
+        page = None
+    else:
+        query = query.offset((page - 1) * size)
     
-    # Apply pagination
-    offset = (page - 1) * size
-    todos = query.offset(offset).limit(size).all()
+    # Fetch one extra row to know whether another page exists
+    todos = (await db.scalars(query.limit(size + 1))).all()
+    has_more = len(todos) > size
+    todos = todos[:size]
     
     # Calculate pagination info
-    pages = math.ceil(total / size)
+    pages = math.ceil(total / size) if total is not None else None
     
     return TodoList(
         todos=todos,
         total=total,
         page=page,
         size=size,
-        pages=pages
+        pages=pages,
+        next_cursor=encode_cursor(todos[-1]) if has_more else None,
+        has_more=has_more
+    )
+
+@router.get("/search", response_model=TodoSearchResults)
+@rate_limit(max_requests=200, window=3600)  # 200 requests per hour
+async def search_user_todos(
+    q: str = Query(..., min_length=1, description="Words to search for (prefix matching)"),
+    limit: int = Query(20, ge=1, le=100, description="Maximum number of hits"),
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Full-text search in todo titles and descriptions, best matches first"""
+    hits = await search_todos(db, current_user.id, q, limit)
+    return TodoSearchResults(
+        query=q,
+        hits=[
+            TodoSearchHit(todo=todo, rank=rank, snippet=snippet)
+            for todo, rank, snippet in hits
+        ]
+    )
+
+@router.get("/stats", response_model=TodoStats)
+@cache_result(ttl=60, key_prefix="todos")
+async def get_todo_stats(
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get todo statistics for current user"""
+    # One pass over the user's rows (owner_id index): a count per
+    # (status, priority, completed, overdue) combination, folded below
+    completed = Todo.completed == True
+    overdue = case((and_(Todo.date < func.now(), ~completed), True), else_=False)
+    rows = await db.execute(
+        select(Todo.status, Todo.priority, completed, overdue, func.count())
+        .where(Todo.owner_id == current_user.id, Todo.deleted_at.is_(None))
+        .group_by(Todo.status, Todo.priority, completed, overdue)
+    )
+    
+    total_todos = completed_todos = overdue_todos = 0
+    by_status = {}
+    by_priority = {"low": 0, "medium": 0, "high": 0}
+    for todo_status, priority, is_completed, is_overdue, count in rows:
+        total_todos += count
+        completed_todos += count if is_completed else 0
+        overdue_todos += count if is_overdue else 0
+        todo_status = todo_status or "unknown"
+        priority = priority or "unknown"
+        by_status[todo_status] = by_status.get(todo_status, 0) + count
+        by_priority[priority] = by_priority.get(priority, 0) + count
+    
+    return TodoStats(
+        total_todos=total_todos,
+        completed_todos=completed_todos,
+        pending_todos=total_todos - completed_todos,
+        completion_rate=round((completed_todos / total_todos * 100), 2) if total_todos > 0 else 0,
+        overdue_todos=overdue_todos,
+        by_status=by_status,
+        by_priority=by_priority
+    )
+
+def export_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def format_ndjson(rows) -> str:
+    return "".join(
+        json.dumps({name: export_value(row[name]) for name in EXPORT_COLUMNS}) + "\n"
+        for row in rows
+    )
+
+def format_csv(rows, header: bool = False) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        writer.writerow([export_value(row[name]) for name in EXPORT_COLUMNS])
+    return buffer.getvalue()
+
+def export_query(owner_id: int, completed: Optional[bool], priority: Optional[str], search: Optional[str]):
+    return (
+        build_todos_query(owner_id, completed, priority, search)
+        .with_only_columns(*(getattr(Todo, name) for name in EXPORT_COLUMNS))
+        .order_by(Todo.created_at, Todo.id)
+        .execution_options(yield_per=EXPORT_CHUNK_SIZE)
+    )
+
+async def export_chunks(result, format: str, gzip: bool) -> AsyncIterator[bytes]:
+    """Encode a streamed export result chunk by chunk"""
+    formatter = format_csv if format == "csv" else format_ndjson
+    # gzip container (wbits=31), compressed chunk by chunk
+    compressor = zlib.compressobj(wbits=31) if gzip else None
+    if format == "csv":
+        header = format_csv([], header=True)
+        yield compressor.compress(header.encode()) if compressor else header.encode()
+    async for rows in result.partitions():
+        data = formatter(row._mapping for row in rows).encode()
+        yield compressor.compress(data) if compressor else data
+    if compressor:
+        yield compressor.flush()
+
+def export_file(format: str, gzip: bool) -> Tuple[str, str]:
+    """(download filename, media type)"""
+    filename = f"todos.{format}" + (".gz" if gzip else "")
+    return filename, "application/gzip" if gzip else EXPORT_MEDIA_TYPES[format]
+
+@router.get("/export")
+@rate_limit(max_requests=20, window=3600)  # 20 exports per hour
+async def export_todos(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson or csv"),
+    gzip: bool = Query(False, description="Return a .gz file"),
+    completed: Optional[bool] = Query(None, description="Filter by completion status"),
+    priority: Optional[str] = Query(None, description="Filter by priority"),
+    search: Optional[str] = Query(None, description="Search in title and description"),
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Stream all of the user's todos (with the list filters) as NDJSON or CSV"""
+    # Plain rows rather than ORM objects so the session does not keep them
+    result = await db.stream(export_query(current_user.id, completed, priority, search))
+    filename, media_type = export_file(format, gzip)
+    return StreamingResponse(
+        export_chunks(result, format, gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
     )
 
+@router.post("/export", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+@rate_limit(max_requests=20, window=3600)  # 20 exports per hour
+async def export_todos_in_background(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson or csv"),
+    gzip: bool = Query(False, description="Produce a .gz file"),
+    completed: Optional[bool] = Query(None, description="Filter by completion status"),
+    priority: Optional[str] = Query(None, description="Filter by priority"),
+    search: Optional[str] = Query(None, description="Search in title and description"),
+    current_user: CurrentUser = Depends(get_current_active_user)
+):
+    """Export like GET /todos/export, but in a background job; once it has
+    succeeded the file is at GET /jobs/{id}/download"""
+    payload = {"format": format, "gzip": gzip, "completed": completed, "priority": priority, "search": search}
+    return await enqueue_job("todo_export", payload, user_id=current_user.id)
+
+@job_handler("todo_export")
+async def export_todos_job(job: Job, format: str, gzip: bool, completed=None, priority=None, search=None) -> dict:
+    name = job_file_name(job.id, ".gz" if gzip else f".{format}")
+    size = 0
+    fd, temp_path = new_temp_file()
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async with db_session() as db:
+                result = await db.stream(export_query(job.user_id, completed, priority, search))
+                async for chunk in export_chunks(result, format, gzip):
+                    await run_in_threadpool(f.write, chunk)
+                    size += len(chunk)
+        await storage.store(temp_path, name)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    filename, media_type = export_file(format, gzip)
+    return {"file": name, "filename": filename, "media_type": media_type, "bytes": size}
+
+async def import_records(db: AsyncSession, chunks: AsyncIterator[bytes], format: str, gzip: bool, owner_id: int, job: Optional[Job] = None) -> TodoImportResult:
+    """Parse, validate and insert a streamed NDJSON/CSV body, then commit.
+
+    Invalid records are skipped and reported; a background import reports
+    its progress through job after each chunk.
+    """
+    if gzip:
+        chunks = inflate(chunks)
+    records = (iter_csv if format == "csv" else iter_ndjson)(iter_lines(chunks))
+    
+    imported = rejected = 0
+    errors = []
+    batch = []
+    try:
+        async for line, record in records:
+            try:
+                if isinstance(record, str):
+                    raise ValueError(record)
+                batch.append({**validate_record(record, owner_id), "version": PENDING_VERSION})
+            except ValueError as e:
+                rejected += 1
+                if len(errors) < MAX_IMPORT_ERRORS:
+                    detail = validation_message(e) if isinstance(e, ValidationError) else str(e)
+                    errors.append(TodoImportError(line=line, detail=detail))
+                continue
+            if imported + len(batch) > MAX_IMPORT_ROWS:
+                raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"At most {MAX_IMPORT_ROWS} todos per import")
+            if len(batch) >= IMPORT_CHUNK_SIZE:
+                await insert_rows(db, batch)
+                imported += len(batch)
+                batch = []
+                if job:
+                    await job.progress(imported=imported, rejected=rejected)
+        await insert_rows(db, batch)
+        imported += len(batch)
+    except RecordTooLarge:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"Records may be at most {MAX_RECORD_BYTES} bytes")
+    except (zlib.error, UnicodeDecodeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Body is not valid gzip/UTF-8")
+    
+    if imported:
+        await stamp_pending_todos(db, owner_id)
+    await db.commit()
+    if imported:
+        await invalidate_user_cache(owner_id, "todos")
+        # Too many to send one by one: subscribers refetch instead
+        await publish_events(owner_id, [{"type": "imported", "count": imported}])
+    
+    return TodoImportResult(format=format, imported=imported, rejected=rejected, errors=errors)
+
+@router.post("/import", response_model=Union[TodoImportResult, JobResponse])
+@rate_limit(max_requests=10, window=3600)  # 10 imports per hour
+async def import_todos(
+    request: Request,
+    response: Response,
+    format: Optional[str] = Query(None, pattern="^(ndjson|csv)$", description="ndjson or csv (default: from Content-Type)"),
+    background: bool = Query(False, description="Import in a background job (202 with the job)"),
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Bulk-create todos from a streamed NDJSON or CSV body (gzip allowed).
+
+    Each record is validated like POST /todos; invalid records are skipped
+    and reported. Valid ones are inserted in chunks and committed together.
+    With background=true the body is stored and imported by a job instead.
+    """
+    if format is None:
+        format = "csv" if request.headers.get("content-type", "").startswith("text/csv") else "ndjson"
+    gzip = request.headers.get("content-encoding") == "gzip"
+    if not background:
+        return await import_records(db, request.stream(), format, gzip, current_user.id)
+    
+    job_id = uuid.uuid4().hex
+    name = job_file_name(job_id, ".import")
+    await store_stream(request.stream(), name, MAX_IMPORT_UPLOAD_BYTES)
+    response.status_code = status.HTTP_202_ACCEPTED
+    return await enqueue_job(
+        "todo_import", {"file": name, "format": format, "gzip": gzip}, user_id=current_user.id, job_id=job_id
+    )
+
+@job_handler("todo_import")
+async def import_todos_job(job: Job, file: str, format: str, gzip: bool) -> dict:
+    try:
+        async with db_session() as db:
+            result = await import_records(db, storage.read(file), format, gzip, job.user_id, job)
+    except HTTPException as e:
+        # The body itself is bad; retrying cannot help
+        raise JobError(e.detail)
+    await storage.delete(file)
+    return result.model_dump()
+
+@router.post("/batch", response_model=TodoBatchResult)
+@rate_limit(max_requests=50, window=3600)  # 50 batches per hour
+async def create_todos_batch(
+    payload: TodoBatchCreate,
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Create several todos in one transaction (one multi-row INSERT)"""
+    version = await next_todo_version(db, current_user.id)
+    rows = [
+        {
+            **item.model_dump(exclude={"image"}),
+            "priority": item.priority.value,
+            "owner_id": current_user.id,
+            "version": version,
+        }
+        for item in payload.todos
+    ]
+    todos = (await db.scalars(insert(Todo).returning(Todo), rows)).all()
+    results = [
+        TodoBatchItemResult(index=index, id=todo.id, status=status.HTTP_201_CREATED, todo=todo)
+        for index, todo in enumerate(todos)
+    ]
+    await db.commit()
+    await invalidate_user_cache(current_user.id, "todos")
+    await publish_events(current_user.id, [todo_event("created", result.todo) for result in results])
+    
+    return TodoBatchResult(results=results)
+
+@router.patch("/batch", response_model=TodoBatchResult)
+@rate_limit(max_requests=50, window=3600)  # 50 batches per hour
+async def update_todos_batch(
+    payload: TodoBatchUpdate,
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Partially update and/or toggle several todos in one transaction"""
+    ids = [item.id for item in payload.todos]
+    owned = set(await db.scalars(
+        select(Todo.id).where(and_(Todo.owner_id == current_user.id, Todo.id.in_(ids), Todo.deleted_at.is_(None)))
+    ))
+    
+    results = {}
+    updates = []
+    toggles = []
+    seen = set()
+    accepted = set()
+    for index, item in enumerate(payload.todos):
+        if item.id in seen:
+            results[index] = TodoBatchItemResult(index=index, id=item.id, status=status.HTTP_400_BAD_REQUEST, detail="Duplicate id in batch")
+            continue
+        seen.add(item.id)
+        if item.id not in owned:
+            results[index] = TodoBatchItemResult(index=index, id=item.id, status=status.HTTP_404_NOT_FOUND, detail="Todo not found")
+            continue
+        # Images only change through uploads
+        values = item.model_dump(exclude_unset=True, exclude={"id", "toggle", "image"})
+        nulls = [name for name in BATCH_NOT_NULL_FIELDS if name in values and values[name] is None]
+        if nulls:
+            # Rejected on its own rather than failing the whole transaction
+            results[index] = TodoBatchItemResult(
+                index=index, id=item.id, status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"May not be null: {', '.join(nulls)}"
+            )
+            continue
+        if isinstance(values.get("priority"), PriorityEnum):
+            values["priority"] = values["priority"].value
+        accepted.add(item.id)
+        if values:
+            updates.append({"id": item.id, **values})
+        if item.toggle:
+            toggles.append(item.id)
+    
+    # UPDATE ... WHERE id = :id executed once per distinct set of columns
+    written = {values["id"] for values in updates} | set(toggles)
+    version = await next_todo_version(db, current_user.id) if written else None
+    if updates:
+        await db.execute(update(Todo), [{**values, "version": version} for values in updates])
+    if toggles:
+        await db.execute(
+            update(Todo)
+            .where(Todo.id.in_(toggles))
+            .values(completed=case((Todo.completed == True, False), else_=True), version=version)
+            .execution_options(synchronize_session=False)
+        )
+    
+    changed = {todo.id: todo for todo in (await db.scalars(
+        select(Todo).where(Todo.id.in_(accepted)).execution_options(populate_existing=True)
+    )).all()} if accepted else {}
+    for index, item in enumerate(payload.todos):
+        if index not in results:
+            results[index] = TodoBatchItemResult(index=index, id=item.id, status=status.HTTP_200_OK, todo=changed[item.id])
+    await db.commit()
+    # Rejected and empty items wrote nothing: no invalidation or event for them
+    if written:
+        await invalidate_user_cache(current_user.id, "todos")
+        await publish_events(current_user.id, [
+            todo_event("updated", results[index].todo)
+            for index in sorted(results) if results[index].todo is not None and results[index].id in written
+        ])
+    
+    return TodoBatchResult(results=[results[index] for index in sorted(results)])
+
+@router.delete("/batch", response_model=TodoBatchResult)
+@rate_limit(max_requests=50, window=3600)  # 50 batches per hour
+async def delete_todos_batch(
+    payload: TodoBatchDelete,
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Delete several todos by id in one statement (leaving tombstones for
+    GET /todos/changes)"""
+    deleted = dict((await db.execute(
+        select(Todo.id, Todo.image)
+        .where(and_(Todo.owner_id == current_user.id, Todo.id.in_(payload.ids), Todo.deleted_at.is_(None)))
+    )).all())
+    if deleted:
+        await db.execute(
+            update(Todo)
+            .where(Todo.id.in_(deleted))
+            .values(deleted_at=func.now(), image=None, version=await next_todo_version(db, current_user.id))
+            .execution_options(synchronize_session=False)
+        )
+    await db.commit()
+    if deleted:
+        await invalidate_user_cache(current_user.id, "todos")
+        await publish_events(current_user.id, [{"type": "deleted", "id": todo_id} for todo_id in deleted])
+        await release_uploads(db, deleted.values())
+    
+    results = []
+    seen = set()
+    for index, todo_id in enumerate(payload.ids):
+        if todo_id in seen:
+            results.append(TodoBatchItemResult(index=index, id=todo_id, status=status.HTTP_400_BAD_REQUEST, detail="Duplicate id in batch"))
+        elif todo_id in deleted:
+            results.append(TodoBatchItemResult(index=index, id=todo_id, status=status.HTTP_200_OK))
+        else:
+            results.append(TodoBatchItemResult(index=index, id=todo_id, status=status.HTTP_404_NOT_FOUND, detail="Todo not found"))
+        seen.add(todo_id)
+    
+    return TodoBatchResult(results=results)
+
+async def authenticate_stream(token: Optional[str]) -> CurrentUser:
+    """Principal for an event stream. The DB session is only held while
+    authenticating, never for the lifetime of the stream."""
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    async with db_session() as db:
+        current_user = await get_current_user(token, db)
+    return await get_current_active_user(current_user)
+
+def stream_token(headers, token: Optional[str]) -> Optional[str]:
+    """Bearer token from the Authorization header, else the ?token= one
+    (browsers' EventSource and WebSocket cannot send headers)"""
+    scheme, _, credentials = headers.get("authorization", "").partition(" ")
+    return credentials if scheme.lower() == "bearer" and credentials else token
+
+@router.get("/events")
+async def todo_events(
+    request: Request,
+    token: Optional[str] = Query(None, description="Access token, for clients that cannot send an Authorization header"),
+    last_event_id: Optional[str] = Query(None, description="Resume after this event id (the Last-Event-ID header takes precedence)"),
+):
+    """Server-sent events for changes to the user's todos.
+
+    Each event's data is JSON with a type (created, updated, toggled,
+    deleted, imported) and the todo (or its id). Reconnecting with
+    Last-Event-ID resumes where the stream left off; a "resync" event means
+    events may have been missed and the client should refetch its todos.
+    """
+    current_user = await authenticate_stream(stream_token(request.headers, token))
+    last_event_id = request.headers.get("last-event-id") or last_event_id
+
+    async def frames():
+        # Subscribed before the backlog is read so nothing falls in between
+        subscription = broker.subscribe(current_user.id)
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+            async for event_id, data in stream_events(subscription, last_event_id):
+                if data is None:
+                    yield ": keep-alive\n\n"
+                elif event_id is None:
+                    yield f"data: {data}\n\n"
+                else:
+                    yield f"id: {event_id}\ndata: {data}\n\n"
+        finally:
+            broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.websocket("/events")
+async def todo_events_websocket(
+    websocket: WebSocket,
+    token: Optional[str] = Query(None),
+    last_event_id: Optional[str] = Query(None),
+):
+    """The /todos/events feed over a WebSocket: one JSON text message per
+    event, with its id alongside the type (resume with ?last_event_id=)"""
+    try:
+        current_user = await authenticate_stream(stream_token(websocket.headers, token))
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    subscription = broker.subscribe(current_user.id)
+
+    async def send_events():
+        async for event_id, data in stream_events(subscription, last_event_id):
+            if data is None:
+                # Idle: the server's WebSocket pings keep the connection alive
+                continue
+            # Splice the id into the already serialized event rather than
+            # re-encoding it for every subscriber
+            await websocket.send_text(data if event_id is None else f'{{"id": "{event_id}", {data[1:]}')
+
+    async def receive_until_closed():
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    sender = asyncio.create_task(send_events())
+    receiver = asyncio.create_task(receive_until_closed())
+    try:
+        done, _ = await asyncio.wait((sender, receiver), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        sender.cancel()
+        receiver.cancel()
+        broker.unsubscribe(subscription)
+    if receiver not in done:
+        # Fell too far behind (or failed to send): the client reconnects and resumes
+        try:
+            await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        except RuntimeError:
+            pass
+
+@router.get("/changes", response_model=TodoChanges)
+async def get_todo_changes(
+    since: Optional[str] = Query(None, description="next_token of the previous call; omit for a full sync"),
+    limit: int = Query(500, ge=1, le=1000, description="Most todos and deletions returned at once"),
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Todos created or updated, and ids of todos deleted, since a sync token.
+
+    Without since every todo is returned. Keep calling with next_token while
+    has_more is true, then store it for the next sync. A 410 means
+    deletions since the token are no longer known: sync from scratch.
+    """
+    try:
+        position = decode_sync_token(since) if since else None
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid sync token")
+    try:
+        todos, deleted, next_token, has_more = await load_changes(db, current_user.id, position, limit)
+    except SyncTokenExpired:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Sync token expired; sync again without since")
+    return TodoChanges(todos=todos, deleted=deleted, next_token=next_token, has_more=has_more)
+
 @router.get("/{todo_id}", response_model=TodoResponse)
 async def get_todo(
     todo_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get a specific todo by ID"""
-    todo = db.query(Todo).filter(
-        and_(Todo.id == todo_id, Todo.owner_id == current_user.id)
-    ).first()
+    """Get a specific todo by ID (ETag/If-None-Match like GET /todos)"""
+    etag = await generation_etag(current_user.id, "todos", request)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    todo = await db.scalar(
+        select(Todo).where(and_(Todo.id == todo_id, Todo.owner_id == current_user.id, Todo.deleted_at.is_(None)))
+    )
     
     if not todo:
         raise HTTPException(
@@ -139,6 +803,7 @@ async def get_todo(
             detail="Todo not found"
         )
     
+    response.headers.update(validator_headers(etag))
     return todo
 
 @router.put("/{todo_id}", response_model=TodoResponse)
@@ -150,31 +815,23 @@ async def update_todo(
     date: Optional[str] = Form(None),
     status: Optional[str] = Form(None),
     image: Optional[UploadFile] = File(None),
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Update a specific todo, including optional image upload"""
-    todo = db.query(Todo).filter(
-        and_(Todo.id == todo_id, Todo.owner_id == current_user.id)
-    ).first()
+    todo = await db.scalar(
+        select(Todo).where(and_(Todo.id == todo_id, Todo.owner_id == current_user.id, Todo.deleted_at.is_(None)))
+    )
     if not todo:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Todo not found"
         )
     # Handle image upload if provided
+    replaced_image = None
     if image:
-        uploads_dir = os.path.join(os.getcwd(), "uploads")
-        os.makedirs(uploads_dir, exist_ok=True)
-        _, ext = os.path.splitext(image.filename or "")
-        image_filename = f"{uuid.uuid4().hex}{ext}"
-        dest_path = os.path.join(uploads_dir, image_filename)
-        try:
-            with open(dest_path, "wb") as f:
-                copyfileobj(image.file, f)
-        finally:
-            image.file.close()
-        todo.image = image_filename
+        replaced_image = todo.image
+        todo.image = await save_upload(image)
     # Only update fields that are present in the request
     if title is not None and title != "":
         todo.title = title
@@ -194,20 +851,25 @@ async def update_todo(
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid date format. Use YYYY-MM-DD or ISO format.")
     if status is not None and status != "":
         todo.status = status
-    db.commit()
-    db.refresh(todo)
+    todo.version = await next_todo_version(db, current_user.id)
+    await db.commit()
+    await db.refresh(todo)
+    await invalidate_user_cache(current_user.id, "todos")
+    await publish_events(current_user.id, [todo_event("updated", todo)])
+    if replaced_image != todo.image:
+        await release_uploads(db, [replaced_image])
     return todo
 
 @router.delete("/{todo_id}", response_model=MessageResponse)
 async def delete_todo(
     todo_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a specific todo"""
-    todo = db.query(Todo).filter(
-        and_(Todo.id == todo_id, Todo.owner_id == current_user.id)
-    ).first()
+    todo = await db.scalar(
+        select(Todo).where(and_(Todo.id == todo_id, Todo.owner_id == current_user.id, Todo.deleted_at.is_(None)))
+    )
     
     if not todo:
         raise HTTPException(
@@ -215,21 +877,28 @@ async def delete_todo(
             detail="Todo not found"
         )
     
-    db.delete(todo)
-    db.commit()
+    # Kept as a tombstone for GET /todos/changes; the image is released now
+    image = todo.image
+    todo.deleted_at = func.now()
+    todo.image = None
+    todo.version = await next_todo_version(db, current_user.id)
+    await db.commit()
+    await invalidate_user_cache(current_user.id, "todos")
+    await publish_events(current_user.id, [{"type": "deleted", "id": todo_id}])
+    await release_uploads(db, [image])
     
     return MessageResponse(message="Todo deleted successfully")
 
 @router.patch("/{todo_id}/toggle", response_model=TodoResponse)
 async def toggle_todo_completion(
     todo_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Toggle todo completion status"""
-    todo = db.query(Todo).filter(
-        and_(Todo.id == todo_id, Todo.owner_id == current_user.id)
-    ).first()
+    todo = await db.scalar(
+        select(Todo).where(and_(Todo.id == todo_id, Todo.owner_id == current_user.id, Todo.deleted_at.is_(None)))
+    )
     
     if not todo:
         raise HTTPException(
@@ -238,26 +907,10 @@ async def toggle_todo_completion(
         )
     
     todo.completed = not todo.completed
-    db.commit()
-    db.refresh(todo)
+    todo.version = await next_todo_version(db, current_user.id)
+    await db.commit()
+    await db.refresh(todo)
+    await invalidate_user_cache(current_user.id, "todos")
+    await publish_events(current_user.id, [todo_event("toggled", todo)])
     
     return todo
-
-@router.get("/stats")
-async def get_todo_stats(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
-):
-    """Get todo statistics for current user"""
-    total_todos = db.query(Todo).filter(Todo.owner_id == current_user.id).count()
-    completed_todos = db.query(Todo).filter(
-        and_(Todo.owner_id == current_user.id, Todo.completed == True)
-    ).count()
-    pending_todos = total_todos - completed_todos
-    
-    return {
-        "total_todos": total_todos,
-        "completed_todos": completed_todos,
-        "pending_todos": pending_todos,
-        "completion_rate": round((completed_todos / total_todos * 100), 2) if total_todos > 0 else 0
-    }
\ No newline at end of file
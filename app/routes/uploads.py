@@ -0,0 +1,113 @@
+from fastapi import APIRouter, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional, Tuple
+import re
+from app.uploads import LocalStorage, storage, content_type, ensure_derivative, UPLOAD_SERVE_MODE, UPLOAD_ACCEL_PREFIX
+from app.images import parse_derivative
+from app.conditional import etag_matches
+
+router = APIRouter(prefix="/uploads", tags=["Uploads"])
+
+# Stored names are flat; anything else (paths, dotfiles) is not an upload
+UPLOAD_NAME = re.compile(r"[A-Za-z0-9_-][A-Za-z0-9._-]*")
+# "<sha256><ext>": the name changes whenever the content does
+CONTENT_ADDRESSED = re.compile(r"(?P<digest>[0-9a-f]{64})\.[a-z]+")
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Derivatives and legacy names can be re-rendered/replaced in place
+REVALIDATE = "public, max-age=86400"
+
+def upload_validators(name: str, size: int, mtime: float) -> Tuple[str, str]:
+    """(ETag, Cache-Control) for a stored file"""
+    match = CONTENT_ADDRESSED.fullmatch(name)
+    if match:
+        return f'"{match.group("digest")}"', IMMUTABLE
+    return f'"{int(mtime):x}-{size:x}"', REVALIDATE
+
+def is_not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """[start, end) of a single "bytes=" range; None means send everything.
+
+    Raises 416 for a range that lies outside the file. Multi-range requests
+    get the whole file.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[6:].strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) + 1 if last else size
+        else:
+            start, end = max(size - int(last), 0), size
+    except ValueError:
+        return None
+    end = min(end, size)
+    if start >= end:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end
+
+@router.api_route("/{name}", methods=["GET", "HEAD"])
+async def get_upload(name: str, request: Request):
+    """Serve a stored todo image, or a derivative of one (rendered on first request).
+
+    Supports conditional (ETag/Last-Modified) and single-range requests;
+    with UPLOAD_SERVE_MODE=accel nginx sends the bytes instead.
+    """
+    if not UPLOAD_NAME.fullmatch(name):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    stat = await storage.stat(name)
+    if stat is None:
+        derivative = parse_derivative(name)
+        if derivative is not None and await ensure_derivative(*derivative):
+            stat = await storage.stat(name)
+    if stat is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+    size, mtime = stat
+    etag, cache_control = upload_validators(name, size, mtime)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": cache_control,
+        "Last-Modified": formatdate(mtime, usegmt=True),
+        "Accept-Ranges": "bytes",
+    }
+    if is_not_modified(request, etag, mtime):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    media_type = content_type(name)
+    if UPLOAD_SERVE_MODE == "accel" and isinstance(storage, LocalStorage):
+        # nginx serves the file (ranges included) from its internal location
+        headers["X-Accel-Redirect"] = f"{UPLOAD_ACCEL_PREFIX}{name}"
+        return Response(headers=headers, media_type=media_type)
+
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if if_range is None or if_range.strip() == etag:
+        byte_range = parse_range(request.headers.get("range"), size)
+    start, end = byte_range or (0, size)
+    headers["Content-Length"] = str(end - start)
+    status_code = status.HTTP_200_OK
+    if byte_range:
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+
+    if request.method == "HEAD":
+        return Response(status_code=status_code, headers=headers, media_type=media_type)
+    return StreamingResponse(storage.read(name, start, end), status_code=status_code, headers=headers, media_type=media_type)
@@ -1,7 +1,8 @@
-from pydantic import BaseModel, EmailStr, validator
+from pydantic import BaseModel, EmailStr, Field, computed_field, validator
 from datetime import datetime
-from typing import Optional, List
+from typing import Any, Optional, List, Dict
 from enum import Enum
+from app.images import derivative_name
 
 class PriorityEnum(str, Enum):
     low = "low"
@@ -38,6 +39,38 @@ class UserResponse(UserBase):
     class Config:
         from_attributes = True
 
+class CurrentUser(BaseModel):
+    """Detached snapshot of the authenticated user, safe to cache.
+
+    Carries no password hash or OAuth token; handlers that change the user
+    load the row from the database instead.
+    """
+    id: int
+    email: str
+    username: str
+    firstname: Optional[str] = None
+    lastname: Optional[str] = None
+    contact: Optional[str] = None
+    position: Optional[str] = None
+    is_active: bool = True
+    created_at: Optional[datetime] = None
+    google_calendar_connected: bool = False
+
+    @classmethod
+    def from_user(cls, user) -> "CurrentUser":
+        return cls(
+            id=user.id,
+            email=user.email,
+            username=user.username,
+            firstname=user.firstname,
+            lastname=user.lastname,
+            contact=user.contact,
+            position=user.position,
+            is_active=bool(user.is_active),
+            created_at=user.created_at,
+            google_calendar_connected=bool(user.google_calendar_token),
+        )
+
 # Todo Schemas
 class TodoBase(BaseModel):
     title: str
@@ -52,6 +85,10 @@ class TodoBase(BaseModel):
 class TodoCreate(TodoBase):
     pass
 
+class TodoImport(TodoCreate):
+    """One record of POST /todos/import; exports import back unchanged"""
+    completed: bool = False
+
 class TodoUpdate(BaseModel):
     title: Optional[str] = None
     description: Optional[str] = None
@@ -61,6 +98,12 @@ class TodoUpdate(BaseModel):
     status: Optional[str] = None
     image: Optional[str] = None
 
+def upload_url(name: Optional[str], variant: Optional[str] = None) -> Optional[str]:
+    """Path serving a stored image, or one of its resized WebP derivatives"""
+    if not name or "/" in name:
+        return None
+    return f"/uploads/{derivative_name(name, variant) if variant else name}"
+
 class TodoResponse(TodoBase):
     id: int
     completed: bool
@@ -68,16 +111,128 @@ class TodoResponse(TodoBase):
     created_at: datetime
     updated_at: Optional[datetime] = None
     owner_id: int
+
+    @computed_field
+    @property
+    def image_url(self) -> Optional[str]:
+        return upload_url(self.image)
+
+    # Small WebP for list views; rendered on upload or on first request
+    @computed_field
+    @property
+    def thumbnail_url(self) -> Optional[str]:
+        return upload_url(self.image, "thumb")
+
+    @computed_field
+    @property
+    def large_url(self) -> Optional[str]:
+        return upload_url(self.image, "large")
     
     class Config:
         from_attributes = True
 
 class TodoList(BaseModel):
     todos: List[TodoResponse]
-    total: int
-    page: int
+    # total/pages are omitted (null) when the count was skipped
+    total: Optional[int] = None
+    # page is null in cursor mode
+    page: Optional[int] = None
     size: int
-    pages: int
+    pages: Optional[int] = None
+    # Pass next_cursor back as ?cursor= to fetch the following page
+    next_cursor: Optional[str] = None
+    has_more: bool = False
+
+class TodoChanges(BaseModel):
+    # Created or updated since the token (every todo on a full sync)
+    todos: List[TodoResponse]
+    # Ids of todos deleted since the token
+    deleted: List[int]
+    # Pass back as ?since=: right away while has_more, else on the next sync
+    next_token: str
+    has_more: bool = False
+
+# Largest number of items accepted by one /todos/batch request
+MAX_BATCH_SIZE = 100
+
+class TodoBatchCreate(BaseModel):
+    todos: List[TodoCreate] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+class TodoBatchUpdateItem(TodoUpdate):
+    id: int
+    # Flip completed (after any other fields are applied)
+    toggle: bool = False
+
+class TodoBatchUpdate(BaseModel):
+    todos: List[TodoBatchUpdateItem] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+class TodoBatchDelete(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+class TodoBatchItemResult(BaseModel):
+    # Position of the item in the request
+    index: int
+    id: Optional[int] = None
+    # HTTP-style status of this item (200, 201, 404, ...)
+    status: int
+    todo: Optional[TodoResponse] = None
+    detail: Optional[str] = None
+
+class TodoBatchResult(BaseModel):
+    results: List[TodoBatchItemResult]
+
+class TodoImportError(BaseModel):
+    # 1-based line where the rejected record starts
+    line: int
+    detail: str
+
+class TodoImportResult(BaseModel):
+    format: str
+    imported: int
+    rejected: int
+    # First rejected rows, in order
+    errors: List[TodoImportError]
+
+class TodoStats(BaseModel):
+    total_todos: int
+    completed_todos: int
+    pending_todos: int
+    completion_rate: float
+    # Not completed and scheduled before now
+    overdue_todos: int
+    by_status: Dict[str, int]
+    by_priority: Dict[str, int]
+
+class TodoSearchHit(BaseModel):
+    todo: TodoResponse
+    # Higher is a better match
+    rank: float
+    # Excerpt with matched words wrapped in <b></b>
+    snippet: Optional[str] = None
+
+class TodoSearchResults(BaseModel):
+    query: str
+    hits: List[TodoSearchHit]
+
+# Background job Schemas
+class JobResponse(BaseModel):
+    id: str
+    kind: str
+    # queued, running, retrying, succeeded or failed
+    status: str
+    attempts: int
+    max_attempts: int
+    progress: Optional[Dict[str, Any]] = None
+    result: Optional[Any] = None
+    # Last attempt's error
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+    @computed_field
+    @property
+    def status_url(self) -> str:
+        return f"/jobs/{self.id}"
 
 # Token Schemas
 class Token(BaseModel):
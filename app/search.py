@@ -0,0 +1,112 @@
+import re
+from typing import List, Optional, Tuple
+from sqlalchemy import select, func, literal_column, or_, table, column
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import DATABASE_URL
+from app.models import Todo
+
+# Full-text search over todo title/description.
+# PostgreSQL: generated, GIN-indexed tsvector column (todos.search_vector).
+# SQLite: FTS5 table kept in sync by triggers (todos_fts).
+# Both are created by migration 0003; other backends fall back to ILIKE.
+SEARCH_BACKEND = make_url(DATABASE_URL).get_backend_name()
+
+TS_CONFIG = "english"
+HEADLINE_OPTIONS = "StartSel=<b>, StopSel=</b>, MaxWords=25, MinWords=8, MaxFragments=2"
+SNIPPET_CHARS = 80
+
+search_vector = literal_column("todos.search_vector")
+todos_fts = table("todos_fts", column("rowid"), column("title"), column("description"))
+
+def tokenize(term: str) -> List[str]:
+    """Split user input into plain word tokens (drops query operators)"""
+    return re.findall(r"\w+", term.lower())
+
+def to_tsquery_text(tokens: List[str]) -> str:
+    """Prefix-matching tsquery: every word must match the start of a lexeme"""
+    return " & ".join(f"{token}:*" for token in tokens)
+
+def to_fts5_query(tokens: List[str]) -> str:
+    """Prefix-matching FTS5 query with each token quoted"""
+    return " ".join(f'"{token}"*' for token in tokens)
+
+def match_clause(term: str):
+    """WHERE clause selecting todos whose title/description match term"""
+    tokens = tokenize(term)
+    if not tokens:
+        return None
+    if SEARCH_BACKEND == "postgresql":
+        return search_vector.op("@@")(func.to_tsquery(TS_CONFIG, to_tsquery_text(tokens)))
+    if SEARCH_BACKEND == "sqlite":
+        matches = select(todos_fts.c.rowid).where(
+            literal_column("todos_fts").op("MATCH")(to_fts5_query(tokens))
+        )
+        return Todo.id.in_(matches)
+    pattern = f"%{term}%"
+    return or_(Todo.title.ilike(pattern), Todo.description.ilike(pattern))
+
+def make_snippet(text: Optional[str], tokens: List[str]) -> Optional[str]:
+    """Cut a short excerpt around the first token found in text"""
+    if not text:
+        return None
+    lowered = text.lower()
+    positions = [lowered.find(token) for token in tokens if token in lowered]
+    start = max(min(positions) - SNIPPET_CHARS // 2, 0) if positions else 0
+    snippet = text[start:start + SNIPPET_CHARS]
+    return ("…" if start else "") + snippet + ("…" if start + SNIPPET_CHARS < len(text) else "")
+
+async def search_todos(
+    db: AsyncSession, owner_id: int, term: str, limit: int = 20
+) -> List[Tuple[Todo, float, Optional[str]]]:
+    """Ranked full-text search of one user's todos.
+
+    Returns (todo, rank, snippet) tuples, best match first. A higher rank is
+    a better match; snippets mark matched words with <b></b>.
+    """
+    tokens = tokenize(term)
+    if not tokens:
+        return []
+
+    if SEARCH_BACKEND == "postgresql":
+        query = func.to_tsquery(TS_CONFIG, to_tsquery_text(tokens))
+        rank = func.ts_rank_cd(search_vector, query)
+        # Rank and limit first so ts_headline only runs on the returned rows
+        ranked = (
+            select(Todo.id, rank.label("rank"))
+            .where(Todo.owner_id == owner_id, Todo.deleted_at.is_(None), search_vector.op("@@")(query))
+            .order_by(rank.desc(), Todo.id.desc())
+            .limit(limit)
+            .subquery()
+        )
+        headline = func.ts_headline(
+            TS_CONFIG, func.coalesce(Todo.description, Todo.title), query, HEADLINE_OPTIONS
+        )
+        stmt = (
+            select(Todo, ranked.c.rank, headline.label("snippet"))
+            .join(ranked, ranked.c.id == Todo.id)
+            .order_by(ranked.c.rank.desc(), Todo.id.desc())
+        )
+        return [(todo, float(score), snippet) for todo, score, snippet in (await db.execute(stmt)).all()]
+
+    if SEARCH_BACKEND == "sqlite":
+        fts = literal_column("todos_fts")
+        # bm25 is lower-is-better; title matches weigh 10x description matches
+        bm25 = func.bm25(fts, 10.0, 1.0)
+        stmt = (
+            select(Todo, bm25.label("rank"), func.snippet(fts, -1, "<b>", "</b>", "…", 16).label("snippet"))
+            .select_from(todos_fts.join(Todo, Todo.id == todos_fts.c.rowid))
+            .where(fts.op("MATCH")(to_fts5_query(tokens)), Todo.owner_id == owner_id, Todo.deleted_at.is_(None))
+            .order_by(bm25, Todo.id.desc())
+            .limit(limit)
+        )
+        return [(todo, -float(score), snippet) for todo, score, snippet in (await db.execute(stmt)).all()]
+
+    stmt = (
+        select(Todo)
+        .where(Todo.owner_id == owner_id, Todo.deleted_at.is_(None), match_clause(term))
+        .order_by(Todo.id.desc())
+        .limit(limit)
+    )
+    todos = (await db.scalars(stmt)).all()
+    return [(todo, 0.0, make_snippet(todo.description or todo.title, tokens)) for todo in todos]
@@ -0,0 +1,165 @@
+import codecs
+import csv
+import io
+import json
+import os
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Dict, List
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from app.database import DATABASE_URL, SyncSessionAdapter
+from app.models import Todo
+from app.schemas import TodoImport
+
+# Bulk todo import for POST /todos/import.
+# Bodies are parsed record by record as they arrive and inserted in chunks:
+# COPY on PostgreSQL, a multi-row INSERT (executemany) elsewhere.
+IMPORT_BACKEND = make_url(DATABASE_URL).get_backend_name()
+
+IMPORT_CHUNK_SIZE = 1000
+MAX_IMPORT_ROWS = 100_000
+# Rejected rows beyond this are counted but not described
+MAX_IMPORT_ERRORS = 100
+# A single record larger than this is rejected instead of buffered
+MAX_RECORD_BYTES = 1_000_000
+# Largest body POST /todos/import?background=true will store for its job
+MAX_IMPORT_UPLOAD_BYTES = int(os.getenv("MAX_IMPORT_UPLOAD_BYTES", 100 * 1024 * 1024))
+# Inflate compressed bodies in bounded steps
+INFLATE_STEP = 64 * 1024
+
+IMPORT_COLUMNS = ("title", "description", "priority", "date", "status", "completed", "owner_id", "version")
+
+class RecordTooLarge(Exception):
+    """A line/record exceeded MAX_RECORD_BYTES"""
+
+async def inflate(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Decompress a gzip/zlib body without expanding a whole chunk at once"""
+    decompressor = zlib.decompressobj(wbits=47)
+    async for chunk in chunks:
+        data = chunk
+        while data:
+            yield decompressor.decompress(data, INFLATE_STEP)
+            data = decompressor.unconsumed_tail
+    yield decompressor.flush()
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a streamed UTF-8 body into lines (a leading BOM is dropped)"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+        if len(pending) > MAX_RECORD_BYTES:
+            raise RecordTooLarge()
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+async def iter_ndjson(lines: AsyncIterator[str]) -> AsyncIterator[tuple]:
+    """Yield (line number, object or error message) for each non-blank line"""
+    number = 0
+    async for line in lines:
+        number += 1
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield number, f"Invalid JSON: {e}"
+            continue
+        yield number, record if isinstance(record, dict) else "Expected a JSON object"
+
+async def iter_csv(lines: AsyncIterator[str]) -> AsyncIterator[tuple]:
+    """Yield (line number, row dict) for each CSV record after the header"""
+    header = None
+    number = start = 0
+    record = ""
+    async for line in lines:
+        number += 1
+        start = start or number
+        record += line
+        # Quotes are doubled inside quoted fields, so an odd count means a
+        # quoted field continues on the next line
+        if record.count('"') % 2:
+            if len(record) > MAX_RECORD_BYTES:
+                raise RecordTooLarge()
+            continue
+        values = next(csv.reader([record]), [])
+        record_line, record, start = start, "", 0
+        if not any(value.strip() for value in values):
+            continue
+        if header is None:
+            header = [value.strip().lower() for value in values]
+            continue
+        # Empty cells mean "not set"
+        yield record_line, {name: value for name, value in zip(header, values) if value != ""}
+    if record.strip():
+        yield start, "Unterminated quoted field"
+
+def validate_record(record: Dict, owner_id: int) -> Dict:
+    """Validate one record with TodoImport and return its insert values"""
+    # Nulls mean "not set", like empty CSV cells, so fields fall back to defaults
+    record = {name: value for name, value in record.items() if value is not None}
+    date = record.get("date")
+    if isinstance(date, str) and len(date) == 10:
+        # Plain YYYY-MM-DD, as accepted by POST /todos
+        try:
+            record = {**record, "date": datetime.strptime(date, "%Y-%m-%d")}
+        except ValueError:
+            pass
+    todo = TodoImport(**record)
+    return {
+        "title": todo.title,
+        "description": todo.description,
+        "priority": todo.priority.value,
+        "date": todo.date,
+        "status": todo.status,
+        "completed": todo.completed,
+        "owner_id": owner_id,
+    }
+
+def validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}"
+        for item in error.errors()
+    )
+
+def copy_rows_psycopg2(session, rows: List[Dict]):
+    """COPY rows through psycopg2 (runs in the threadpool)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        # None becomes an unquoted empty field, which COPY reads as NULL
+        writer.writerow(["" if row[name] is None else row[name] for name in IMPORT_COLUMNS])
+    buffer.seek(0)
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY todos ({', '.join(IMPORT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer
+        )
+    finally:
+        cursor.close()
+
+async def insert_rows(db: AsyncSession, rows: List[Dict]):
+    """Insert one chunk of validated rows in the current transaction"""
+    if not rows:
+        return
+    if IMPORT_BACKEND == "postgresql":
+        if isinstance(db, SyncSessionAdapter):
+            await run_in_threadpool(copy_rows_psycopg2, db.sync_session, rows)
+        else:
+            connection = await db.connection()
+            raw = await connection.get_raw_connection()
+            await raw.driver_connection.copy_records_to_table(
+                "todos",
+                records=[tuple(row[name] for name in IMPORT_COLUMNS) for row in rows],
+                columns=IMPORT_COLUMNS,
+            )
+        return
+    await db.execute(insert(Todo), rows)
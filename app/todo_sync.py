@@ -0,0 +1,130 @@
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+from sqlalchemy import delete, func, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import db_session
+from app.models import Todo, User
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Delta sync for GET /todos/changes.
+# Every write to a user's todos takes the next value of users.todo_version
+# (an UPDATE ... RETURNING, which also locks the user row until commit, so
+# a user's versions become visible in the order they were handed out) and
+# stamps it on the todos it changes. A sync token is the highest version a
+# client has seen; what changed since is one range scan of the
+# (owner_id, version, id) index. Deleted todos stay behind as tombstones
+# (deleted_at set) so the scan reports deletions too.
+
+# Seconds tombstones are kept; clients that last synced before that must
+# start over with a full sync
+TODO_TOMBSTONE_TTL = int(os.getenv("TODO_TOMBSTONE_TTL", 30 * 86400))
+TODO_TOMBSTONE_PURGE_INTERVAL = int(os.getenv("TODO_TOMBSTONE_PURGE_INTERVAL", 3600))
+
+# Version of rows inserted by an import until it stamps them right before
+# commit (see stamp_pending_todos)
+PENDING_VERSION = -1
+
+class SyncTokenExpired(Exception):
+    """Tombstones after the token have been purged"""
+
+async def next_todo_version(db: AsyncSession, owner_id: int) -> int:
+    """Next version for the owner's todos, in the current transaction.
+
+    Take it right before committing: the owner's other writes wait for
+    this transaction from here on.
+    """
+    return await db.scalar(
+        update(User)
+        .where(User.id == owner_id)
+        .values(todo_version=User.todo_version + 1)
+        .returning(User.todo_version)
+    )
+
+async def stamp_pending_todos(db: AsyncSession, owner_id: int):
+    """Give the owner's rows inserted at PENDING_VERSION a real version, so
+    a long import holds the version lock only for this one statement"""
+    version = await next_todo_version(db, owner_id)
+    await db.execute(
+        update(Todo)
+        .where(Todo.owner_id == owner_id, Todo.version == PENDING_VERSION)
+        .values(version=version)
+        .execution_options(synchronize_session=False)
+    )
+
+def encode_sync_token(version: int, todo_id: Optional[int] = None) -> str:
+    """"<version>" once a client is caught up, "<version>.<id>" between pages"""
+    return str(version) if todo_id is None else f"{version}.{todo_id}"
+
+def decode_sync_token(token: str) -> Tuple[int, Optional[int]]:
+    version, _, todo_id = token.partition(".")
+    return int(version), int(todo_id) if todo_id else None
+
+async def load_changes(
+    db: AsyncSession, owner_id: int, since: Optional[Tuple[int, Optional[int]]], limit: int
+) -> Tuple[List[Todo], List[int], str, bool]:
+    """Todos changed after since (every live todo without one), ids deleted
+    after since, the token to pass next time and whether more changes wait.
+
+    Raises SyncTokenExpired when deletions after since may have been purged.
+    """
+    # Read the version first: every todo at or below it is committed, so
+    # the scan below can't skip one that commits later with a lower version
+    current, purged = (await db.execute(
+        select(User.todo_version, User.todo_purged_version).where(User.id == owner_id)
+    )).one()
+    query = select(Todo).where(Todo.owner_id == owner_id, Todo.version <= current)
+    if since is None:
+        # Nothing to delete on a client that has nothing yet
+        query = query.where(Todo.deleted_at.is_(None))
+    else:
+        version, todo_id = since
+        if version < purged:
+            raise SyncTokenExpired()
+        if todo_id is None:
+            query = query.where(Todo.version > version)
+        else:
+            query = query.where(tuple_(Todo.version, Todo.id) > (version, todo_id))
+
+    rows = (await db.scalars(query.order_by(Todo.version, Todo.id).limit(limit + 1))).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_token = encode_sync_token(rows[-1].version, rows[-1].id) if has_more else encode_sync_token(current)
+    todos = [todo for todo in rows if todo.deleted_at is None]
+    deleted = [todo.id for todo in rows if todo.deleted_at is not None]
+    return todos, deleted, next_token, has_more
+
+async def purge_tombstones(ttl: int = TODO_TOMBSTONE_TTL) -> int:
+    """Delete tombstones older than ttl, remembering per user the highest
+    version purged so older sync tokens are refused"""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=ttl)
+    expired = (Todo.deleted_at.isnot(None), Todo.deleted_at < cutoff)
+    async with db_session() as db:
+        purged = (await db.execute(
+            select(Todo.owner_id, func.max(Todo.version)).where(*expired).group_by(Todo.owner_id)
+        )).all()
+        for owner_id, version in purged:
+            await db.execute(
+                update(User)
+                .where(User.id == owner_id, User.todo_purged_version < version)
+                .values(todo_purged_version=version)
+            )
+        result = await db.execute(delete(Todo).where(*expired).execution_options(synchronize_session=False))
+        await db.commit()
+        return result.rowcount
+
+async def run_tombstone_purge(interval: int = TODO_TOMBSTONE_PURGE_INTERVAL):
+    """Periodically purge expired tombstones until cancelled"""
+    while True:
+        try:
+            removed = await purge_tombstones()
+            if removed:
+                print(f"🧹 Purged {removed} deleted todo(s)")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Tombstone purge error: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,416 @@
+import asyncio
+import hashlib
+import mimetypes
+import os
+import tempfile
+import time
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+from fastapi import HTTPException, UploadFile, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from app.database import db_session
+from app.models import Todo
+from app.images import IMAGE_VARIANTS, derivative_name, parse_derivative, render_variant
+from app.jobs import JOB_TTL, Job, enqueue_job, job_handler
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Todo images are stored once per distinct content under "<sha256><ext>",
+# so identical uploads share a file and names never change meaning.
+# "local" keeps them in UPLOAD_DIR; "s3" uses an S3-compatible bucket
+# (AWS, MinIO, ...) and needs boto3.
+UPLOAD_BACKEND = os.getenv("UPLOAD_BACKEND", "local")
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", os.path.join(os.getcwd(), "uploads"))
+# Partial uploads are written here first (same filesystem as UPLOAD_DIR so
+# the final move is an atomic rename)
+UPLOAD_TMP_DIR = os.getenv("UPLOAD_TMP_DIR", os.path.join(UPLOAD_DIR, ".tmp"))
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", 5 * 1024 * 1024))
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# Files younger than this are never garbage-collected, which covers a
+# request that re-used an existing file but has not committed yet
+UPLOAD_GC_GRACE = int(os.getenv("UPLOAD_GC_GRACE", 300))
+UPLOAD_GC_INTERVAL = int(os.getenv("UPLOAD_GC_INTERVAL", 3600))
+# "app" streams uploads from this process; "accel" (local storage only) hands
+# the file to nginx with X-Accel-Redirect to UPLOAD_ACCEL_PREFIX + name
+UPLOAD_SERVE_MODE = os.getenv("UPLOAD_SERVE_MODE", "app")
+UPLOAD_ACCEL_PREFIX = os.getenv("UPLOAD_ACCEL_PREFIX", "/_uploads/")
+
+S3_BUCKET = os.getenv("S3_BUCKET", "todo-uploads")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")
+
+# Files produced or consumed by background jobs (import bodies, export
+# results) share the storage; the leading dot keeps them out of
+# GET /uploads, and the GC removes them JOB_TTL after they were written
+JOB_FILE_PREFIX = ".job-"
+
+# Accepted image types, recognised by their leading bytes (the client's
+# Content-Type is not trusted)
+IMAGE_TYPES = {
+    ".jpg": "image/jpeg",
+    ".png": "image/png",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+}
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """Extension for the image format the data starts with, if accepted"""
+    if head.startswith(b"\xff\xd8\xff"):
+        return ".jpg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return ".png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return ".gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+def content_type(name: str) -> str:
+    ext = os.path.splitext(name)[1].lower()
+    return IMAGE_TYPES.get(ext) or mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+class LocalStorage:
+    """Stored files in a local directory"""
+
+    def __init__(self, directory: str = UPLOAD_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _store(self, temp_path: str, name: str) -> bool:
+        path = self.path(name)
+        if os.path.exists(path):
+            # Same content is already stored; refresh its age so the
+            # garbage collector leaves it alone while this request commits
+            os.utime(path)
+            os.unlink(temp_path)
+            return False
+        os.replace(temp_path, path)
+        return True
+
+    async def store(self, temp_path: str, name: str) -> bool:
+        """Move a finished temp file into storage; False if it was a duplicate"""
+        return await run_in_threadpool(self._store, temp_path, name)
+
+    def _delete(self, name: str):
+        try:
+            os.unlink(self.path(name))
+        except FileNotFoundError:
+            pass
+
+    async def delete(self, name: str):
+        await run_in_threadpool(self._delete, name)
+
+    def _stat(self, name: str) -> Optional[Tuple[int, float]]:
+        try:
+            stat = os.stat(self.path(name))
+        except FileNotFoundError:
+            return None
+        return stat.st_size, stat.st_mtime
+
+    async def stat(self, name: str) -> Optional[Tuple[int, float]]:
+        """(size, modification time) of a stored file, None if missing"""
+        return await run_in_threadpool(self._stat, name)
+
+    async def age(self, name: str) -> Optional[float]:
+        """Seconds since the file was stored or last re-used (None if missing)"""
+        stat = await self.stat(name)
+        return time.time() - stat[1] if stat else None
+
+    def _names(self) -> List[str]:
+        return [
+            entry.name for entry in os.scandir(self.directory)
+            if entry.is_file() and (not entry.name.startswith(".") or entry.name.startswith(JOB_FILE_PREFIX))
+        ]
+
+    async def names(self) -> List[str]:
+        return await run_in_threadpool(self._names)
+
+    async def read(self, name: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Stream a stored file, or bytes [start, end) of it, in chunks"""
+        f = await run_in_threadpool(open, self.path(name), "rb")
+        try:
+            if start:
+                await run_in_threadpool(f.seek, start)
+            remaining = end - start if end is not None else None
+            while remaining is None or remaining > 0:
+                size = UPLOAD_CHUNK_SIZE if remaining is None else min(UPLOAD_CHUNK_SIZE, remaining)
+                chunk = await run_in_threadpool(f.read, size)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+        finally:
+            f.close()
+
+class S3Storage:
+    """Stored files as objects in an S3-compatible bucket"""
+
+    def __init__(self, bucket: str = S3_BUCKET, endpoint_url: Optional[str] = S3_ENDPOINT_URL):
+        import boto3
+        from botocore.exceptions import ClientError
+
+        self.bucket = bucket
+        # Credentials come from the usual AWS_ACCESS_KEY_ID/AWS_SECRET_ACCESS_KEY
+        self.client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.ClientError = ClientError
+
+    def _head(self, name: str) -> Optional[dict]:
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=name)
+        except self.ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def _store(self, temp_path: str, name: str) -> bool:
+        try:
+            if self._head(name) is not None:
+                # Copying an object onto itself refreshes LastModified
+                self.client.copy_object(
+                    Bucket=self.bucket, Key=name,
+                    CopySource={"Bucket": self.bucket, "Key": name},
+                    ContentType=content_type(name), MetadataDirective="REPLACE",
+                )
+                return False
+            self.client.upload_file(temp_path, self.bucket, name, ExtraArgs={"ContentType": content_type(name)})
+            return True
+        finally:
+            os.unlink(temp_path)
+
+    async def store(self, temp_path: str, name: str) -> bool:
+        return await run_in_threadpool(self._store, temp_path, name)
+
+    async def delete(self, name: str):
+        await run_in_threadpool(self.client.delete_object, Bucket=self.bucket, Key=name)
+
+    def _stat(self, name: str) -> Optional[Tuple[int, float]]:
+        head = self._head(name)
+        return (head["ContentLength"], head["LastModified"].timestamp()) if head else None
+
+    async def stat(self, name: str) -> Optional[Tuple[int, float]]:
+        return await run_in_threadpool(self._stat, name)
+
+    async def age(self, name: str) -> Optional[float]:
+        stat = await self.stat(name)
+        return time.time() - stat[1] if stat else None
+
+    def _names(self) -> List[str]:
+        names = []
+        for page in self.client.get_paginator("list_objects_v2").paginate(Bucket=self.bucket):
+            names.extend(item["Key"] for item in page.get("Contents", []))
+        return names
+
+    async def names(self) -> List[str]:
+        return await run_in_threadpool(self._names)
+
+    async def read(self, name: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        options = {}
+        if start or end is not None:
+            options["Range"] = f"bytes={start}-{'' if end is None else end - 1}"
+        response = await run_in_threadpool(self.client.get_object, Bucket=self.bucket, Key=name, **options)
+        body = response["Body"]
+        try:
+            while chunk := await run_in_threadpool(body.read, UPLOAD_CHUNK_SIZE):
+                yield chunk
+        finally:
+            body.close()
+
+def create_storage():
+    if UPLOAD_BACKEND == "s3":
+        return S3Storage()
+    return LocalStorage()
+
+# Per-process storage backend
+storage = create_storage()
+
+def new_temp_file():
+    os.makedirs(UPLOAD_TMP_DIR, exist_ok=True)
+    return tempfile.mkstemp(dir=UPLOAD_TMP_DIR)
+
+async def store_bytes(data: bytes, name: str) -> bool:
+    """Store generated content under name"""
+    fd, temp_path = new_temp_file()
+    with os.fdopen(fd, "wb") as f:
+        await run_in_threadpool(f.write, data)
+    return await storage.store(temp_path, name)
+
+async def store_stream(chunks: AsyncIterator[bytes], name: str, max_bytes: int) -> int:
+    """Store a streamed body under name; 413 once it exceeds max_bytes"""
+    fd, temp_path = new_temp_file()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"Body must be at most {max_bytes // (1024 * 1024)} MB"
+                    )
+                await run_in_threadpool(f.write, chunk)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    await storage.store(temp_path, name)
+    return size
+
+async def read_bytes(name: str) -> bytes:
+    return b"".join([chunk async for chunk in storage.read(name)])
+
+def job_file_name(job_id: str, suffix: str = "") -> str:
+    return f"{JOB_FILE_PREFIX}{job_id}{suffix}"
+
+# Derivatives being rendered in this process, so concurrent requests for
+# the same one share a single render
+rendering = {}
+
+async def render_derivative(name: str, variant: str) -> bool:
+    derivative = derivative_name(name, variant)
+    try:
+        data = await read_bytes(name)
+        await store_bytes(await render_variant(data, variant), derivative)
+        return True
+    except Exception as e:
+        print(f"Image derivative error for {derivative}: {e}")
+        return False
+
+async def ensure_derivative(name: str, variant: str) -> bool:
+    """Make sure a derivative of a stored image exists, rendering it if needed"""
+    if parse_derivative(name) is not None or name.startswith(JOB_FILE_PREFIX):
+        # Only originals are resized; re-encoding a derivative loses quality
+        return False
+    derivative = derivative_name(name, variant)
+    if await storage.age(derivative) is not None:
+        return True
+    if await storage.age(name) is None:
+        return False
+    task = rendering.get(derivative)
+    if task is None:
+        task = asyncio.ensure_future(render_derivative(name, variant))
+        rendering[derivative] = task
+        task.add_done_callback(lambda _: rendering.pop(derivative, None))
+    # A cancelled request must not cancel the render others wait on
+    return await asyncio.shield(task)
+
+@job_handler("image_derivatives")
+async def render_derivatives_job(job: Job, name: str) -> dict:
+    rendered = [variant for variant in IMAGE_VARIANTS if await ensure_derivative(name, variant)]
+    return {"name": name, "rendered": rendered}
+
+async def schedule_derivatives(name: str):
+    """Render every derivative of a new upload in a background job"""
+    await enqueue_job("image_derivatives", {"name": name})
+
+async def save_upload(upload: UploadFile) -> str:
+    """Stream an uploaded image into storage and return its stored name.
+
+    Rejects non-images (415) and files over UPLOAD_MAX_BYTES (413) while
+    copying, without holding the file in memory.
+    """
+    try:
+        chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+        ext = sniff_image_type(chunk)
+        if ext is None:
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail="Image must be a JPEG, PNG, GIF or WebP file"
+            )
+
+        fd, temp_path = new_temp_file()
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while chunk:
+                    size += len(chunk)
+                    if size > UPLOAD_MAX_BYTES:
+                        raise HTTPException(
+                            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"Image must be at most {UPLOAD_MAX_BYTES // (1024 * 1024)} MB"
+                        )
+                    digest.update(chunk)
+                    await run_in_threadpool(f.write, chunk)
+                    chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+    finally:
+        await upload.close()
+
+    name = f"{digest.hexdigest()}{ext}"
+    await storage.store(temp_path, name)
+    await schedule_derivatives(name)
+    return name
+
+async def release_uploads(db: AsyncSession, names: Iterable[Optional[str]]):
+    """Delete stored images that no todo references any more (call after commit).
+
+    Files inside the grace period are left for collect_orphan_uploads.
+    """
+    names = {name for name in names if name}
+    if not names:
+        return
+    referenced = set(await db.scalars(select(Todo.image).where(Todo.image.in_(names)).distinct()))
+    for name in names - referenced:
+        try:
+            age = await storage.age(name)
+            if age is not None and age >= UPLOAD_GC_GRACE:
+                await storage.delete(name)
+                for variant in IMAGE_VARIANTS:
+                    await storage.delete(derivative_name(name, variant))
+        except Exception as e:
+            print(f"Upload cleanup error for {name}: {e}")
+
+def purge_temp_files(max_age: float):
+    """Remove partial uploads abandoned by crashed requests"""
+    if not os.path.isdir(UPLOAD_TMP_DIR):
+        return
+    cutoff = time.time() - max_age
+    for entry in os.scandir(UPLOAD_TMP_DIR):
+        if entry.is_file() and entry.stat().st_mtime < cutoff:
+            os.unlink(entry.path)
+
+async def collect_orphan_uploads() -> int:
+    """Delete every stored image (or derivative) older than the grace period
+    that no todo uses, and job files older than JOB_TTL"""
+    # List before querying so a file stored in between is still protected
+    # by its age
+    names = await storage.names()
+    async with db_session() as db:
+        referenced = set(await db.scalars(select(Todo.image).where(Todo.image.isnot(None)).distinct()))
+
+    removed = 0
+    for name in names:
+        if name.startswith(JOB_FILE_PREFIX):
+            age = await storage.age(name)
+            if age is not None and age >= JOB_TTL:
+                await storage.delete(name)
+                removed += 1
+            continue
+        derivative = parse_derivative(name)
+        if name in referenced or (derivative and derivative[0] in referenced):
+            continue
+        age = await storage.age(name)
+        if age is not None and age >= UPLOAD_GC_GRACE:
+            await storage.delete(name)
+            removed += 1
+    await run_in_threadpool(purge_temp_files, UPLOAD_GC_GRACE)
+    return removed
+
+async def run_upload_gc(interval: int = UPLOAD_GC_INTERVAL):
+    """Periodically collect orphaned uploads until cancelled"""
+    while True:
+        try:
+            removed = await collect_orphan_uploads()
+            if removed:
+                print(f"🧹 Removed {removed} orphaned upload(s)")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Upload GC error: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,33 @@
+"""Dedicated background job worker process.
+
+    python -m app.worker
+
+Runs JOB_WORKERS more workers on the Redis queue, in addition to the ones
+inside each API process, so slow jobs can be scaled (and kept off the API
+containers' CPUs) independently of request handling.
+"""
+import asyncio
+from app.jobs import JOB_WORKERS, start_job_workers
+from app.redis_client import redis_client
+from app.images import shutdown_image_pool
+# Modules defining job handlers
+from app import calendar_sync, uploads  # noqa: F401
+from app.routes import todos  # noqa: F401
+
+async def main():
+    await redis_client.connect()
+    workers = start_job_workers(max(JOB_WORKERS, 1))
+    print(f"👷 Running {len(workers)} job worker(s)")
+    try:
+        await asyncio.gather(*workers)
+    finally:
+        for worker in workers:
+            worker.cancel()
+        await redis_client.close()
+        shutdown_image_pool()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
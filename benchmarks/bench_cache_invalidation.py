@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+CACHE INVALIDATION BENCHMARK - KEYS pattern scan vs. generation counter
+Fills Redis with cached list entries for many users, then times invalidating
+one user's entries the old way (KEYS pattern + DEL) and the new way (one
+INCR on the user's generation counter).
+
+Uses REDIS_URL when a server is reachable, otherwise an in-process fakeredis
+(pip install fakeredis).
+
+Usage:
+    python3 benchmarks/bench_cache_invalidation.py
+    python3 benchmarks/bench_cache_invalidation.py --keys 100000 --users 1000
+    REDIS_URL=redis://localhost:6379/15 python3 benchmarks/bench_cache_invalidation.py
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keys", type=int, default=100_000, help="Cached entries to create")
+    parser.add_argument("--users", type=int, default=1_000, help="Users the entries are spread across")
+    parser.add_argument("--repeat", type=int, default=50, help="Invalidations to time per strategy")
+    return parser.parse_args()
+
+async def connect():
+    import redis.asyncio as aioredis
+    url = os.getenv("REDIS_URL", "redis://localhost:6379/15")
+    try:
+        client = aioredis.from_url(url, decode_responses=True)
+        await client.ping()
+        return client, url
+    except Exception:
+        import fakeredis.aioredis
+        return fakeredis.aioredis.FakeRedis(decode_responses=True), "fakeredis (in-process)"
+
+async def fill(client, keys, users, namespace):
+    pipe = client.pipeline(transaction=False)
+    for i in range(keys):
+        user_id = i % users
+        pipe.setex(f"{namespace}:user:{user_id}:todos:g1:get_todos:{i:032x}", 300, '{"todos": []}')
+        if i % 10_000 == 9_999:
+            await pipe.execute()
+    await pipe.execute()
+
+async def time_calls(fn, repeat):
+    timings = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        await fn(i)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), max(timings)
+
+async def run(args):
+    client, label = await connect()
+
+    from app import cache
+    cache.redis_client.client = client
+
+    namespace = "bench:" + cache.CACHE_NAMESPACE
+    await client.delete(*(await client.keys(f"{namespace}:*")) or ["-"])
+    print(f"Redis: {label}")
+    print(f"Filling {args.keys:,} cached entries for {args.users:,} users...")
+    await fill(client, args.keys, args.users, namespace)
+
+    async def keys_scan(i):
+        # Previous implementation: KEYS walks every key in the database
+        keys = await client.keys(f"{namespace}:user:{i % args.users}:todos:*")
+        if keys:
+            await client.delete(*keys)
+
+    async def generation_bump(i):
+        await cache.bump_generation(i % args.users, "todos")
+
+    keys_median, keys_max = await time_calls(keys_scan, args.repeat)
+    gen_median, gen_max = await time_calls(generation_bump, args.repeat)
+
+    print(f"\n{'strategy':<22}{'median ms':>12}{'max ms':>12}")
+    print(f"{'KEYS pattern + DEL':<22}{keys_median:>12.3f}{keys_max:>12.3f}")
+    print(f"{'generation INCR':<22}{gen_median:>12.3f}{gen_max:>12.3f}")
+    print(f"\nspeedup: {keys_median / gen_median:.0f}x (median)")
+
+    await client.delete(*(await client.keys(f"{namespace}:*")) or ["-"])
+    await client.delete(*[cache.generation_key(user_id, "todos") for user_id in range(args.users)])
+
+def main():
+    asyncio.run(run(parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+CALENDAR SYNC BENCHMARK - one insert per request vs. the batch endpoint
+Starts a fake Google Calendar API (events insert/get/patch/delete plus the
+multipart batch endpoint) on localhost with a configurable per-request
+latency and 429 rate, then syncs N todos through app.calendar_sync both the
+old way (one blocking events().insert().execute() each) and batched, and
+reports wall time, HTTP round trips and how many calls needed a retry.
+
+With --serve, only runs the fake server, so the app itself can be pointed at
+it (GOOGLE_CALENDAR_API_URL=http://127.0.0.1:<port>/) and any Google token.
+
+Usage:
+    python3 benchmarks/bench_calendar_sync.py
+    python3 benchmarks/bench_calendar_sync.py --todos 500 --latency-ms 80 --rate-limit 0.1
+    python3 benchmarks/bench_calendar_sync.py --serve --port 8089
+"""
+import argparse
+import email
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+EVENTS_PATH = "/calendar/v3/calendars/primary/events"
+BATCH_PATH = "/batch/calendar/v3"
+STATUS_TEXT = {200: "OK", 204: "No Content", 404: "Not Found", 410: "Gone", 429: "Too Many Requests"}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--todos", type=int, default=200, help="Todos to sync")
+    parser.add_argument("--latency-ms", type=float, default=50, help="Fake server delay per HTTP request")
+    parser.add_argument("--rate-limit", type=float, default=0.05, help="Fraction of calls answered with 429")
+    parser.add_argument("--serve", action="store_true", help="Only run the fake Calendar API")
+    parser.add_argument("--port", type=int, default=0, help="Port for the fake server (default: any free port)")
+    return parser.parse_args()
+
+class FakeCalendar:
+    """In-memory primary calendar shared by the request handlers"""
+
+    def __init__(self, latency: float, rate_limit: float):
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.events = {}
+        self.lock = threading.Lock()
+        self.http_requests = 0
+        self.calls = 0
+        self.throttled = 0
+
+    def call(self, method: str, path: str, body: bytes):
+        """Apply one API call; returns (status, JSON body or None)"""
+        with self.lock:
+            self.calls += 1
+            if random.random() < self.rate_limit:
+                self.throttled += 1
+                return 429, {"error": {"code": 429, "message": "Rate Limit Exceeded",
+                                       "errors": [{"reason": "rateLimitExceeded"}]}}
+            path = path.split("?", 1)[0]
+            if method == "POST" and path == EVENTS_PATH:
+                event = json.loads(body or b"{}")
+                event["id"] = uuid.uuid4().hex
+                event["htmlLink"] = f"https://calendar.example/event?eid={event['id']}"
+                event["etag"] = f'"{time.time_ns()}"'
+                self.events[event["id"]] = event
+                return 200, event
+            if not path.startswith(EVENTS_PATH + "/"):
+                return 404, {"error": {"code": 404, "message": "Not Found"}}
+            event_id = path[len(EVENTS_PATH) + 1:]
+            event = self.events.get(event_id)
+            if event is None:
+                return 404, {"error": {"code": 404, "message": "Not Found"}}
+            if method == "GET":
+                return 200, event
+            if method in ("PATCH", "PUT"):
+                if method == "PUT":
+                    event = {"id": event_id, "htmlLink": event["htmlLink"]}
+                event.update(json.loads(body or b"{}"))
+                event["etag"] = f'"{time.time_ns()}"'
+                self.events[event_id] = event
+                return 200, event
+            if method == "DELETE":
+                del self.events[event_id]
+                return 204, None
+            return 404, {"error": {"code": 404, "message": "Not Found"}}
+
+    def batch(self, content_type: str, body: bytes):
+        """Answer a multipart/mixed batch; returns (content type, body)"""
+        message = email.message_from_bytes(b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body)
+        boundary = uuid.uuid4().hex
+        parts = []
+        for part in message.get_payload():
+            head, _, inner_body = part.get_payload().replace("\r\n", "\n").partition("\n\n")
+            method, path, _ = head.split("\n", 1)[0].split(" ", 2)
+            status, result = self.call(method, path, inner_body.encode())
+            payload = "" if result is None else json.dumps(result)
+            parts.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\n"
+                f"Content-ID: <response-{part['Content-ID'][1:-1]}>\r\n\r\n"
+                f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\n\r\n{payload}\r\n"
+            )
+        parts.append(f"--{boundary}--\r\n")
+        return f"multipart/mixed; boundary={boundary}", "".join(parts).encode()
+
+def make_handler(calendar: FakeCalendar):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def handle_any(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            with calendar.lock:
+                calendar.http_requests += 1
+            time.sleep(calendar.latency)
+            if self.command == "POST" and self.path.startswith(BATCH_PATH):
+                content_type, payload = calendar.batch(self.headers["Content-Type"], body)
+                status = 200
+            else:
+                status, result = calendar.call(self.command, self.path, body)
+                content_type, payload = "application/json", b"" if result is None else json.dumps(result).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        do_GET = do_POST = do_PATCH = do_PUT = do_DELETE = handle_any
+
+    return Handler
+
+def start_server(calendar: FakeCalendar, port: int = 0) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(calendar))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def fake_todos(count: int):
+    priorities = ("low", "medium", "high")
+    return [
+        SimpleNamespace(id=i, title=f"Todo {i}", description="benchmark", priority=priorities[i % 3],
+                        status="Not Started", date=None)
+        for i in range(count)
+    ]
+
+def run(label, calendar, sync):
+    calendar.http_requests = calendar.calls = calendar.throttled = 0
+    started = time.perf_counter()
+    results = sync()
+    seconds = time.perf_counter() - started
+    failed = sum(1 for _, error in results.values() if error)
+    print(f"{label:<24}{seconds:>9.2f}{calendar.http_requests:>10}{calendar.throttled:>11}{failed:>8}")
+
+def main():
+    args = parse_args()
+    calendar = FakeCalendar(args.latency_ms / 1000, args.rate_limit)
+    server = start_server(calendar, args.port)
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+    if args.serve:
+        print(f"Fake Calendar API on {url} (Ctrl+C to stop)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            return
+
+    os.environ["GOOGLE_CALENDAR_API_URL"] = url
+    os.environ.setdefault("CALENDAR_BACKOFF_BASE", "0.1")
+    # app.calendar_sync imports app.database, which needs a URL; nothing here touches it
+    os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+    from google.oauth2.credentials import Credentials
+    from app import calendar_sync
+
+    credentials = Credentials(token="benchmark")
+    events = {str(todo.id): calendar_sync.event_body(todo) for todo in fake_todos(args.todos)}
+
+    def sequential():
+        # What the route used to do: one blocking request per todo, no retries
+        service = calendar_sync.calendar_service(credentials)
+        results = {}
+        for key, body in events.items():
+            try:
+                results[key] = (service.events().insert(calendarId="primary", body=body).execute(), None)
+            except Exception as e:
+                results[key] = (None, str(e))
+        return results
+
+    print(f"{args.todos} todos, {args.latency_ms:.0f} ms per request, {args.rate_limit:.0%} of calls throttled")
+    print(f"\n{'strategy':<24}{'seconds':>9}{'requests':>10}{'throttled':>11}{'failed':>8}")
+    run("sequential inserts", calendar, sequential)
+    run("batched + backoff", calendar, lambda: calendar_sync.apply_changes(credentials, events, {}, {}))
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+RATE LIMIT BENCHMARK - limiter overhead per request
+Drives a small FastAPI app (default policy plus one @rate_limit endpoint)
+directly through ASGI, without HTTP, and reports the time per request with
+no limiter, with RateLimitMiddleware on the in-process fallback, and with
+RateLimitMiddleware on Redis (one Lua script call per request). The old
+decorator's INCR + EXPIRE pipeline is timed on the same Redis for reference.
+
+Uses REDIS_URL when a server is reachable, otherwise an in-process fakeredis
+(pip install fakeredis lupa); fakeredis round trips cost far less than
+network ones, so compare Redis numbers on a real server.
+
+Usage:
+    python3 benchmarks/bench_rate_limit.py
+    python3 benchmarks/bench_rate_limit.py --requests 20000 --users 100
+    REDIS_URL=redis://localhost:6379/15 python3 benchmarks/bench_rate_limit.py
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("ALGORITHM", "HS256")
+# Generous limits: the benchmark measures checking, not rejecting
+os.environ.setdefault("RATE_LIMIT_DEFAULT", "1000000000/60")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=10_000, help="Requests per configuration")
+    parser.add_argument("--users", type=int, default=50, help="Distinct bearer tokens the requests cycle through")
+    return parser.parse_args()
+
+async def connect():
+    import redis.asyncio as aioredis
+    url = os.getenv("REDIS_URL", "redis://localhost:6379/15")
+    try:
+        client = aioredis.from_url(url, decode_responses=True)
+        await client.ping()
+        return client, url
+    except Exception:
+        import fakeredis.aioredis
+        return fakeredis.aioredis.FakeRedis(decode_responses=True), "fakeredis (in-process)"
+
+def build_app():
+    from fastapi import FastAPI
+    from app.rate_limit import rate_limit
+
+    app = FastAPI()
+
+    @app.get("/todos")
+    @rate_limit(max_requests=1_000_000_000, window=3600)
+    async def list_todos():
+        return {"todos": []}
+
+    @app.get("/todos/{todo_id}")
+    async def get_todo(todo_id: int):
+        return {"id": todo_id}
+
+    return app
+
+async def call(app, path: str, token: str):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"bench"), (b"authorization", f"Bearer {token}".encode())],
+        "client": ("127.0.0.1", 50000), "server": ("bench", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    status = []
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await app(scope, receive, send)
+    return status[0]
+
+async def time_requests(app, tokens, count):
+    paths = ("/todos", "/todos/1")
+    timings = []
+    for i in range(count):
+        started = time.perf_counter()
+        status = await call(app, paths[i % 2], tokens[i % len(tokens)])
+        timings.append((time.perf_counter() - started) * 1_000_000)
+        assert status == 200, status
+    return statistics.mean(timings), statistics.median(timings), sorted(timings)[int(len(timings) * 0.99)]
+
+async def run(args):
+    client, label = await connect()
+    from app.auth import create_access_token
+    from app.redis_client import redis_client
+    from app import rate_limit as limiter
+
+    tokens = [create_access_token({"sub": f"bench-user-{i}"}) for i in range(args.users)]
+    plain = build_app()
+    limited = build_app()
+    limited.add_middleware(limiter.RateLimitMiddleware, enabled=True)
+
+    async def old_decorator(i):
+        # Previous implementation: INCR + EXPIRE pipeline per call, no Lua
+        key = f"rate_limit:bench-user-{i % args.users}:list_todos"
+        async with client.pipeline() as pipe:
+            pipe.incr(key)
+            pipe.expire(key, 3600)
+            await pipe.execute()
+
+    print(f"Redis: {label}")
+    print(f"{args.requests:,} requests per configuration, {args.users} users\n")
+    print(f"{'configuration':<32}{'mean us':>10}{'median us':>11}{'p99 us':>10}")
+
+    # Warm up route matching, token decoding and the script cache
+    await time_requests(plain, tokens, 200)
+    baseline = await time_requests(plain, tokens, args.requests)
+    print(f"{'no limiter':<32}{baseline[0]:>10.1f}{baseline[1]:>11.1f}{baseline[2]:>10.1f}")
+
+    redis_client.breaker.trip()
+    local = await time_requests(limited, tokens, args.requests)
+    print(f"{'middleware, in-process':<32}{local[0]:>10.1f}{local[1]:>11.1f}{local[2]:>10.1f}")
+
+    redis_client.breaker.record_success()
+    redis_client.client = client
+    await time_requests(limited, tokens, 200)
+    remote = await time_requests(limited, tokens, args.requests)
+    print(f"{'middleware, Redis (Lua)':<32}{remote[0]:>10.1f}{remote[1]:>11.1f}{remote[2]:>10.1f}")
+
+    timings = []
+    for i in range(args.requests):
+        started = time.perf_counter()
+        await old_decorator(i)
+        timings.append((time.perf_counter() - started) * 1_000_000)
+    print(f"{'old INCR+EXPIRE (limiter only)':<32}{statistics.mean(timings):>10.1f}"
+          f"{statistics.median(timings):>11.1f}{sorted(timings)[int(len(timings) * 0.99)]:>10.1f}")
+
+    print(f"\noverhead per request: in-process {local[0] - baseline[0]:.1f} us, "
+          f"Redis {remote[0] - baseline[0]:.1f} us (mean)")
+
+    await client.delete(*(await client.keys(f"{limiter.RATE_LIMIT_NAMESPACE}:*")) or ["-"])
+    await client.delete(*(await client.keys("rate_limit:bench-user-*")) or ["-"])
+
+def main():
+    asyncio.run(run(parse_args()))
+
+if __name__ == "__main__":
+    main()
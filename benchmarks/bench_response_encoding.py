@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+RESPONSE ENCODING BENCHMARK - GET /todos payload size and serialization CPU
+Builds a page of todos with large descriptions and times turning it into
+response bytes the previous way (TodoList validation + json.dumps, sent
+uncompressed) against orjson, gzip/brotli on top of it, and a
+?fields=id,title,status projection that leaves descriptions out.
+
+Usage:
+    python3 benchmarks/bench_response_encoding.py
+    python3 benchmarks/bench_response_encoding.py --todos 100 --description-kb 50
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+WORDS = ("call", "review", "budget", "draft", "client", "meeting", "report", "deploy", "fix", "plan",
+         "sprint", "invoice", "design", "update", "team", "notes", "follow", "up", "with", "the")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--todos", type=int, default=100, help="Todos on the page (GET /todos max size)")
+    parser.add_argument("--description-kb", type=int, default=20, help="Description size per todo")
+    parser.add_argument("--repeat", type=int, default=30, help="Timed runs per strategy")
+    return parser.parse_args()
+
+def make_page(count: int, description_kb: int) -> dict:
+    rng = random.Random(1)
+    created = datetime(2024, 1, 1)
+    todos = []
+    for i in range(count):
+        words = []
+        size = 0
+        while size < description_kb * 1024:
+            word = rng.choice(WORDS)
+            words.append(word)
+            size += len(word) + 1
+        todos.append({
+            "id": i + 1, "title": f"Todo {i + 1}", "description": " ".join(words),
+            "priority": ("low", "medium", "high")[i % 3], "date": None, "status": "pending",
+            "image": None, "completed": False, "owner_id": 1,
+            "created_at": created + timedelta(minutes=i), "updated_at": None,
+        })
+    return {"todos": todos, "total": count, "page": 1, "size": count, "pages": 1, "next_cursor": None, "has_more": False}
+
+def time_strategy(fn, repeat):
+    fn()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), len(body)
+
+def main():
+    args = parse_args()
+    os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+    from fastapi.responses import JSONResponse, ORJSONResponse
+    from app.schemas import TodoList
+    from app import compression
+
+    page = make_page(args.todos, args.description_kb)
+    fields = ("id", "title", "status")
+
+    def validated():
+        # What FastAPI does with the handler's return value before rendering
+        return TodoList.model_validate(page).model_dump(mode="json")
+
+    def projected():
+        data = validated()
+        return {**data, "todos": [{name: todo[name] for name in fields} for todo in data["todos"]]}
+
+    strategies = [
+        ("json.dumps (before)", lambda: JSONResponse(validated()).body),
+        ("orjson", lambda: ORJSONResponse(validated()).body),
+        ("orjson + gzip", lambda: compression.compress_body("gzip", ORJSONResponse(validated()).body)),
+    ]
+    if compression.brotli is not None:
+        strategies.append(("orjson + brotli", lambda: compression.compress_body("br", ORJSONResponse(validated()).body)))
+    strategies += [
+        ("fields=id,title,status", lambda: ORJSONResponse(projected()).body),
+        ("fields + gzip", lambda: compression.compress_body("gzip", ORJSONResponse(projected()).body)),
+    ]
+
+    print(f"{args.todos} todos, ~{args.description_kb} KB description each"
+          + ("" if compression.brotli is not None else " (brotli not installed, skipped)"))
+    print(f"\n{'strategy':<26}{'median ms':>11}{'bytes':>12}{'vs before':>11}")
+    baseline_size = None
+    for label, fn in strategies:
+        ms, size = time_strategy(fn, args.repeat)
+        baseline_size = baseline_size or size
+        print(f"{label:<26}{ms:>11.2f}{size:>12,}{size / baseline_size:>10.1%}")
+
+    # Serialization alone, on an already validated page
+    data = validated()
+    before, _ = time_strategy(lambda: JSONResponse(data).body, args.repeat)
+    after, _ = time_strategy(lambda: ORJSONResponse(data).body, args.repeat)
+    print(f"\nrender only: json.dumps {before:.2f} ms, orjson {after:.2f} ms ({before / after:.1f}x)")
+
+if __name__ == "__main__":
+    main()
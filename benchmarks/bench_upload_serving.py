@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+UPLOAD SERVING BENCHMARK - image bytes through the Python app vs. nginx offload
+Serves the same set of stored images through GET /uploads/{name} with
+UPLOAD_SERVE_MODE=app (the worker streams every byte) and =accel (the worker
+only answers with X-Accel-Redirect and nginx sends the file), in-process via
+httpx's ASGI transport, and reports requests/s and the MB/s the Python
+worker itself had to push. A conditional (If-None-Match) pass shows the 304
+path.
+
+With --url, instead fetches --image from a running deployment (e.g. through
+nginx on :3000) to compare end-to-end throughput with either mode enabled.
+
+Usage:
+    python3 benchmarks/bench_upload_serving.py
+    python3 benchmarks/bench_upload_serving.py --files 50 --size-kb 500 --requests 2000 --concurrency 32
+    python3 benchmarks/bench_upload_serving.py --url http://localhost:3000 --image <sha256>.jpg
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=20, help="Distinct images to serve")
+    parser.add_argument("--size-kb", type=int, default=300, help="Size of each image")
+    parser.add_argument("--requests", type=int, default=1_000, help="Requests per mode")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requests in flight")
+    parser.add_argument("--url", help="Benchmark a running deployment instead (base URL)")
+    parser.add_argument("--image", help="Stored image name to fetch with --url")
+    return parser.parse_args()
+
+async def hammer(client, paths, total, concurrency, headers=None):
+    """Fetch paths round-robin; returns (seconds, response body bytes)"""
+    received = 0
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(paths[i % len(paths)])
+
+    async def worker():
+        nonlocal received
+        while not queue.empty():
+            response = await client.get(queue.get_nowait(), headers=headers)
+            assert response.status_code in (200, 304), response.status_code
+            received += len(response.content)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - started, received
+
+def report(label, total, seconds, received):
+    print(f"{label:<28}{total / seconds:>12,.0f}{received / seconds / 1_000_000:>14.1f}")
+
+async def run_local(args):
+    import httpx
+
+    directory = tempfile.mkdtemp(prefix="bench_uploads_")
+    os.environ["UPLOAD_DIR"] = directory
+    # The uploads routes import app.database, which needs a URL; nothing here touches it
+    os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+    from fastapi import FastAPI
+    from app.routes import uploads
+
+    paths = []
+    for i in range(args.files):
+        data = b"\xff\xd8\xff" + os.urandom(args.size_kb * 1024 - 3)
+        name = f"{hashlib.sha256(data).hexdigest()}.jpg"
+        with open(os.path.join(directory, name), "wb") as f:
+            f.write(data)
+        paths.append(f"/uploads/{name}")
+
+    app = FastAPI()
+    app.include_router(uploads.router)
+    transport = httpx.ASGITransport(app=app)
+    print(f"{args.files} images x {args.size_kb} KB, {args.requests} requests, concurrency {args.concurrency}")
+    print(f"\n{'mode':<28}{'req/s':>12}{'worker MB/s':>14}")
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for mode in ("app", "accel"):
+            uploads.UPLOAD_SERVE_MODE = mode
+            seconds, received = await hammer(client, paths, args.requests, args.concurrency)
+            report(mode, args.requests, seconds, received)
+        etag = (await client.get(paths[0])).headers["etag"]
+        seconds, received = await hammer(client, paths[:1], args.requests, args.concurrency, {"If-None-Match": etag})
+        report("conditional (304)", args.requests, seconds, received)
+
+async def run_remote(args):
+    import httpx
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=30) as client:
+        paths = [f"/uploads/{args.image}"]
+        response = await client.get(paths[0])
+        print(f"{args.url}{paths[0]}: {len(response.content):,} bytes, status {response.status_code}")
+        print(f"\n{'target':<28}{'req/s':>12}{'client MB/s':>14}")
+        seconds, received = await hammer(client, paths, args.requests, args.concurrency)
+        report("end-to-end", args.requests, seconds, received)
+
+def main():
+    args = parse_args()
+    if args.url:
+        if not args.image:
+            sys.exit("--url needs --image")
+        asyncio.run(run_remote(args))
+    else:
+        asyncio.run(run_local(args))
+
+if __name__ == "__main__":
+    main()
@@ -144,9 +144,19 @@ function DashboardPage() {
         throw new Error(errorData.detail || "Failed to sync tasks");
       }
 
-      const syncData = await syncRes.json();
+      // The sync runs as a background job; poll it until it finishes
+      let job = await syncRes.json();
+      while (job.status !== "succeeded" && job.status !== "failed") {
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+        const jobRes = await fetch(job.status_url, {
+          headers: token ? { Authorization: `Bearer ${token}` } : {},
+        });
+        if (!jobRes.ok) throw new Error("Lost track of the sync");
+        job = await jobRes.json();
+      }
+      if (job.status === "failed") throw new Error(job.error || "Failed to sync tasks");
       setSyncMessage(
-        `✓ Successfully synced ${syncData.successful} tasks to Google Calendar!`
+        `✓ ${job.result.message}`
       );
       setShowSyncMessage(true);
       setTimeout(() => setShowSyncMessage(false), 5000);
@@ -521,7 +531,9 @@ function DashboardPage() {
               {todoTasks.map((task) => {
                 // Fix image URL: if image is just a filename, prepend /uploads/ and use apiBase when provided
                 let imageUrl = task.image;
-                if (imageUrl && !/^https?:\/\//.test(imageUrl)) {
+                if (task.thumbnail_url) {
+                  imageUrl = joinUrl(apiBase, task.thumbnail_url);
+                } else if (imageUrl && !/^https?:\/\//.test(imageUrl)) {
                   imageUrl = joinUrl(apiBase, `uploads/${imageUrl}`);
                 }
                 return (
@@ -649,8 +661,9 @@ function DashboardPage() {
               </div>
             ) : (
               completedTasks.map((ct) => {
-                const img =
-                  ct.image && /^https?:/.test(ct.image)
+                const img = ct.thumbnail_url
+                  ? joinUrl(apiBase, ct.thumbnail_url)
+                  : ct.image && /^https?:/.test(ct.image)
                     ? ct.image
                     : ct.image
                     ? joinUrl(apiBase, `uploads/${ct.image}`)
@@ -134,9 +134,19 @@ function VitalTaskPage() {
         throw new Error(errorData.detail || "Failed to sync tasks");
       }
 
-      const syncData = await syncRes.json();
+      // The sync runs as a background job; poll it until it finishes
+      let job = await syncRes.json();
+      while (job.status !== "succeeded" && job.status !== "failed") {
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+        const jobRes = await fetch(job.status_url, {
+          headers: token ? { Authorization: `Bearer ${token}` } : {},
+        });
+        if (!jobRes.ok) throw new Error("Lost track of the sync");
+        job = await jobRes.json();
+      }
+      if (job.status === "failed") throw new Error(job.error || "Failed to sync tasks");
       setSyncMessage(
-        `✓ Successfully synced ${syncData.successful} tasks to Google Calendar!`
+        `✓ ${job.result.message}`
       );
       setShowSyncMessage(true);
       setTimeout(() => setShowSyncMessage(false), 5000);
@@ -542,7 +552,8 @@ function VitalTaskPage() {
               ) : (
                 vitalTasks.map((task) => {
                   // normalize image URL
-                  const imageUrl = getImageUrl(task.image);
+                  // list cards use the small thumbnail when the API provides one
+                  const imageUrl = getImageUrl(task.thumbnail_url || task.image);
                   const isSelected =
                     selectedTask && selectedTask.id === task.id;
                   return (
@@ -1,13 +1,21 @@
 from fastapi import FastAPI, HTTPException
-from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import engine
-from app.models import Base
-from app.routes import auth, todos, google_calendar
+from fastapi.responses import ORJSONResponse
+from app.routes import auth, todos, google_calendar, uploads, jobs
+from app.cache import listen_for_invalidations
+from app.events import listen_for_events
+from app.redis_client import redis_client
+from app.uploads import run_upload_gc
+from app.todo_sync import run_tombstone_purge
+from app.images import shutdown_image_pool
+from app.jobs import start_job_workers
+from app.rate_limit import RateLimitMiddleware
+from app.compression import CompressionMiddleware
+import asyncio
 from prometheus_fastapi_instrumentator import Instrumentator
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# Database schema is managed by Alembic (migrations/); run
+# `alembic upgrade head` before starting the app.
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -15,7 +23,9 @@ app = FastAPI(
     description="A comprehensive Todo application backend built with FastAPI",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    # orjson serializes response bodies several times faster than json.dumps
+    default_response_class=ORJSONResponse,
 )
 Instrumentator().instrument(app).expose(app)
 # Disable automatic trailing-slash redirects. Starlette by default issues
@@ -25,8 +35,12 @@ Instrumentator().instrument(app).expose(app)
 # for mismatched trailing-slash paths instead of redirecting.
 app.router.redirect_slashes = False
 
-# Serve static files from /uploads
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# Per-user/IP rate limits (default policy plus each endpoint's @rate_limit);
+# added before CORS so 429 responses still carry CORS headers
+app.add_middleware(RateLimitMiddleware)
+
+# brotli/gzip for JSON and text bodies over COMPRESSION_MIN_SIZE
+app.add_middleware(CompressionMiddleware)
 
 # Add CORS middleware
 app.add_middleware(
@@ -35,12 +49,64 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset", "RateLimit-Policy", "Retry-After"],
 )
 
 # Include routers
 app.include_router(auth.router)
 app.include_router(todos.router)
 app.include_router(google_calendar.router)
+# Todo images (from the configured upload storage)
+app.include_router(uploads.router)
+app.include_router(jobs.router)
+
+@app.on_event("startup")
+async def start_jobs():
+    """Run background jobs (calendar sync, exports, imports, image derivatives)"""
+    app.state.job_workers = start_job_workers()
+
+@app.on_event("shutdown")
+async def stop_jobs():
+    """Stop the job workers (registered before stop_redis so an interrupted
+    Redis job can still be put back on the queue)"""
+    for worker in app.state.job_workers:
+        worker.cancel()
+    await asyncio.gather(*app.state.job_workers, return_exceptions=True)
+
+@app.on_event("startup")
+async def start_redis():
+    """Connect to Redis and listen for other workers' cache invalidations
+    and todo change events"""
+    await redis_client.connect()
+    app.state.invalidation_listener = asyncio.create_task(listen_for_invalidations())
+    app.state.event_listener = asyncio.create_task(listen_for_events())
+
+@app.on_event("shutdown")
+async def stop_redis():
+    """Stop background Redis work and release pooled connections"""
+    app.state.invalidation_listener.cancel()
+    app.state.event_listener.cancel()
+    await redis_client.close()
+
+@app.on_event("startup")
+async def start_upload_gc():
+    """Periodically delete stored images no todo references"""
+    app.state.upload_gc = asyncio.create_task(run_upload_gc())
+
+@app.on_event("shutdown")
+async def stop_upload_work():
+    """Stop the upload GC and the image worker processes"""
+    app.state.upload_gc.cancel()
+    shutdown_image_pool()
+
+@app.on_event("startup")
+async def start_tombstone_purge():
+    """Periodically drop deleted todos kept for GET /todos/changes"""
+    app.state.tombstone_purge = asyncio.create_task(run_tombstone_purge())
+
+@app.on_event("shutdown")
+async def stop_tombstone_purge():
+    app.state.tombstone_purge.cancel()
 
 @app.get("/")
 async def root():
@@ -0,0 +1,64 @@
+"""initial schema
+
+Matches the tables previously created by Base.metadata.create_all. Tables
+that already exist (databases created before migrations were introduced)
+are left untouched so the revision can simply be stamped on top of them.
+
+Revision ID: 0001
+Revises:
+Create Date: 2025-11-20
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Offline (--sql) runs cannot inspect the database; emit everything
+    existing = [] if op.get_context().as_sql else sa.inspect(op.get_bind()).get_table_names()
+
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("email", sa.String(), nullable=False),
+            sa.Column("username", sa.String(), nullable=False),
+            sa.Column("hashed_password", sa.String(), nullable=False),
+            sa.Column("firstname", sa.String(), nullable=True),
+            sa.Column("lastname", sa.String(), nullable=True),
+            sa.Column("contact", sa.String(), nullable=True),
+            sa.Column("position", sa.String(), nullable=True),
+            sa.Column("is_active", sa.Boolean(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column("google_calendar_token", sa.String(), nullable=True),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+        op.create_index("ix_users_username", "users", ["username"], unique=True)
+
+    if "todos" not in existing:
+        op.create_table(
+            "todos",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("title", sa.String(), nullable=False),
+            sa.Column("description", sa.String(), nullable=True),
+            sa.Column("date", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("completed", sa.Boolean(), nullable=True),
+            sa.Column("priority", sa.String(), nullable=True),
+            sa.Column("status", sa.String(), nullable=True),
+            sa.Column("image", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("owner_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        )
+        op.create_index("ix_todos_id", "todos", ["id"])
+
+
+def downgrade():
+    op.drop_table("todos")
+    op.drop_table("users")
@@ -0,0 +1,38 @@
+"""owner-scoped composite indexes on todos
+
+On PostgreSQL the indexes are built CONCURRENTLY so existing deployments
+keep serving writes while they are created.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2025-11-20
+"""
+from alembic import op
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+COMPOSITE_INDEXES = {
+    "ix_todos_owner_created_id": ["owner_id", "created_at", "id"],
+    "ix_todos_owner_completed": ["owner_id", "completed"],
+    "ix_todos_owner_priority": ["owner_id", "priority"],
+}
+
+
+def upgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        for name, columns in COMPOSITE_INDEXES.items():
+            op.create_index(name, "todos", columns)
+        return
+
+    with op.get_context().autocommit_block():
+        for name, columns in COMPOSITE_INDEXES.items():
+            op.create_index(name, "todos", columns, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade():
+    for name in COMPOSITE_INDEXES:
+        op.drop_index(name, table_name="todos")
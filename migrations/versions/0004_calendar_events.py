@@ -0,0 +1,34 @@
+"""todo -> Google Calendar event mapping for incremental calendar sync
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2025-12-02
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "calendar_events",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("todo_id", sa.Integer(), nullable=False),
+        sa.Column("owner_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("event_id", sa.String(), nullable=False),
+        sa.Column("etag", sa.String(), nullable=True),
+        sa.Column("synced_updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("synced_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.UniqueConstraint("todo_id", name="uq_calendar_events_todo_id"),
+    )
+    op.create_index("ix_calendar_events_owner_id", "calendar_events", ["owner_id"])
+
+
+def downgrade():
+    op.drop_index("ix_calendar_events_owner_id", table_name="calendar_events")
+    op.drop_table("calendar_events")
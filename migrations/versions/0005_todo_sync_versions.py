@@ -0,0 +1,40 @@
+"""todo versions and tombstones for delta sync (GET /todos/changes)
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2025-12-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing rows start at version 0: clients pick them up with a full sync
+    op.add_column("users", sa.Column("todo_version", sa.BigInteger(), nullable=False, server_default="0"))
+    op.add_column("users", sa.Column("todo_purged_version", sa.BigInteger(), nullable=False, server_default="0"))
+    op.add_column("todos", sa.Column("version", sa.BigInteger(), nullable=False, server_default="0"))
+    op.add_column("todos", sa.Column("deleted_at", sa.DateTime(timezone=True), nullable=True))
+    if op.get_bind().dialect.name != "postgresql":
+        op.create_index("ix_todos_owner_version_id", "todos", ["owner_id", "version", "id"])
+        return
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_todos_owner_version_id", "todos", ["owner_id", "version", "id"],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade():
+    op.drop_index("ix_todos_owner_version_id", table_name="todos")
+    # Tombstones would reappear as live todos
+    op.execute("DELETE FROM todos WHERE deleted_at IS NOT NULL")
+    op.drop_column("todos", "deleted_at")
+    op.drop_column("todos", "version")
+    op.drop_column("users", "todo_purged_version")
+    op.drop_column("users", "todo_version")
@@ -0,0 +1,29 @@
+"""detect calendar event changes by a hash of the synced todo fields
+
+synced_updated_at missed edits made within the same second as a sync
+(SQLite timestamps have one-second resolution) and re-patched events on
+changes Calendar doesn't show. Existing mappings start without a hash,
+so the next sync patches each event once.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2025-12-20
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("calendar_events", sa.Column("synced_hash", sa.String(), nullable=True))
+    op.drop_column("calendar_events", "synced_updated_at")
+
+
+def downgrade():
+    op.add_column("calendar_events", sa.Column("synced_updated_at", sa.DateTime(timezone=True), nullable=True))
+    op.drop_column("calendar_events", "synced_hash")
@@ -0,0 +1,66 @@
+import os
+import sys
+import tempfile
+import uuid
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Settings are read at import time, so they must be in place before the app
+# is imported. The database is a throwaway SQLite file; Redis is replaced by
+# an in-process fakeredis before startup.
+TEST_DIR = tempfile.mkdtemp(prefix="todo-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TEST_DIR, 'test.db')}"
+os.environ["UPLOAD_DIR"] = os.path.join(TEST_DIR, "uploads")
+os.environ["SECRET_KEY"] = "test-secret"
+os.environ["ALGORITHM"] = "HS256"
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ.setdefault("DB_MODE", "sync")
+
+@pytest.fixture(scope="session")
+def fake_redis():
+    import fakeredis.aioredis
+    return fakeredis.aioredis.FakeRedis(decode_responses=True)
+
+@pytest.fixture(scope="session")
+def client(fake_redis):
+    from alembic import command
+    from alembic.config import Config
+    from fastapi.testclient import TestClient
+    from app.redis_client import redis_client
+
+    command.upgrade(Config(os.path.join(ROOT, "alembic.ini")), "head")
+    redis_client.client = fake_redis
+    import main
+
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+@pytest.fixture
+def auth_headers(client):
+    """Authorization header of a freshly registered user"""
+    name = f"user{uuid.uuid4().hex[:12]}"
+    password = "secret123"
+    response = client.post("/auth/register", json={"email": f"{name}@example.com", "username": name, "password": password})
+    assert response.status_code == 201, response.text
+    response = client.post("/auth/login", data={"username": f"{name}@example.com", "password": password})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+@pytest.fixture
+def user_id(client, auth_headers) -> int:
+    return client.get("/auth/me", headers=auth_headers).json()["id"]
+
+@pytest.fixture
+def count_queries():
+    """Returns a function reporting the SQL statements run so far in the test"""
+    from sqlalchemy import event
+    from app.database import async_engine, engine
+
+    target = async_engine.sync_engine if async_engine is not None else engine
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(target, "before_cursor_execute", listener)
+    yield lambda: len(statements)
+    event.remove(target, "before_cursor_execute", listener)
@@ -0,0 +1,17 @@
+from sqlalchemy import event
+from app.database import async_engine, engine
+
+def test_change_password_reloads_nothing_after_commit(client, auth_headers):
+    target = async_engine.sync_engine if async_engine is not None else engine
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(target, "before_cursor_execute", listener)
+    try:
+        response = client.post("/auth/change-password", json={"current_password": "secret123", "new_password": "secret456"},
+                               headers=auth_headers)
+    finally:
+        event.remove(target, "before_cursor_execute", listener)
+
+    assert response.status_code == 200, response.text
+    # The UPDATE is the last statement: nothing lazily reloads the expired user
+    assert statements[-1].lstrip().upper().startswith("UPDATE USERS"), statements
@@ -0,0 +1,49 @@
+from app.cache import get_generation
+
+def create(client, headers, title):
+    return client.post("/todos", data={"title": title}, headers=headers).json()["id"]
+
+def test_batch_update_rejects_nulls_per_item(client, auth_headers):
+    first, second = create(client, auth_headers, "first"), create(client, auth_headers, "second")
+
+    response = client.patch("/todos/batch", json={"todos": [
+        {"id": first, "title": None},
+        {"id": second, "title": "renamed", "priority": "high"},
+        {"id": first + 1000, "completed": None},
+    ]}, headers=auth_headers)
+
+    assert response.status_code == 200, response.text
+    results = response.json()["results"]
+    assert [result["status"] for result in results] == [422, 200, 404]
+    assert "title" in results[0]["detail"]
+    assert results[1]["todo"]["title"] == "renamed"
+    assert client.get(f"/todos/{first}", headers=auth_headers).json()["title"] == "first"
+
+def test_batch_update_rejects_each_not_null_field(client, auth_headers):
+    todo_id = create(client, auth_headers, "keep")
+    for field in ("completed", "priority", "status"):
+        response = client.patch("/todos/batch", json={"todos": [{"id": todo_id, field: None}]}, headers=auth_headers)
+        assert response.json()["results"][0]["status"] == 422, field
+
+    todo = client.get(f"/todos/{todo_id}", headers=auth_headers).json()
+    assert (todo["title"], todo["completed"], todo["priority"]) == ("keep", False, "medium")
+
+def test_batch_update_allows_clearing_nullable_fields(client, auth_headers):
+    todo_id = client.post("/todos", data={"title": "dated", "description": "text", "date": "2025-01-01"}, headers=auth_headers).json()["id"]
+
+    response = client.patch("/todos/batch", json={"todos": [{"id": todo_id, "description": None, "date": None}]}, headers=auth_headers)
+
+    todo = response.json()["results"][0]["todo"]
+    assert (todo["description"], todo["date"]) == (None, None)
+
+def test_rejected_batch_leaves_cache_alone(client, auth_headers, user_id):
+    todo_id = create(client, auth_headers, "untouched")
+    before = client.portal.call(get_generation, user_id, "todos")
+
+    response = client.patch("/todos/batch", json={"todos": [
+        {"id": todo_id, "title": None},
+        {"id": todo_id + 1000, "title": "missing"},
+    ]}, headers=auth_headers)
+
+    assert [result["status"] for result in response.json()["results"]] == [422, 404]
+    assert client.portal.call(get_generation, user_id, "todos") == before
@@ -0,0 +1,68 @@
+import pytest
+from prometheus_client import REGISTRY
+from app.cache import bump_generation, get_generation
+from app.local_cache import local_cache
+
+def cache_count(metric: str, tier: str) -> float:
+    return REGISTRY.get_sample_value(metric, {"cache": "todos", "tier": tier}) or 0.0
+
+def hits() -> float:
+    return cache_count("todo_cache_hits_total", "local") + cache_count("todo_cache_hits_total", "redis")
+
+def generation(client, user_id: int) -> int:
+    return client.portal.call(get_generation, user_id, "todos")
+
+def test_repeated_list_is_served_from_cache(client, auth_headers, count_queries):
+    client.post("/todos", data={"title": "cached"}, headers=auth_headers)
+    first = client.get("/todos", headers=auth_headers)
+    before_hits, before_queries = hits(), count_queries()
+
+    second = client.get("/todos", headers=auth_headers)
+
+    assert second.json() == first.json()
+    assert hits() == before_hits + 1
+    assert count_queries() == before_queries
+
+@pytest.mark.parametrize("write", ["create", "toggle", "delete"])
+def test_writes_invalidate_cached_list(client, auth_headers, user_id, count_queries, write):
+    todo_id = client.post("/todos", data={"title": "original"}, headers=auth_headers).json()["id"]
+    client.get("/todos", headers=auth_headers)
+    generation_before = generation(client, user_id)
+
+    if write == "create":
+        response = client.post("/todos", data={"title": "another"}, headers=auth_headers)
+    elif write == "toggle":
+        response = client.patch(f"/todos/{todo_id}/toggle", headers=auth_headers)
+    else:
+        response = client.delete(f"/todos/{todo_id}", headers=auth_headers)
+    assert response.status_code in (200, 201), response.text
+    assert generation(client, user_id) > generation_before
+
+    before_hits, before_queries = hits(), count_queries()
+    todos = client.get("/todos", headers=auth_headers).json()["todos"]
+
+    assert hits() == before_hits
+    assert count_queries() > before_queries
+    if write == "create":
+        assert [todo["title"] for todo in todos] == ["original", "another"]
+    elif write == "toggle":
+        assert todos[0]["completed"] is True
+    else:
+        assert todos == []
+
+def test_stale_local_entry_keeps_its_etag(client, auth_headers, user_id):
+    client.post("/todos", data={"title": "tagged"}, headers=auth_headers)
+    first = client.get("/todos", headers=auth_headers)
+    # Another worker changed the todos and this one missed the broadcast:
+    # Redis moved on, the local tier still holds the old page
+    client.portal.call(bump_generation, user_id, "todos")
+
+    stale = client.get("/todos", headers=auth_headers)
+    assert stale.json() == first.json()
+    assert stale.headers["ETag"] == first.headers["ETag"]
+
+    local_cache.clear()
+    current = client.get("/todos", headers=auth_headers)
+    assert current.headers["ETag"] != first.headers["ETag"]
+    revalidated = client.get("/todos", headers={**auth_headers, "If-None-Match": current.headers["ETag"]})
+    assert revalidated.status_code == 304
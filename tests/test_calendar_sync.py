@@ -0,0 +1,76 @@
+import json
+import pytest
+from sqlalchemy import event, text
+from app import calendar_sync
+from app.database import async_engine, engine
+
+TOKEN = {"token": "access", "refresh_token": "refresh", "token_uri": "https://oauth2.example/token",
+         "client_id": "id", "client_secret": "secret", "scopes": ["https://www.googleapis.com/auth/calendar"]}
+
+@pytest.fixture
+def fake_calendar(monkeypatch):
+    """Replaces the Calendar calls; records the calls and the DB connections
+    checked out while they ran"""
+    calls = []
+    open_connections = [0]
+    target = async_engine.sync_engine if async_engine is not None else engine
+    checkout = lambda *args: open_connections.__setitem__(0, open_connections[0] + 1)
+    checkin = lambda *args: open_connections.__setitem__(0, open_connections[0] - 1)
+    event.listen(target, "checkout", checkout)
+    event.listen(target, "checkin", checkin)
+
+    def apply_changes(credentials, inserts, patches, deletes):
+        calls.append({"inserts": set(inserts), "patches": set(patches), "deletes": set(deletes),
+                      "connections": open_connections[0]})
+        results = {key: ({"id": f"event-{key}", "etag": "e1"}, None) for key in inserts}
+        results.update({key: ({"id": event_id, "etag": "e2"}, None) for key, (event_id, _) in patches.items()})
+        results.update({key: ({}, None) for key in deletes})
+        return results
+
+    monkeypatch.setattr(calendar_sync, "apply_changes", apply_changes)
+    yield calls
+    event.remove(target, "checkout", checkout)
+    event.remove(target, "checkin", checkin)
+
+def test_sync_holds_no_connection_while_calling_calendar(client, auth_headers, user_id, fake_calendar):
+    with engine.begin() as connection:
+        connection.execute(text("UPDATE users SET google_calendar_token = :token WHERE id = :id"),
+                           {"token": json.dumps(TOKEN), "id": user_id})
+    kept = client.post("/todos", data={"title": "kept"}, headers=auth_headers).json()["id"]
+    dropped = client.post("/todos", data={"title": "dropped"}, headers=auth_headers).json()["id"]
+
+    first = client.portal.call(calendar_sync.sync_calendar, user_id)
+    client.put(f"/todos/{kept}", data={"title": "kept, renamed"}, headers=auth_headers)
+    client.delete(f"/todos/{dropped}", headers=auth_headers)
+    second = client.portal.call(calendar_sync.sync_calendar, user_id)
+    third = client.portal.call(calendar_sync.sync_calendar, user_id)
+
+    assert (first["created"], second["updated"], second["deleted"], third["unchanged"]) == (2, 1, 1, 1)
+    assert fake_calendar[0]["inserts"] == {str(kept), str(dropped)}
+    assert (fake_calendar[1]["patches"], fake_calendar[1]["deletes"]) == ({str(kept)}, {str(dropped)})
+    # The third sync found nothing to change and made no calls
+    assert len(fake_calendar) == 2
+    assert [call["connections"] for call in fake_calendar] == [0, 0]
+    with engine.connect() as connection:
+        rows = connection.execute(text("SELECT todo_id, event_id, etag FROM calendar_events WHERE owner_id = :id"),
+                                  {"id": user_id}).all()
+    assert rows == [(kept, f"event-{kept}", "e2")]
+
+def test_sync_patches_only_changes_calendar_shows(client, auth_headers, user_id, fake_calendar):
+    with engine.begin() as connection:
+        connection.execute(text("UPDATE users SET google_calendar_token = :token WHERE id = :id"),
+                           {"token": json.dumps(TOKEN), "id": user_id})
+    todo_id = client.post("/todos", data={"title": "draft"}, headers=auth_headers).json()["id"]
+    client.portal.call(calendar_sync.sync_calendar, user_id)
+
+    # Calendar doesn't show completion
+    client.patch(f"/todos/{todo_id}/toggle", headers=auth_headers)
+    toggled = client.portal.call(calendar_sync.sync_calendar, user_id)
+    # Two edits within the same second as the last sync
+    client.put(f"/todos/{todo_id}", data={"priority": "high"}, headers=auth_headers)
+    edited = client.portal.call(calendar_sync.sync_calendar, user_id)
+    client.put(f"/todos/{todo_id}", data={"title": "final"}, headers=auth_headers)
+    renamed = client.portal.call(calendar_sync.sync_calendar, user_id)
+
+    assert (toggled["unchanged"], edited["updated"], renamed["updated"]) == (1, 1, 1)
+    assert [call["patches"] for call in fake_calendar[1:]] == [{str(todo_id)}, {str(todo_id)}]
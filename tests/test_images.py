@@ -0,0 +1,31 @@
+import io
+from PIL import Image
+from app.images import derivative_name, parse_derivative
+from app.uploads import ensure_derivative, storage, store_bytes
+
+ORIGINAL = "ab" * 32 + ".png"
+
+def png_bytes() -> bytes:
+    output = io.BytesIO()
+    Image.new("RGB", (800, 600), "red").save(output, "PNG")
+    return output.getvalue()
+
+def test_parse_derivative_only_accepts_derivatives_of_originals():
+    thumb = derivative_name(ORIGINAL, "thumb")
+    assert parse_derivative(thumb) == (ORIGINAL, "thumb")
+    assert parse_derivative(derivative_name(thumb, "large")) is None
+    assert parse_derivative(ORIGINAL) is None
+
+def test_derivatives_are_rendered_from_the_original_only(client):
+    client.portal.call(store_bytes, png_bytes(), ORIGINAL)
+    thumb = derivative_name(ORIGINAL, "thumb")
+
+    assert client.portal.call(ensure_derivative, ORIGINAL, "thumb") is True
+    assert client.portal.call(ensure_derivative, thumb, "large") is False
+    assert client.portal.call(storage.age, derivative_name(thumb, "large")) is None
+
+    response = client.get(f"/uploads/{derivative_name(thumb, 'large')}")
+    assert response.status_code == 404
+    response = client.get(f"/uploads/{thumb}")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/webp"
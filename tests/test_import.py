@@ -0,0 +1,27 @@
+import pytest
+
+@pytest.mark.parametrize("format", ["ndjson", "csv"])
+def test_export_imports_back_unchanged(client, auth_headers, format):
+    done = client.post("/todos", data={"title": "done", "status": "completed", "priority": "high"}, headers=auth_headers).json()["id"]
+    client.patch(f"/todos/{done}/toggle", headers=auth_headers)
+    client.post("/todos", data={"title": "open", "status": "in_progress"}, headers=auth_headers)
+    exported = client.get("/todos/export", params={"format": format}, headers=auth_headers).content
+
+    response = client.post("/todos/import", params={"format": format}, content=exported, headers=auth_headers)
+
+    assert response.status_code == 200, response.text
+    todos = client.get("/todos", params={"size": 100}, headers=auth_headers).json()["todos"]
+    fields = sorted((todo["title"], todo["completed"], todo["status"], todo["priority"]) for todo in todos)
+    assert fields == [
+        ("done", True, "completed", "high"), ("done", True, "completed", "high"),
+        ("open", False, "in_progress", "medium"), ("open", False, "in_progress", "medium"),
+    ]
+
+def test_import_defaults_missing_fields(client, auth_headers):
+    body = '{"title": "bare"}\n{"title": "nulls", "completed": null, "status": null}\n'
+
+    response = client.post("/todos/import", params={"format": "ndjson"}, content=body, headers=auth_headers)
+
+    assert response.status_code == 200, response.text
+    todos = client.get("/todos", headers=auth_headers).json()["todos"]
+    assert [(todo["completed"], todo["status"]) for todo in todos] == [(False, "pending"), (False, "pending")]
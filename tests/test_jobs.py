@@ -0,0 +1,63 @@
+import time
+import uuid
+import pytest
+from app import jobs
+from app.redis_client import redis_client
+
+calls = []
+
+@jobs.job_handler("test-echo")
+async def echo_job(job, value):
+    calls.append(job.id)
+    return {"value": value}
+
+def new_record(**fields) -> dict:
+    record = {"id": uuid.uuid4().hex, "kind": "test-echo", "user_id": None, "payload": {"value": 1},
+              "status": "queued", "attempts": 0, "max_attempts": 3, "progress": None, "result": None,
+              "error": None, "created_at": jobs.now_iso(), "backend": "redis"}
+    record.update(fields)
+    return record
+
+async def strand(record: dict):
+    """Leave a job as a worker that died while running it would"""
+    await jobs.save_job(record)
+    await redis_client.run(lambda r: r.lpush(jobs.PROCESSING_KEY, record["id"]))
+    await redis_client.run(lambda r: r.zadd(jobs.LEASES_KEY, {record["id"]: time.time() - 1}))
+
+async def is_processing(job_id: str) -> bool:
+    return job_id in await redis_client.run(lambda r: r.lrange(jobs.PROCESSING_KEY, 0, -1))
+
+def wait_for(client, job_id: str, statuses=jobs.FINISHED, timeout: float = 10) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        record = client.portal.call(jobs.get_job, job_id)
+        if record["status"] in statuses and not client.portal.call(is_processing, job_id):
+            return record
+        time.sleep(0.05)
+    pytest.fail(f"job {job_id} still {record['status']}")
+
+def test_job_of_dead_worker_runs_again(client):
+    record = new_record(status="running", attempts=1)
+    client.portal.call(strand, record)
+
+    record = wait_for(client, record["id"])
+    assert (record["status"], record["attempts"], record["result"]) == ("succeeded", 2, {"value": 1})
+    assert calls.count(record["id"]) == 1
+
+def test_job_of_dead_worker_fails_after_last_attempt(client):
+    record = new_record(status="running", attempts=3)
+    client.portal.call(strand, record)
+
+    record = wait_for(client, record["id"])
+    assert (record["status"], record["error"]) == ("failed", "Worker lost while running the job")
+    assert record["id"] not in calls
+
+def test_outcome_saved_when_slot_release_fails(client, monkeypatch):
+    async def release_slot(record):
+        raise ConnectionError("Redis went away")
+
+    monkeypatch.setattr(jobs, "release_slot", release_slot)
+    record = client.portal.call(jobs.enqueue_job, "test-echo", {"value": 2})
+
+    record = wait_for(client, record["id"])
+    assert (record["status"], record["result"]) == ("succeeded", {"value": 2})
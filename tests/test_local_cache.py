@@ -0,0 +1,33 @@
+from app.local_cache import LocalCache
+
+def test_generations_are_bounded():
+    cache = LocalCache(max_generations=10)
+    for user_id in range(1000):
+        cache.bump_generation(f"{user_id}:todos")
+
+    assert cache.stats()["generations"] <= 10
+
+def test_forgotten_generation_never_revives_old_keys():
+    cache = LocalCache(max_generations=4)
+    untouched = cache.generation("never-bumped")
+    cache.set(f"never-bumped:g{untouched}", "old")
+    before = cache.generation("user:1")
+    cache.set(f"user:1:g{before}", "stale")
+    cache.bump_generation("user:1")
+
+    # Push user:1 (and everything else bumped early) out of the map
+    for user_id in range(2, 20):
+        cache.bump_generation(f"user:{user_id}")
+
+    assert "user:1" not in cache._generations
+    assert cache.generation("user:1") != before
+    assert cache.get(f"user:1:g{cache.generation('user:1')}") is None
+    assert cache.generation("never-bumped") != untouched
+
+def test_recently_bumped_generation_is_kept():
+    cache = LocalCache(max_generations=4)
+    for user_id in range(10):
+        cache.bump_generation(f"user:{user_id}")
+        current = cache.generation(f"user:{user_id}")
+        cache.set(f"user:{user_id}:g{current}", user_id)
+        assert cache.get(f"user:{user_id}:g{cache.generation(f'user:{user_id}')}") == user_id
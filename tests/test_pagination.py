@@ -0,0 +1,36 @@
+from sqlalchemy import text
+from app.database import engine
+
+def create_todos(client, headers, count):
+    return [client.post("/todos", data={"title": f"todo {i}"}, headers=headers).json()["id"] for i in range(count)]
+
+def test_cursor_pages_through_todos_created_in_the_same_second(client, auth_headers, user_id):
+    ids = create_todos(client, auth_headers, 5)
+    # Stored the way server_default=now() writes it on SQLite: no fraction
+    with engine.begin() as connection:
+        connection.execute(
+            text("UPDATE todos SET created_at = '2024-01-01 12:00:00' WHERE owner_id = :owner_id"),
+            {"owner_id": user_id},
+        )
+
+    seen = []
+    cursor = None
+    while True:
+        url = "/todos?size=2" + (f"&cursor={cursor}" if cursor else "")
+        page = client.get(url, headers=auth_headers).json()
+        seen += [todo["id"] for todo in page["todos"]]
+        cursor = page["next_cursor"]
+        if not page["has_more"]:
+            break
+
+    assert seen == sorted(ids)
+
+def test_cursor_and_page_modes_agree(client, auth_headers):
+    ids = create_todos(client, auth_headers, 3)
+    first = client.get("/todos?size=2&include_total=false", headers=auth_headers).json()
+    second = client.get(f"/todos?size=2&cursor={first['next_cursor']}", headers=auth_headers).json()
+    paged = client.get("/todos?size=2&page=2", headers=auth_headers).json()
+
+    assert [todo["id"] for todo in first["todos"] + second["todos"]] == ids
+    assert second["todos"] == paged["todos"]
+    assert second["has_more"] is False
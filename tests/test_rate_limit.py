@@ -0,0 +1,32 @@
+import pytest
+from app import rate_limit
+
+def scope(*forwarded, client="10.0.0.2", path="/auth/login") -> dict:
+    headers = [(b"x-forwarded-for", value.encode()) for value in forwarded]
+    return {"headers": headers, "client": (client, 40000), "path": path}
+
+@pytest.fixture
+def behind_proxies(monkeypatch):
+    def trust(count: int):
+        monkeypatch.setattr(rate_limit, "RATE_LIMIT_TRUST_FORWARDED", True)
+        monkeypatch.setattr(rate_limit, "RATE_LIMIT_TRUSTED_PROXIES", count)
+    return trust
+
+def test_spoofed_forwarded_entries_are_ignored(behind_proxies):
+    behind_proxies(1)
+    # nginx appended the address it saw to what the client sent
+    assert rate_limit.client_ip(scope("1.1.1.1, 203.0.113.7")) == "203.0.113.7"
+    assert rate_limit.client_ip(scope("1.1.1.1", "203.0.113.7")) == "203.0.113.7"
+
+def test_outermost_of_several_trusted_proxies(behind_proxies):
+    behind_proxies(2)
+    assert rate_limit.client_ip(scope("1.1.1.1, 203.0.113.7, 10.0.0.9")) == "203.0.113.7"
+    assert rate_limit.client_ip(scope("203.0.113.7")) == "203.0.113.7"
+
+def test_forwarded_header_ignored_unless_trusted():
+    assert rate_limit.client_ip(scope("1.1.1.1, 203.0.113.7")) == "10.0.0.2"
+
+def test_uploads_have_their_own_budget():
+    assert rate_limit.base_policy("/uploads/abc.png").name == "uploads"
+    assert rate_limit.base_policy("/uploads") is rate_limit.default_policy
+    assert rate_limit.base_policy("/auth/login") is rate_limit.default_policy
@@ -0,0 +1,44 @@
+import asyncio
+import fakeredis.aioredis
+from app.redis_client import CircuitBreaker, RedisClient
+
+def half_open_client() -> RedisClient:
+    client = RedisClient(client=fakeredis.aioredis.FakeRedis(decode_responses=True))
+    client.breaker = CircuitBreaker(cooldown=0)
+    client.breaker.trip()
+    return client
+
+def test_cancelled_probe_lets_the_next_call_probe():
+    client = half_open_client()
+
+    async def scenario():
+        async def slow_ping(r):
+            await asyncio.sleep(1)
+            return await r.ping()
+
+        try:
+            await asyncio.wait_for(client.run(slow_ping), 0.01)
+        except asyncio.TimeoutError:
+            pass
+        assert client.is_connected()
+        assert await client.run(lambda r: r.ping())
+
+    asyncio.run(scenario())
+    assert client.breaker.opened_at is None
+
+def test_probe_failing_outside_redis_lets_the_next_call_probe():
+    client = half_open_client()
+
+    async def broken(r):
+        raise ValueError("not a Redis problem")
+
+    async def scenario():
+        try:
+            await client.run(broken)
+        except ValueError:
+            pass
+        assert client.is_connected()
+        assert await client.run(lambda r: r.ping())
+
+    asyncio.run(scenario())
+    assert client.breaker.opened_at is None